@@ -0,0 +1,290 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+A queue that runs all sessions on a single asyncio event loop.
+Requires Python 3.5 or later.
+"""
+from __future__ import absolute_import
+import sys
+import asyncio
+from functools import partial
+from .util.cast import to_hosts
+from .util.impl import format_exception
+from .util.decorator import get_label
+from .account import AccountManager
+from .logger import logger_registry
+from .protocols.aio import async_protocol_map
+from .protocols.resolver import default_resolver
+
+
+class AsyncJob(object):
+
+    """
+    Describes one invocation of the callback for one host; the
+    counterpart of :class:`Exscript.workqueue.Job` for the AsyncQueue.
+    """
+
+    def __init__(self, function, name, times, data):
+        self.id = id(self)
+        self.func = function
+        self.name = name
+        self.times = times
+        self.failures = 0
+        self.data = data
+
+
+class AsyncQueue(object):
+
+    """
+    Like :class:`Exscript.Queue`, but instead of running one thread per
+    connection, all connections are handled by coroutines that share
+    one event loop. The function that is passed to run() must be a
+    coroutine function::
+
+        async def do_something(job, host, conn):
+            await conn.execute('show version')
+
+        queue = AsyncQueue(max_sessions=500)
+        queue.add_account(account)
+        asyncio.get_event_loop().run_until_complete(
+            queue.run(hosts, do_something))
+    """
+
+    def __init__(self,
+                 domain='',
+                 verbose=1,
+                 max_sessions=1,
+                 host_driver=None,
+                 exc_cb=None,
+                 stdout=sys.stdout,
+                 stderr=sys.stderr,
+                 driver_cache=None,
+                 resolver=None,
+                 resolve_threads=20):
+        """
+        Constructor. All arguments should be passed as keyword arguments.
+
+        :type  domain: str
+        :param domain: The default domain of the contacted hosts.
+        :type  verbose: int
+        :param verbose: The verbosity level.
+        :type  max_sessions: int
+        :param max_sessions: The maximum number of concurrent sessions.
+        :type  host_driver: str
+        :param host_driver: driver name like "ios" for manual override
+        :type  exc_cb: func(jobname, exc_info)
+        :param exc_cb: callback function to call on exceptions
+        :type  stdout: file
+        :param stdout: The output channel, defaults to sys.stdout.
+        :type  stderr: file
+        :param stderr: The error channel, defaults to sys.stderr.
+        :type  driver_cache: DriverCache
+        :param driver_cache: Remembers the detected driver of each host;
+            see :class:`Exscript.protocols.DriverCache`.
+        :type  resolver: Resolver
+        :param resolver: Looks up the addresses of the hosts; see
+            :class:`Exscript.protocols.Resolver`.
+        :type  resolve_threads: int
+        :param resolve_threads: The number of threads that look up the
+            addresses of all hosts before the sessions start. 0 leaves the
+            lookups to the sessions.
+        """
+        self.account_manager = AccountManager()
+        self.domain = domain
+        self.verbose = verbose
+        self.max_sessions = max_sessions
+        self.host_driver = host_driver
+        self.exc_cb = exc_cb
+        self.stdout = stdout
+        self.stderr = stderr
+        self.driver_cache = driver_cache
+        if resolver is None:
+            resolver = default_resolver
+        self.resolver = resolver
+        self.resolve_threads = resolve_threads
+        self.completed = 0
+        self.total = 0
+        self.failed = 0
+
+    def _print(self, msg):
+        if self.verbose > 0 and self.stderr is not None:
+            self.stderr.write(msg + '\n')
+            self.stderr.flush()
+
+    def _account_factory(self, host, owner, account):
+        if account is None:
+            account = host.get_account()
+        if account is not None:
+            return self.account_manager.acquire_account(account, owner)
+        return self.account_manager.acquire_account_for(host, owner)
+
+    def get_progress(self):
+        """
+        Returns the progress in percent.
+
+        :rtype:  float
+        :return: The progress in percent.
+        """
+        if self.total == 0:
+            return 0.0
+        return 100.0 / self.total * self.completed
+
+    def set_max_sessions(self, n_sessions):
+        """
+        Sets the maximum number of concurrent sessions.
+
+        :type  n_sessions: int
+        :param n_sessions: The maximum number of sessions.
+        """
+        self.max_sessions = int(n_sessions)
+
+    def get_max_sessions(self):
+        """
+        Returns the maximum number of concurrent sessions.
+
+        :rtype:  int
+        :return: The maximum number of sessions.
+        """
+        return self.max_sessions
+
+    def add_account_pool(self, pool, match=None):
+        """
+        Like :class:`Exscript.Queue.add_account_pool()`.
+
+        :type  pool: AccountPool
+        :param pool: The account pool that is added.
+        :type  match: callable
+        :param match: A callback to check if the pool should be used.
+        """
+        self.account_manager.add_pool(pool, match)
+
+    def add_account(self, account):
+        """
+        Adds the given account to the default account pool that Exscript
+        uses to log into all hosts that have no specific
+        :class:`Account` attached.
+
+        :type  account: Account
+        :param account: The account that is added.
+        """
+        self.account_manager.add_account(account)
+
+    async def _run_job(self, job):
+        host = job.data['host']
+        owner = job.id
+        mkaccount = partial(self._account_factory, host, owner)
+        pargs = {'account_factory': mkaccount,
+                 'stdout': self.stdout,
+                 'driver_cache': self.driver_cache,
+                 'resolver': self.resolver}
+        pargs.update(host.get_options())
+        protocol = host.get_protocol()
+        conn = async_protocol_map[protocol](**pargs)
+        if protocol == 'pseudo':
+            conn.device.add_commands_from_file(host.get_address())
+
+        logger = None
+        log_options = get_label(job.func, 'log_to')
+        if log_options is not None:
+            logger = logger_registry.get(log_options['logger_id'])
+        if logger is not None:
+            log_cb = partial(logger.log, job.id)
+            logger.add_log(job.id, job.name, job.failures + 1)
+            conn.data_received_event.listen(log_cb)
+
+        try:
+            await conn.connect(host.get_address(), host.get_tcp_port())
+            result = await job.func(job, host, conn)
+        except:
+            if logger is not None:
+                logger.log_aborted(job.id, sys.exc_info())
+            raise
+        else:
+            if logger is not None:
+                logger.log_succeeded(job.id)
+        finally:
+            # Close on errors as well; the transport stays registered with
+            # the event loop otherwise.
+            await conn.close(force=True)
+            if logger is not None:
+                conn.data_received_event.disconnect(log_cb)
+            self.account_manager.release_accounts(owner)
+        return result
+
+    async def _worker(self, jobs):
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            while True:
+                try:
+                    await self._run_job(job)
+                except Exception:
+                    exc_info = sys.exc_info()
+                    job.failures += 1
+                    if self.exc_cb:
+                        self.exc_cb(job.name, exc_info)
+                    self._print(job.name + ' error: ' + str(exc_info[1]))
+                    if self.verbose > 1:
+                        self._print(''.join(format_exception(*exc_info)))
+                    if job.failures < job.times:
+                        continue
+                    self.failed += 1
+                    self._print(job.name + ' finally failed.')
+                break
+            self.completed += 1
+
+    async def run(self, hosts, function, attempts=1):
+        """
+        Calls the given coroutine function once for each host, with
+        at most max_sessions sessions running concurrently. Returns
+        when all hosts were processed.
+
+        :type  hosts: string|list(string)|Host|list(Host)
+        :param hosts: A hostname or Host object, or a list of them.
+        :type  function: function
+        :param function: The coroutine function to execute.
+        :type  attempts: int
+        :param attempts: The number of attempts on failure.
+        """
+        hosts = to_hosts(hosts, default_domain=self.domain)
+        self.total += len(hosts)
+        addresses = [host.get_address() for host in hosts
+                     if host.get_protocol() not in ('dummy', 'pseudo')]
+        if addresses and self.resolve_threads:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None,
+                                       self.resolver.resolve,
+                                       addresses,
+                                       self.resolve_threads)
+        jobs = asyncio.Queue()
+        for host in hosts:
+            if self.host_driver is not None:
+                host.set_option('driver', self.host_driver)
+            data = {'host': host}
+            jobs.put_nowait(AsyncJob(function, host.get_name(), attempts, data))
+
+        n_workers = max(1, min(self.max_sessions, len(hosts)))
+        workers = [self._worker(jobs) for _ in range(n_workers)]
+        await asyncio.gather(*workers)
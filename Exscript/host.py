@@ -32,11 +32,21 @@ from .util.ipv4 import is_ip, clean_ip
 from .util.url import Url
 
 
+#: Options that only the SSH protocol adapter supports.
+_ssh_options = 'jump_host', 'exec_mode'
+
+
 def _is_ip(string):
     # Adds IPv6 support.
     return ':' in string or is_ip(string)
 
 
+def _check_ssh_option(protocol, name):
+    if name in _ssh_options and protocol not in ('ssh', 'ssh2'):
+        raise ValueError('Option %s is not supported by protocol %s'
+                         % (repr(name), repr(protocol)))
+
+
 class Host(object):
 
     """
@@ -218,9 +228,14 @@ class Host(object):
               documentation of
               protocols.Dummy.load_command_handler_from_file().
 
+        SSH-only options (jump_host, exec_mode) that are already set
+        must be removed before switching to another protocol.
+
         :type  protocol: string
         :param protocol: The protocol name.
         """
+        for name in self.get_options():
+            _check_ssh_option(protocol, name)
         self.protocol = protocol
 
     def get_protocol(self):
@@ -238,14 +253,28 @@ class Host(object):
         Possible options include:
 
             verify_fingerprint: bool
+            jump_host: str|Host (SSH only; see
+                :class:`Exscript.protocols.JumpHostPool`)
+            exec_mode: bool|str (SSH only; see
+                :class:`Exscript.protocols.SSH2`)
+            tcp_nodelay, tcp_keepalive, tcp_keepalive_interval,
+            tcp_keepalive_count, tcp_rcvbuf, tcp_sndbuf: see
+                :class:`Exscript.protocols.Protocol`
+
+        Setting an SSH-only option on a host that uses another protocol
+        raises a ValueError, so the protocol must be set first.
 
         :type  name: str
         :param name: The option name.
         :type  value: object
         :param value: The option value.
         """
-        if name not in ('debug', 'verify_fingerprint', 'driver'):
+        if name not in ('debug', 'verify_fingerprint', 'driver', 'jump_host',
+                        'exec_mode', 'tcp_nodelay', 'tcp_keepalive',
+                        'tcp_keepalive_interval', 'tcp_keepalive_count',
+                        'tcp_rcvbuf', 'tcp_sndbuf'):
             raise TypeError('No such option: ' + repr(name))
+        _check_ssh_option(self.protocol, name)
         if self.options is None:
             self.options = {}
         self.options[name] = value
@@ -25,6 +25,23 @@ from ..parselib import Token
 from .string import String, string_re
 
 
+def _split_lines(response):
+    response = response.replace('\r\n', '\n')
+    return response.replace('\r', '\n').split('\n')
+
+
+def execute_many(tokens, window):
+    """
+    Like calling value() on each of the given Execute tokens, but sends
+    the commands using :class:`Exscript.protocols.Protocol.execute_many()`.
+    """
+    conn = tokens[0]._get_connection()
+    commands = [token._get_command() for token in tokens]
+    responses = conn.execute_many(commands, window)
+    tokens[-1]._define_response(_split_lines(responses[-1]))
+    return 1
+
+
 class Execute(String):
 
     def __init__(self, lexer, parser, parent, command):
@@ -42,15 +59,27 @@ class Execute(String):
         string_re.sub(self.variable_test_cb, command)
         self.parent.define(__response__=[])
 
-    def value(self, context):
+    def _get_connection(self):
         if not self.parent.is_defined('__connection__'):
             error = 'Undefined variable "__connection__"'
             self.lexer.runtime_error(error, self)
-        conn = self.parent.get('__connection__')
+        return self.parent.get('__connection__')
 
+    def _get_command(self):
         # Substitute variables in the command for values.
         command = string_re.sub(self.variable_sub_cb, self.string)
-        command = command.lstrip()
+        return command.lstrip()
+
+    def _define_response(self, response):
+        if self.strip_command:
+            response = response[1:]
+        if len(response) == 0:
+            response = ['']
+        self.parent.define(__response__=response)
+
+    def value(self, context):
+        conn = self._get_connection()
+        command = self._get_command()
 
         # Execute the command.
         if self.no_prompt:
@@ -58,15 +87,9 @@ class Execute(String):
             response = ''
         else:
             conn.execute(command)
-            response = conn.response.replace('\r\n', '\n')
-            response = response.replace('\r', '\n').split('\n')
+            response = _split_lines(conn.response)
 
-        if self.strip_command:
-            response = response[1:]
-        if len(response) == 0:
-            response = ['']
-
-        self.parent.define(__response__=response)
+        self._define_response(response)
         return 1
 
     def dump(self, indent=0):
@@ -32,6 +32,7 @@ class Parser(object):
     def __init__(self, **kwargs):
         self.no_prompt = kwargs.get('no_prompt',     False)
         self.strip_command = kwargs.get('strip_command', True)
+        self.window = kwargs.get('window',        1)
         self.secure_only = kwargs.get('secure',        False)
         self.debug = kwargs.get('debug',         0)
         self.variables = {}
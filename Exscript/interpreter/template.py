@@ -25,7 +25,7 @@ from builtins import next
 import re
 from .scope import Scope
 from .code import Code
-from .execute import Execute
+from .execute import Execute, execute_many
 
 grammar = (
     ('escaped_data',        r'\\.'),
@@ -82,5 +82,26 @@ class Template(Scope):
                 lexer.syntax_error('Unexpected %s' % ttype, self)
         lexer.restore_grammar()
 
+    def value(self, context):
+        if self.parser.window <= 1:
+            return Scope.value(self, context)
+
+        # Consecutive commands are sent in one go; each of them replaces
+        # the response of the previous one, so only the last response
+        # is needed.
+        result = 1
+        batch = []
+        for child in self.children:
+            if isinstance(child, Execute) and not child.no_prompt:
+                batch.append(child)
+                continue
+            if batch:
+                execute_many(batch, self.parser.window)
+                batch = []
+            result = child.value(context)
+        if batch:
+            result = execute_many(batch, self.parser.window)
+        return result
+
     def execute(self):
         return self.value(self)
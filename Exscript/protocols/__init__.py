@@ -26,8 +26,12 @@ from ..util.cast import to_host
 from ..util.url import Url
 from .protocol import Protocol
 from .telnet import Telnet
-from .ssh2 import SSH2
+from .ssh2 import SSH2, SSH2Channel
 from .dummy import Dummy
+from .pool import ConnectionPool
+from .drivercache import DriverCache
+from .jumphost import JumpHostPool
+from .resolver import Resolver
 
 protocol_map = {'dummy':  Dummy,
                 'pseudo': Dummy,
@@ -0,0 +1,950 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Protocol adapters for asyncio, allowing for running many sessions
+in a single thread. Requires Python 3.5 or later.
+
+The adapters in this module support the same API as
+:class:`Exscript.protocols.Protocol`, except that all methods that wait
+for a response of the remote host are coroutines::
+
+    conn = AsyncTelnet()
+    await conn.connect('localhost')
+    await conn.login(account)
+    await conn.execute('show version')
+    print(conn.response)
+"""
+from __future__ import absolute_import, unicode_literals
+import asyncio
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from ..emulators import VirtualDevice
+from ..util.buffer import TailMatcher
+from ..util.cast import to_regexs
+from ..util.impl import Decorator, Context, _Context
+from ..util.tty import get_terminal_size
+from .drivers import driver_map
+from .protocol import Protocol, _skey_re, _line_end_re
+from .ssh2 import SSH2
+from .sockets import open_socket
+from .telnetlib import IAC, DO, DONT, WILL, WONT, SB, SE, ECHO, NAWS, \
+        TTYPE, SEND_TTYPE, theNULL
+from .exception import LoginFailure, TimeoutException, \
+        DriverReplacedException, ExpectCancelledException, \
+        ProtocolException, InvalidCommandException
+from ..util.crypt import otp
+
+_account_executor = None
+
+class _BlockingConnection(Decorator):
+
+    """
+    Wraps an :class:`AsyncProtocol` such that it can be passed to code
+    that expects the blocking API, such as the driver's init_terminal()
+    and auto_authorize() hooks. Must be used from a thread other than
+    the one that runs the event loop.
+    """
+
+    def __init__(self, conn, loop):
+        Decorator.__init__(self, conn)
+        self.__dict__['loop'] = loop
+
+    def _call(self, name, *args, **kwargs):
+        coro = getattr(self.obj, name)(*args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def send(self, data):
+        future = asyncio.run_coroutine_threadsafe(self._send(data), self.loop)
+        return future.result()
+
+    async def _send(self, data):
+        return self.obj.send(data)
+
+    def execute(self, command, consume=True):
+        return self._call('execute', command, consume)
+
+    def waitfor(self, prompt):
+        return self._call('waitfor', prompt)
+
+    def expect(self, prompt):
+        return self._call('expect', prompt)
+
+    def expect_prompt(self, consume=True):
+        return self._call('expect_prompt', consume)
+
+    def app_authenticate(self, account=None, flush=True, bailout=False):
+        return self._call('app_authenticate', account, flush, bailout)
+
+    def app_authorize(self, account=None, flush=True, bailout=False):
+        return self._call('app_authorize', account, flush, bailout)
+
+
+class AsyncProtocol(Protocol):
+
+    """
+    Base class for all asyncio based protocol adapters. Reuses the
+    driver, prompt and OS detection logic of
+    :class:`Exscript.protocols.Protocol`, but waits for data using the
+    event loop instead of blocking the thread.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        .. HINT::
+            Supports all keyword arguments that :class:`Protocol` supports.
+        """
+        Protocol.__init__(self, **kwargs)
+        self.loop = None
+        self.cancel = False
+        self.eof = False
+        self.data_ready = None
+        self.matcher = TailMatcher()
+
+    def _get_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        return self.loop
+
+    async def _run_blocking(self, func, *args):
+        return await self._get_loop().run_in_executor(None, func, *args)
+
+    def _data_received(self, data):
+        """
+        Called from within the event loop whenever the transport has
+        decoded new data.
+        """
+        self._receive_cb(data, False)
+        self.buffer.append(data)
+        if self.data_ready is not None:
+            self.data_ready.set()
+
+    def _eof_received(self):
+        self.eof = True
+        if self.data_ready is not None:
+            self.data_ready.set()
+
+    async def _fill_buffer(self):
+        if self.eof:
+            return False
+        if self.data_ready is None:
+            self.data_ready = asyncio.Event()
+        self.data_ready.clear()
+        try:
+            await asyncio.wait_for(self.data_ready.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            error = 'Timeout while waiting for response from device'
+            raise TimeoutException(error)
+        return True
+
+    async def _get_account(self, account):
+        if isinstance(account, (Context, _Context)):
+            return account.context()
+
+        # Acquiring an account may block until it is released by another
+        # session, so do it outside of the event loop. A separate executor
+        # is used, such that sessions that are waiting for an account can
+        # not starve the sessions that hold one.
+        global _account_executor
+        if _account_executor is None:
+            _account_executor = ThreadPoolExecutor(max_workers=100)
+        return await self._get_loop().run_in_executor(_account_executor,
+                                                      Protocol._get_account,
+                                                      self,
+                                                      account)
+
+    async def _call_driver(self, func, *args):
+        # Drivers are written against the blocking API; run them in the
+        # executor and let them call back into the event loop.
+        conn = _BlockingConnection(self, self._get_loop())
+        return await self._run_blocking(func, conn, *args)
+
+    async def _connect_hook(self, hostname, port):
+        """
+        Should be overwritten.
+        """
+        raise NotImplementedError()
+
+    async def connect(self, hostname=None, port=None):
+        """
+        Like :class:`Protocol.connect()`, but a coroutine.
+        """
+        if hostname is not None:
+            self.host = hostname
+        conn = await self._connect_hook(self.host, port)
+        self._load_cached_driver(port)
+        self.os_guesser.protocol_info(self.get_remote_version())
+        self.auto_driver = driver_map[self.guess_os()]
+        if self.get_banner():
+            self.os_guesser.data_received(self.get_banner(), False)
+        return conn
+
+    async def login(self, account=None, app_account=None, flush=True):
+        """
+        Like :class:`Protocol.login()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            if app_account is None:
+                app_account = account
+            await self.authenticate(account, flush=False)
+            if self.get_driver().supports_auto_authorize():
+                await self.expect_prompt()
+            await self.auto_app_authorize(app_account, flush=flush)
+
+    async def authenticate(self, account=None, app_account=None, flush=True):
+        """
+        Like :class:`Protocol.authenticate()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            if app_account is None:
+                app_account = account
+
+            if not self.proto_authenticated:
+                await self.protocol_authenticate(account)
+            await self.app_authenticate(app_account, flush=flush)
+
+    async def _protocol_authenticate(self, user, password):
+        pass
+
+    async def _protocol_authenticate_by_key(self, user, key):
+        pass
+
+    async def protocol_authenticate(self, account=None):
+        """
+        Like :class:`Protocol.protocol_authenticate()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            user = account.get_name()
+            password = account.get_password()
+            key = account.get_key()
+            try:
+                if key is None:
+                    self._dbg(1, "Attempting to authenticate %s." % user)
+                    await self._protocol_authenticate(user, password)
+                else:
+                    self._dbg(1, "Authenticate %s with key." % user)
+                    await self._protocol_authenticate_by_key(user, key)
+            except LoginFailure:
+                self._remove_cached_driver()
+                raise
+        self.proto_authenticated = True
+
+    async def _app_authenticate(self,
+                                account,
+                                password,
+                                flush=True,
+                                bailout=False):
+        user = account.get_name()
+
+        while True:
+            prompts = (('login-error', self.get_login_error_prompt()),
+                       ('username',    self.get_username_prompt()),
+                       ('skey',        [_skey_re]),
+                       ('password',    self.get_password_prompt()),
+                       ('cli',         self.get_prompt()))
+            prompt_map = []
+            prompt_list = []
+            for section, sectionprompts in prompts:
+                for prompt in sectionprompts:
+                    prompt_map.append((section, prompt))
+                    prompt_list.append(prompt)
+
+            # Wait for the prompt.
+            try:
+                index, match = await self._waitfor(prompt_list)
+            except TimeoutException:
+                if self.response is None:
+                    self.response = ''
+                msg = "Buffer: %s" % repr(self.response)
+                raise TimeoutException(msg)
+            except DriverReplacedException:
+                # Driver replaced, retry.
+                self._dbg(1, 'AsyncProtocol.app_authenticate(): driver replaced')
+                continue
+
+            # Login error detected.
+            section, prompt = prompt_map[index]
+            if section == 'login-error':
+                raise LoginFailure("Login failed")
+
+            # User name prompt.
+            elif section == 'username':
+                self._dbg(1, "Username prompt %s received." % index)
+                await self.expect(prompt)
+                self.send(user + '\r')
+                continue
+
+            # s/key prompt.
+            elif section == 'skey':
+                self._dbg(1, "S/Key prompt received.")
+                await self.expect(prompt)
+                seq = int(match.group(1))
+                seed = match.group(2)
+                self.otp_requested_event(account, seq, seed)
+                self._dbg(2, "Seq: %s, Seed: %s" % (seq, seed))
+                phrase = otp(password, seed, seq)
+
+                # A password prompt is now required.
+                await self.expect(self.get_password_prompt())
+                self.send(phrase + '\r')
+                self._dbg(1, "Password sent.")
+                if bailout:
+                    break
+                continue
+
+            # Cleartext password prompt.
+            elif section == 'password':
+                self._dbg(1, "Cleartext password prompt received.")
+                await self.expect(prompt)
+                self.send(password + '\r')
+                if bailout:
+                    break
+                continue
+
+            # Shell prompt.
+            elif section == 'cli':
+                self._dbg(1, 'Shell prompt received.')
+                if flush:
+                    await self.expect_prompt()
+                break
+
+            else:
+                assert False  # No such section
+
+    async def app_authenticate(self, account=None, flush=True, bailout=False):
+        """
+        Like :class:`Protocol.app_authenticate()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            user = account.get_name()
+            password = account.get_password()
+            self._dbg(1, "Attempting to app-authenticate %s." % user)
+            try:
+                await self._app_authenticate(account, password, flush,
+                                             bailout)
+            except (LoginFailure, TimeoutException):
+                self._remove_cached_driver()
+                raise
+        self.app_authenticated = True
+        self._store_cached_driver()
+
+    async def app_authorize(self, account=None, flush=True, bailout=False):
+        """
+        Like :class:`Protocol.app_authorize()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            user = account.get_name()
+            password = account.get_authorization_password()
+            if password is None:
+                password = account.get_password()
+            self._dbg(1, "Attempting to app-authorize %s." % user)
+            await self._app_authenticate(account, password, flush, bailout)
+        self.app_authorized = True
+
+    async def auto_app_authorize(self, account=None, flush=True, bailout=False):
+        """
+        Like :class:`Protocol.auto_app_authorize()`, but a coroutine.
+        """
+        with await self._get_account(account) as account:
+            self._dbg(1, 'Calling driver.auto_authorize().')
+            driver = self.get_driver()
+            if not driver.supports_auto_authorize():
+                # Avoid the detour through the executor in the common case.
+                await self.app_authorize(account, flush, bailout)
+                return
+            await self._call_driver(driver.auto_authorize,
+                                    account,
+                                    flush,
+                                    bailout)
+
+    async def autoinit(self):
+        """
+        Like :class:`Protocol.autoinit()`, but a coroutine.
+        """
+        await self._call_driver(self.get_driver().init_terminal)
+
+    async def execute(self, command, consume=True):
+        """
+        Like :class:`Protocol.execute()`, but a coroutine.
+        """
+        self.send(command + '\r')
+        return await self.expect_prompt(consume)
+
+    def execute_stream(self, command):
+        """
+        Like :class:`Protocol.execute_stream()`, but returns an
+        asynchronous iterator::
+
+            async for line in conn.execute_stream('show log'):
+                print(line)
+        """
+        return _LineStream(self, command)
+
+    async def execute_many(self, commands, window=10):
+        """
+        Like :class:`Protocol.execute_many()`, but a coroutine.
+        """
+        commands = list(commands)
+        responses = []
+        error = None
+        sent = 0
+        while len(responses) < sent or (error is None and
+                                        sent < len(commands)):
+            while error is None and sent < len(commands) \
+                    and sent - len(responses) < max(window, 1):
+                self.send(commands[sent] + '\r')
+                sent += 1
+            await self.expect(self.get_prompt())
+            in_flight = commands[len(responses) + 1:sent]
+            completed = self._split_responses(self.response, in_flight)
+            responses += completed
+            error = error or self._check_responses(completed)
+
+        if responses:
+            self.response = responses[-1]
+        if error is not None:
+            raise error
+        return responses
+
+    async def _domatch(self, prompt, flush):
+        self._dbg(1, "Expecting a prompt")
+        self._dbg(2, "Expected pattern: " +
+                  repr([repr(p.pattern) for p in prompt]))
+        while not self.cancel:
+            # Check whether what's buffered matches the prompt.
+            driver = self.get_driver()
+            result = self.matcher.search(self.buffer,
+                                         prompt,
+                                         driver.clean_response_for_re_match)
+            if result is None:
+                if not await self._fill_buffer():
+                    error = 'EOF while waiting for response from device'
+                    raise ProtocolException(error)
+                continue
+
+            n, match, search_window = result
+            end = self.buffer.size() - len(search_window) + match.start()
+            if flush:
+                self.response = self.buffer.pop(end)
+                self.buffer.pop(match.end() - match.start())
+            else:
+                self.response = self.buffer.head(end)
+            return n, match
+
+        # Ending up here, self.cancel_expect() was called.
+        self.cancel = False
+        if self.driver_replaced:
+            self.driver_replaced = False
+            raise DriverReplacedException()
+        raise ExpectCancelledException()
+
+    async def _waitfor(self, prompt):
+        re_list = to_regexs(prompt)
+        self._dbg(2, 'waiting for: ' + repr([p.pattern for p in re_list]))
+        return await self._domatch(re_list, False)
+
+    async def waitfor(self, prompt):
+        """
+        Like :class:`Protocol.waitfor()`, but a coroutine.
+        """
+        while True:
+            try:
+                result = await self._waitfor(prompt)
+            except DriverReplacedException:
+                continue  # retry
+            return result
+
+    async def expect(self, prompt):
+        """
+        Like :class:`Protocol.expect()`, but a coroutine.
+        """
+        while True:
+            try:
+                result = await self._domatch(to_regexs(prompt), True)
+            except DriverReplacedException:
+                continue  # retry
+            return result
+
+    async def expect_prompt(self, consume=True):
+        """
+        Like :class:`Protocol.expect_prompt()`, but a coroutine.
+        """
+        if consume:
+            result = await self.expect(self.get_prompt())
+        else:
+            self._dbg(1, "DO NOT CONSUME PROMPT!")
+            result = await self.waitfor(self.get_prompt())
+
+        self._check_response(self.response)
+        return result
+
+    def cancel_expect(self):
+        self.cancel = True
+        if self.data_ready is not None:
+            self.data_ready.set()
+
+    async def close(self, force=False):
+        """
+        Like :class:`Protocol.close()`, but a coroutine.
+        """
+        Protocol.close(self, force)
+
+
+class _LineStream(object):
+
+    """
+    The asynchronous iterator that is returned by
+    :class:`AsyncProtocol.execute_stream()`.
+    """
+
+    def __init__(self, conn, command):
+        self.conn = conn
+        self.command = command
+        self.prompt = None
+        self.lines = deque()
+        self.lineno = 0
+        self.error = None
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def _read(self):
+        n, match = await self.conn.expect(self.prompt + [_line_end_re])
+        response = self.conn.response
+        for line in self.conn._split_stream_chunk(response, self.lineno == 0):
+            self.lineno += 1
+            if self.error is not None:
+                continue
+            if self.lineno > 1:
+                try:
+                    self.conn._check_line(line, line)
+                except InvalidCommandException as e:
+                    self.error = e
+                    continue
+            self.lines.append(line)
+        if n < len(self.prompt):
+            self.done = True
+
+    async def __anext__(self):
+        if self.prompt is None:
+            self.prompt = self.conn.get_prompt()
+            self.conn.send(self.command + '\r')
+        while not self.lines:
+            if self.done:
+                error, self.error = self.error, None
+                if error is not None:
+                    raise error
+                raise StopAsyncIteration
+            await self._read()
+        return self.lines.popleft()
+
+
+class _TelnetStream(asyncio.Protocol):
+
+    """
+    Implements the Telnet option negotiation on top of an asyncio
+    transport, and passes the remaining data to the AsyncTelnet adapter.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.transport = None
+        self.rawq = b''
+        self.can_naws = False
+        self.window_size = get_terminal_size()
+        self.decoder = codecs.getincrementaldecoder(conn.encoding)('replace')
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.rawq += data
+        cooked = self._process_rawq()
+        if cooked:
+            self.conn._data_received(self.decoder.decode(cooked))
+
+    def eof_received(self):
+        self.conn._eof_received()
+
+    def connection_lost(self, exc):
+        self.conn._eof_received()
+
+    def set_window_size(self, rows, cols):
+        if not self.can_naws:
+            return
+        self.window_size = rows, cols
+        size = bytes(bytearray((cols >> 8, cols & 0xff, rows >> 8, rows & 0xff)))
+        self.transport.write(IAC + SB + NAWS + size + IAC + SE)
+
+    def _process_rawq(self):
+        """
+        Removes all complete IAC sequences from the raw queue and returns
+        the data that remains. Incomplete sequences are left in the queue
+        until more data arrives.
+        """
+        rawq = self.rawq
+        cooked = []
+        pos = 0
+        while True:
+            iac = rawq.find(IAC, pos)
+            if iac == -1:
+                cooked.append(rawq[pos:])
+                pos = len(rawq)
+                break
+            cooked.append(rawq[pos:iac])
+            end = self._process_command(rawq, iac, cooked)
+            if end is None:
+                pos = iac
+                break
+            pos = end
+        self.rawq = rawq[pos:]
+        return b''.join(cooked)
+
+    def _process_command(self, rawq, pos, cooked):
+        command = rawq[pos + 1:pos + 2]
+        if not command:
+            return None
+        if command == theNULL:
+            return pos + 2
+        elif command == IAC:
+            cooked.append(IAC)
+            return pos + 2
+        elif command in (DO, DONT, WILL, WONT):
+            opt = rawq[pos + 2:pos + 3]
+            if not opt:
+                return None
+            self._negotiate(command, opt)
+            return pos + 3
+        elif command == SB:
+            end = rawq.find(IAC + SE, pos + 2)
+            if end == -1:
+                return None
+            if rawq[pos + 2:end] == TTYPE + SEND_TTYPE:
+                ttype = self.conn.termtype.encode('latin1')
+                self.transport.write(IAC + SB + TTYPE + theNULL + ttype + IAC + SE)
+            return end + 2
+        return pos + 2
+
+    def _negotiate(self, command, opt):
+        write = self.transport.write
+        if command == DO:
+            if opt == TTYPE:
+                write(IAC + WILL + opt)
+            elif opt == NAWS:
+                write(IAC + WILL + opt)
+                self.can_naws = True
+                self.set_window_size(*self.window_size)
+            else:
+                write(IAC + WONT + opt)
+        elif command == DONT:
+            write(IAC + WONT + opt)
+        elif opt == ECHO:
+            write(IAC + DO + opt)
+        else:
+            write(IAC + DONT + opt)
+
+
+class AsyncTelnet(AsyncProtocol):
+
+    """
+    The Telnet protocol adapter for asyncio.
+    """
+    DEFAULT_PORT = 23
+
+    def __init__(self, **kwargs):
+        AsyncProtocol.__init__(self, **kwargs)
+        self.stream = None
+
+    async def _connect_hook(self, hostname, port):
+        loop = self._get_loop()
+        addrinfo = await self._run_blocking(self.resolver.getaddrinfo,
+                                            hostname,
+                                            port or self.DEFAULT_PORT)
+        sock = await self._run_blocking(partial(open_socket,
+                                                rcvbuf=self.tcp_rcvbuf,
+                                                sndbuf=self.tcp_sndbuf),
+                                        addrinfo,
+                                        self.connect_timeout or None)
+        self._tune_socket(sock)
+        transport, self.stream = await loop.create_connection(
+            partial(_TelnetStream, self), sock=sock)
+        return True
+
+    def send(self, data):
+        self._dbg(4, 'Sending %s' % repr(data))
+        data = data.encode(self.encoding)
+        self.stream.transport.write(data.replace(IAC, IAC + IAC))
+
+    def _set_terminal_size(self, rows, cols):
+        self.stream.set_window_size(rows, cols)
+
+    async def close(self, force=False):
+        if self.stream is None:
+            return
+        if not force:
+            try:
+                while await self._fill_buffer():
+                    pass
+            except TimeoutException:
+                pass
+        self.stream.transport.close()
+        self.stream = None
+        self.buffer.clear()
+        await AsyncProtocol.close(self, force)
+
+
+class AsyncSSH2(AsyncProtocol):
+
+    """
+    The SSH2 protocol adapter for asyncio.
+
+    Paramiko offers no non-blocking API for the key exchange and the
+    authentication, so these steps are run in the event loop's
+    executor using a :class:`Exscript.protocols.SSH2` instance. Once
+    the shell is open, all data is read from within the event loop.
+    Writing to the channel may block, so data is sent from within
+    the executor.
+    """
+    DEFAULT_PORT = 22
+
+    def __init__(self,
+                 read_size=65536,
+                 known_hosts=None,
+                 jump_host=None,
+                 jump_host_pool=None,
+                 exec_mode=False,
+                 **kwargs):
+        """
+        .. HINT::
+            Also supports all keyword arguments that :class:`Protocol` supports.
+
+        :keyword read_size: The maximum number of bytes requested from the
+            channel in one read.
+        :keyword known_hosts: See :class:`Exscript.protocols.SSH2`.
+        :keyword jump_host: See :class:`Exscript.protocols.SSH2`.
+        :keyword jump_host_pool: See :class:`Exscript.protocols.SSH2`.
+        :keyword exec_mode: See :class:`Exscript.protocols.SSH2`.
+        """
+        AsyncProtocol.__init__(self, **kwargs)
+        kwargs['stdout'] = self.stdout
+        kwargs['stderr'] = self.stderr
+        kwargs['logfile'] = None
+        self.read_size = read_size
+        self.ssh = SSH2(read_size=read_size,
+                        known_hosts=known_hosts,
+                        jump_host=jump_host,
+                        jump_host_pool=jump_host_pool,
+                        exec_mode=exec_mode,
+                        **kwargs)
+        self.ssh.data_received_event.connect(self._ssh_data_received)
+        self.shell = None
+        self.reading = False
+        self.sending = None
+        self.decoder = codecs.getincrementaldecoder(self.encoding)('replace')
+
+    async def _connect_hook(self, hostname, port):
+        self.host = hostname
+        self.port = port or self.DEFAULT_PORT
+        await self._run_blocking(self.ssh._connect_hook, hostname, port)
+        return True
+
+    def _prepare_auth(self):
+        # Let the blocking adapter use whatever we learned so far.
+        self.ssh.set_driver(self.get_driver())
+        self.ssh.manual_password_re = self.manual_password_re
+
+    def _ssh_data_received(self, data):
+        # The output of exec channels is read by self.ssh in the executor.
+        self._get_loop().call_soon_threadsafe(self.data_received_event, data)
+
+    def _open_shell(self):
+        self.ssh.proto_authenticated = True
+        self.shell = self.ssh.shell
+        self._get_loop().add_reader(self.shell.fileno(), self._shell_readable)
+        self.reading = True
+
+    def _stop_reading(self):
+        if self.reading:
+            self.loop.remove_reader(self.shell.fileno())
+            self.reading = False
+
+    def _shell_readable(self):
+        data = []
+        while self.shell.recv_ready():
+            data.append(self.shell.recv(self.read_size))
+        if data:
+            self._data_received(self.decoder.decode(b''.join(data)))
+        if self.shell.eof_received or self.shell.closed:
+            self._stop_reading()
+            self._eof_received()
+
+    async def _send(self, previous, sendall, data):
+        # Waits for the previous write, such that data is sent in order.
+        if previous is not None:
+            await previous
+        await self._run_blocking(sendall, data)
+
+    async def _flush_send(self):
+        sending = self.sending
+        if sending is None:
+            return
+        try:
+            await sending
+        finally:
+            if self.sending is sending:
+                self.sending = None
+
+    async def _fill_buffer(self):
+        # Like the blocking adapter, wait until everything was sent
+        # before waiting for a response. Also passes on any errors that
+        # happened while sending. The response may have arrived in the
+        # meantime, so the caller checks the buffer again first.
+        if self.sending is not None:
+            await self._flush_send()
+            return True
+        return await AsyncProtocol._fill_buffer(self)
+
+    async def _protocol_authenticate(self, user, password):
+        self._prepare_auth()
+        await self._run_blocking(self.ssh._protocol_authenticate,
+                                 user,
+                                 password)
+        self._open_shell()
+
+    async def _protocol_authenticate_by_key(self, user, key):
+        self._prepare_auth()
+        await self._run_blocking(self.ssh._protocol_authenticate_by_key,
+                                 user,
+                                 key)
+        self._open_shell()
+
+    async def execute(self, command, consume=True):
+        """
+        Like :class:`Exscript.protocols.SSH2.execute()`, but a coroutine.
+        """
+        self._prepare_auth()
+        if not self.ssh._exec_enabled():
+            return await AsyncProtocol.execute(self, command, consume)
+        result = await self._run_blocking(self.ssh.execute, command, consume)
+        self.response = self.ssh.response
+        return result
+
+    def get_banner(self):
+        return self.ssh.get_banner()
+
+    def get_remote_version(self):
+        return self.ssh.get_remote_version()
+
+    def send(self, data):
+        self._dbg(4, 'Sending %s' % repr(data))
+        coro = self._send(self.sending, self.shell.sendall, data)
+        self.sending = self._get_loop().create_task(coro)
+
+    def _set_terminal_size(self, rows, cols):
+        self.shell.resize_pty(cols, rows)
+
+    async def close(self, force=False):
+        if self.sending is not None and force:
+            self.sending.cancel()
+            self.sending = None
+        if self.shell is not None:
+            if not force:
+                try:
+                    await self._fill_buffer()
+                except TimeoutException:
+                    pass
+            self._stop_reading()
+            self.shell = None
+        self.ssh.close(force=True)
+        self.buffer.clear()
+        await AsyncProtocol.close(self, force)
+
+
+class AsyncDummy(AsyncProtocol):
+
+    """
+    Like :class:`Exscript.protocols.Dummy`, this protocol adapter does
+    not open a network connection, but talks to a
+    :class:`Exscript.emulators.VirtualDevice` internally.
+    """
+
+    def __init__(self, device=None, **kwargs):
+        """
+        .. HINT::
+            Also supports all keyword arguments that :class:`Protocol` supports.
+
+        :keyword device: The :class:`Exscript.emulators.VirtualDevice` with
+            which to communicate.
+        """
+        AsyncProtocol.__init__(self, **kwargs)
+        self.device = device
+        self.init_done = False
+        if not self.device:
+            self.device = VirtualDevice('dummy', strict=False)
+
+    def is_dummy(self):
+        return True
+
+    def _doinit(self):
+        if not self.init_done:
+            self.init_done = True
+            self._data_received(self.device.init())
+
+    async def _fill_buffer(self):
+        # The device responds immediately, so if the buffer does not
+        # match, nothing that arrives later will.
+        if not self.init_done:
+            self._doinit()
+            return True
+        error = 'Error while waiting for response from device'
+        raise TimeoutException(error)
+
+    async def _connect_hook(self, hostname, port):
+        # To more correctly mimic the behavior of a network device, the
+        # banner is not sent here, but when authenticating.
+        self.buffer.clear()
+        return True
+
+    async def _protocol_authenticate(self, user, password):
+        self._doinit()
+
+    async def _protocol_authenticate_by_key(self, user, key):
+        self._doinit()
+
+    def send(self, data):
+        self._dbg(4, 'Sending %s' % repr(data))
+        self._data_received(self.device.do(data))
+
+    async def close(self, force=False):
+        self._data_received('\n')
+        self.buffer.clear()
+        await AsyncProtocol.close(self, force)
+
+
+async_protocol_map = {'dummy':  AsyncDummy,
+                      'pseudo': AsyncDummy,
+                      'telnet': AsyncTelnet,
+                      'ssh':    AsyncSSH2,
+                      'ssh2':   AsyncSSH2}
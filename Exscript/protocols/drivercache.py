@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+A persistent cache of the drivers that were detected for each host.
+"""
+from __future__ import absolute_import
+from builtins import object
+import time
+import sqlite3
+from contextlib import closing
+
+
+class DriverCache(object):
+
+    """
+    Remembers the driver that was detected for each host in an sqlite
+    database, such that subsequent connections to the same host start
+    with the right driver instead of discovering it again. Pass an
+    instance to a protocol adapter or to :class:`Exscript.Queue` to use
+    it::
+
+        cache = DriverCache('/var/cache/exscript/drivers.db')
+        queue = Queue(driver_cache=cache)
+
+    Entries expire after the given time to live, such that the driver
+    is detected again from time to time.
+
+    The database is opened for every lookup, so an instance may be
+    shared between threads and processes.
+    """
+
+    def __init__(self, filename, ttl=86400, min_confidence=50, timeout=10):
+        """
+        Constructor.
+
+        :type  filename: str
+        :param filename: The name of the database file. It is created if
+            it does not exist.
+        :type  ttl: int
+        :param ttl: The number of seconds after which an entry expires.
+        :type  min_confidence: int
+        :param min_confidence: Drivers that were detected with a lower
+            confidence are not stored.
+        :type  timeout: int
+        :param timeout: The number of seconds to wait for a lock on the
+            database.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.min_confidence = min_confidence
+        self.timeout = timeout
+        with self._connect() as db, db:
+            db.execute('CREATE TABLE IF NOT EXISTS driver ('
+                       ' key TEXT PRIMARY KEY,'
+                       ' driver TEXT NOT NULL,'
+                       ' confidence INTEGER NOT NULL,'
+                       ' updated REAL NOT NULL)')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.filename, timeout=self.timeout))
+
+    def get(self, key):
+        """
+        Returns the name of the driver that was stored for the given key,
+        and the confidence with which it was detected. Returns None if
+        there is no such entry, or if it has expired.
+
+        :type  key: str
+        :param key: The key, usually containing the address and port.
+        :rtype:  tuple(str, int)|None
+        :return: The name of the driver and the confidence, or None.
+        """
+        with self._connect() as db:
+            row = db.execute('SELECT driver, confidence, updated FROM driver'
+                             ' WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return None
+        driver, confidence, updated = row
+        if time.time() - updated > self.ttl:
+            return None
+        return driver, confidence
+
+    def set(self, key, driver, confidence):
+        """
+        Stores the given driver for the given key, unless the confidence
+        is below min_confidence.
+
+        :type  key: str
+        :param key: The key, usually containing the address and port.
+        :type  driver: str
+        :param driver: The name of the driver.
+        :type  confidence: int
+        :param confidence: The confidence with which it was detected.
+        """
+        if confidence < self.min_confidence:
+            return
+        with self._connect() as db, db:
+            db.execute('INSERT OR REPLACE INTO driver'
+                       ' (key, driver, confidence, updated)'
+                       ' VALUES (?, ?, ?, ?)',
+                       (key, driver, confidence, time.time()))
+
+    def remove(self, key):
+        """
+        Removes the entry for the given key, if any.
+
+        :type  key: str
+        :param key: The key, usually containing the address and port.
+        """
+        with self._connect() as db, db:
+            db.execute('DELETE FROM driver WHERE key=?', (key,))
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._connect() as db, db:
+            db.execute('DELETE FROM driver')
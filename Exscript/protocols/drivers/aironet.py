@@ -33,7 +33,7 @@ _prompt_re = [
 _error_re = [re.compile(r'Incorrect\susage', re.I),
              re.compile(r'Incorrect\sinput', re.I),
              re.compile(r'connection timed out', re.I),
-             re.compile(r'[^\r\n]+ not found', re.I)]
+             re.compile(r'[^\r\n] not found', re.I)]
 
 
 class AironetDriver(Driver):
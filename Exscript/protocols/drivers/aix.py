@@ -37,6 +37,7 @@ class AIXDriver(Driver):
         Driver.__init__(self, 'aix')
         self.user_re = _user_re
         self.password_re = _password_re
+        self.exec_channel = True
 
     def check_head_for_os(self, string):
         if _user_re[0].search(string):
@@ -34,7 +34,7 @@ _error_re = [re.compile(r'%Error'),
              re.compile(r'invalid input', re.I),
              re.compile(r'(?:incomplete|ambiguous) command', re.I),
              re.compile(r'connection timed out', re.I),
-             re.compile(r'[^\r\n]+ not found', re.I)]
+             re.compile(r'[^\r\n] not found', re.I)]
 _aruba_prompt_re = [re.compile(r'\(Aruba\d?\d?\d?\d?\) >')]
 
 
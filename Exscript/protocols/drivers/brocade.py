@@ -36,7 +36,7 @@ _error_re = [re.compile(r'%Error'),
              re.compile(r'Invalid input', re.I),
              re.compile(r'(?:incomplete|ambiguous) command', re.I),
              re.compile(r'connection timed out', re.I),
-             re.compile(r'[^\r\n]+ not found', re.I)]
+             re.compile(r'[^\r\n] not found', re.I)]
 
 
 class BrocadeDriver(Driver):
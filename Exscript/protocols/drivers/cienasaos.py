@@ -11,7 +11,7 @@ _error_re = [re.compile(r'SHELL PARSER FAILURE'),
              re.compile(r'invalid input', re.I),
              re.compile(r'(?:incomplete|ambiguous) command', re.I),
              re.compile(r'connection timed out', re.I),
-             re.compile(r'[^\r\n]+ not found', re.I)]
+             re.compile(r'[^\r\n] not found', re.I)]
 
 
 class CienaSAOSDriver(Driver):
@@ -88,6 +88,7 @@ class Driver(object):
         self.error_re = _error_re
         self.login_error_re = _login_fail_re
         self.reconnect_between_auth_methods = False
+        self.exec_channel = False  # See the exec_mode argument of SSH2.
 
     def check_protocol_for_os(self, string):
         return 0
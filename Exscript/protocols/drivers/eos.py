@@ -74,6 +74,7 @@ class EOSDriver(Driver):
         self.prompt_re = _prompt_re
         self.error_re = _error_re
         self.login_error_re = _login_fail_re
+        self.exec_channel = True
 
     def init_terminal(self, conn):
         conn.execute('terminal dont-ask')
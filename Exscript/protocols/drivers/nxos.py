@@ -33,7 +33,7 @@ _error_re = [re.compile(r'%Error'),
              re.compile(r'invalid input', re.I),
              re.compile(r'(?:incomplete|ambiguous) command', re.I),
              re.compile(r'connection timed out', re.I),
-             re.compile(r'[^\r\n]+ not found', re.I)]
+             re.compile(r'[^\r\n] not found', re.I)]
 
 
 class NXOSDriver(Driver):
@@ -44,6 +44,7 @@ class NXOSDriver(Driver):
         self.password_re = _password_re
         self.prompt_re = _prompt_re
         self.error_re = _error_re
+        self.exec_channel = True
 
     def check_head_for_os(self, string):
         if 'Cisco Nexus Operating System (NX-OS) Software' in string:
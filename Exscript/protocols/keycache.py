@@ -0,0 +1,313 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Process-wide caches for SSH host keys and private keys.
+"""
+from __future__ import absolute_import
+from builtins import object
+import os
+import copy
+import atexit
+import hashlib
+import threading
+import paramiko
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows.
+
+
+class FileCache(object):
+
+    """
+    A thread-safe cache for objects that are parsed from files. An entry
+    is reused for as long as the modification time and size of the file
+    remain unchanged. Files that fail to parse are remembered as well,
+    and raise the same error again until they change.
+
+    Each entry has a lock of its own, so loading a file blocks only the
+    threads that need the same entry.
+    """
+
+    def __init__(self, load, make_key=None):
+        """
+        Constructor.
+
+        :type  load: callable
+        :param load: A function that is called with a filename and any
+            extra arguments that are passed to get(), and returns the
+            parsed object.
+        :type  make_key: callable
+        :param make_key: A function that is called with the extra
+            arguments that are passed to get(), and returns a tuple that
+            is used in the cache key instead of them. By default, the
+            arguments are used as they are.
+        """
+        self.load = load
+        self.make_key = make_key
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _raise(self, error):
+        # Raises a copy of the given exception, such that each caller
+        # gets an exception with a traceback of its own.
+        try:
+            error = copy.copy(error)
+        except Exception:
+            # The constructor does not accept the args of the exception,
+            # so copy it without calling the constructor.
+            cls = error.__class__
+            try:
+                copied = cls.__new__(cls)
+                copied.args = error.args
+                copied.__dict__.update(error.__dict__)
+                error = copied
+            except Exception:
+                pass  # Raise the cached instance.
+        raise error
+
+    def get(self, filename, *args):
+        """
+        Returns the object that was parsed from the given file, parsing
+        it only if the file has changed since it was last parsed.
+
+        :type  filename: str
+        :param filename: The name of the file.
+        :type  args: object
+        :param args: Passed to the load function; part of the cache key.
+        :rtype:  object
+        :return: The parsed object.
+        """
+        filename = os.path.abspath(os.path.expanduser(filename))
+        stat = os.stat(filename)
+        if self.make_key is None:
+            key = (filename,) + args
+        else:
+            key = (filename,) + self.make_key(*args)
+        version = stat.st_mtime, stat.st_size
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                try:
+                    entry = version, self.load(filename, *args), None
+                except Exception as e:
+                    # Drop the frames of the load function, which may
+                    # reference the password.
+                    e.__traceback__ = None
+                    entry = version, None, e
+                with self.lock:
+                    self.entries[key] = entry
+        version, value, error = entry
+        if error is not None:
+            self._raise(error)
+        return value
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.key_locks.clear()
+
+
+class _KnownHosts(object):
+
+    # A parsed known_hosts file that also remembers the result of each
+    # lookup, because looking up hashed entries requires computing a HMAC
+    # for every line of the file.
+
+    def __init__(self, filename):
+        self.host_keys = paramiko.HostKeys(filename)
+        self.lookups = {}
+
+    def lookup(self, hostname):
+        result = self.lookups.get(hostname)
+        if result is None:
+            keys = self.host_keys.lookup(hostname)
+            result = self.lookups[hostname] = dict(keys or {})
+        return result
+
+
+def _load_private_key(filename, pkey_class, password):
+    return pkey_class.from_private_key_file(filename, password)
+
+
+def _private_key_id(pkey_class, password):
+    # The password is not kept in the cache key.
+    if password is None:
+        return pkey_class, None
+    if not isinstance(password, bytes):
+        password = password.encode('utf-8')
+    return pkey_class, hashlib.sha256(password).hexdigest()
+
+
+#: Parsed known_hosts files.
+host_key_cache = FileCache(_KnownHosts)
+
+#: Parsed (and decrypted) private key files.
+private_key_cache = FileCache(_load_private_key, _private_key_id)
+
+
+def lookup_host_keys(filename, hostname):
+    """
+    Returns the keys of the given host from the given known_hosts file.
+
+    :type  filename: str
+    :param filename: The name of the known_hosts file.
+    :type  hostname: str
+    :param hostname: The name or address of the host.
+    :rtype:  dict(str: paramiko.PKey)
+    :return: Maps key types to keys. The dict must not be modified.
+    """
+    return host_key_cache.get(filename).lookup(hostname)
+
+
+def load_private_key(pkey_class, filename, password=None):
+    """
+    Like pkey_class.from_private_key_file(), but returns a cached key if
+    the file was loaded before with the same password. If the key failed
+    to load, the error is raised again without parsing the file, until
+    the file changes.
+
+    :type  pkey_class: class
+    :param pkey_class: A subclass of paramiko.PKey.
+    :type  filename: str
+    :param filename: The name of the key file.
+    :type  password: str
+    :param password: The password of the key, if any.
+    :rtype:  paramiko.PKey
+    :return: The key.
+    """
+    return private_key_cache.get(filename, pkey_class, password)
+
+
+class KnownHostsWriter(object):
+
+    """
+    Appends host keys to a known_hosts file. Keys are collected and
+    written in batches, holding a lock that also protects the file from
+    concurrent writes by other processes (where supported).
+    """
+
+    def __init__(self, filename, batch_size=100):
+        """
+        Constructor.
+
+        :type  filename: str
+        :param filename: The name of the known_hosts file.
+        :type  batch_size: int
+        :param batch_size: The number of keys that are written at once.
+        """
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = {}  # (hostname, keytype) -> key
+
+    def add(self, hostname, key):
+        """
+        Adds the given key to the file. The key is written once the batch
+        is full, or when flush() is called.
+
+        :type  hostname: str
+        :param hostname: The name or address of the host.
+        :type  key: paramiko.PKey
+        :param key: The key.
+        """
+        with self.lock:
+            self.pending[hostname, key.get_name()] = key
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def lookup(self, hostname):
+        """
+        Returns the keys of the given host that were not yet written.
+
+        :type  hostname: str
+        :param hostname: The name or address of the host.
+        :rtype:  dict(str: paramiko.PKey)
+        :return: Maps key types to keys.
+        """
+        with self.lock:
+            return dict((keytype, key)
+                        for (host, keytype), key in self.pending.items()
+                        if host == hostname)
+
+    def _flush(self):
+        if not self.pending:
+            return
+        lines = [' '.join((hostname, keytype, key.get_base64())) + '\n'
+                 for (hostname, keytype), key in self.pending.items()]
+        with open(self.filename, 'a') as fp:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            fp.write(''.join(lines))
+        self.pending.clear()
+
+    def flush(self):
+        """
+        Writes all keys that were added so far.
+        """
+        with self.lock:
+            self._flush()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_known_hosts_writer(filename):
+    """
+    Returns the process-wide KnownHostsWriter for the given file. All
+    writers are flushed when the interpreter exits.
+
+    :type  filename: str
+    :param filename: The name of the known_hosts file.
+    :rtype:  KnownHostsWriter
+    :return: The writer.
+    """
+    filename = os.path.abspath(os.path.expanduser(filename))
+    with _writers_lock:
+        writer = _writers.get(filename)
+        if writer is None:
+            writer = _writers[filename] = KnownHostsWriter(filename)
+        return writer
+
+
+@atexit.register
+def flush_known_hosts():
+    """
+    Writes the pending keys of all KnownHostsWriter instances that were
+    created using get_known_hosts_writer().
+    """
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
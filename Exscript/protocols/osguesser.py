@@ -22,7 +22,16 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import print_function
 from builtins import object
-from Exscript.protocols.drivers import drivers
+from Exscript.protocols.drivers import drivers, Driver
+
+
+def _get_checks(method):
+    # Returns the given check function of all drivers that implement it,
+    # such that no time is wasted calling the no-op defaults.
+    default = getattr(Driver, method).__code__
+    return [getattr(d, '_' + method.split('_for_')[0])
+            for d in drivers
+            if getattr(d, method).__code__ is not default]
 
 
 class OsGuesser(object):
@@ -36,19 +45,37 @@ class OsGuesser(object):
     adapter. However, the protocol adapter may request information
     from the OsGuesser, and perform changes based on the information
     provided.
+
+    During the login procedure, only the newly received data and the
+    preceding window_size characters are searched, and no further data
+    is searched once the OS is known with a confidence of at least
+    lock_confidence.
     """
 
-    def __init__(self):
+    def __init__(self, window_size=256, lock_confidence=90):
+        """
+        Constructor.
+
+        :type  window_size: int
+        :param window_size: The number of previously received characters
+            that are searched together with new data.
+        :type  lock_confidence: int
+        :param lock_confidence: The confidence at which guessing during
+            the login procedure stops.
+        """
         self.info = {}
         self.debug = False
-        self.protocol_os_map = [d._check_protocol for d in drivers]
-        self.auth_os_map = [d._check_head for d in drivers]
-        self.os_map = [d._check_response for d in drivers]
+        self.window_size = window_size
+        self.lock_confidence = lock_confidence
+        self.protocol_os_map = _get_checks('check_protocol_for_os')
+        self.auth_os_map = _get_checks('check_head_for_os')
+        self.os_map = _get_checks('check_response_for_os')
         self.auth_buffer = ''
+        self.auth_truncated = False
         self.set('os', 'unknown', 0)
 
     def reset(self, auth_buffer=''):
-        self.__init__()
+        self.__init__(self.window_size, self.lock_confidence)
         self.auth_buffer = auth_buffer
 
     def set(self, key, value, confidence=100):
@@ -100,6 +127,16 @@ class OsGuesser(object):
             return value
         return None
 
+    def is_locked(self):
+        """
+        Returns True if the OS is known with a confidence that is high
+        enough to stop guessing.
+
+        :rtype:  bool
+        :return: Whether the OS is locked in.
+        """
+        return self.get('os', self.lock_confidence) not in ('unknown', None)
+
     def data_received(self, data, app_authentication_done):
         # If the authentication procedure is complete, use the normal
         # "runtime" matchers.
@@ -109,12 +146,25 @@ class OsGuesser(object):
                 self.set_from_match('os', self.os_map, data)
             return
 
-        # Else, check the head that we collected so far.
-        self.auth_buffer += data
+        # Stop looking if we are already certain enough.
+        if self.is_locked():
+            return
+
+        # Else, check the new data together with the tail of the head
+        # that we collected so far.
+        head = self.auth_buffer + data
+        window = head
+        if self.auth_truncated:
+            # Start at a line boundary, such that anchored expressions
+            # do not match a partial line.
+            window = head[head.find('\n') + 1:]
         if self.debug:
-            print("DEBUG: Matching buffer:", repr(self.auth_buffer))
-        self.set_from_match('os', self.auth_os_map, self.auth_buffer)
-        self.set_from_match('os', self.os_map,      self.auth_buffer)
+            print("DEBUG: Matching buffer:", repr(window))
+        self.set_from_match('os', self.auth_os_map, window)
+        self.set_from_match('os', self.os_map,      window)
+        if len(head) > self.window_size:
+            self.auth_truncated = True
+        self.auth_buffer = head[-self.window_size:]
 
     def protocol_info(self, data):
         if self.debug:
@@ -0,0 +1,207 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+A pool of open, authenticated connections.
+"""
+from __future__ import absolute_import
+from builtins import object
+import time
+import threading
+from collections import OrderedDict
+
+
+def _check_prompt(conn):
+    conn.send('\r')
+    conn.expect_prompt()
+    return True
+
+
+class ConnectionPool(object):
+
+    """
+    Keeps connections open after use, such that subsequent jobs that
+    talk to the same host can skip the TCP handshake, the key exchange,
+    and the login procedure. Pass an instance to :class:`Exscript.Queue`
+    to use it::
+
+        pool = ConnectionPool(max_size=50, idle_timeout=600)
+        queue = Queue(connection_pool=pool)
+        queue.run(hosts, autologin()(do_something))
+        queue.join()
+        queue.run(hosts, autologin()(do_something))  # Reuses the sessions
+        ...
+        queue.destroy()
+        pool.close()
+
+    Connections are looked up using the address, TCP port and protocol
+    of the host, and the account that was used to log in. If an account
+    is attached to the host, only connections that were logged in with
+    that account are handed out; otherwise, only connections for which
+    the account was chosen by the account manager are.
+    Only connections that completed the login procedure using a known
+    account are kept.
+    """
+
+    def __init__(self,
+                 max_size=20,
+                 idle_timeout=300,
+                 keepalive=60,
+                 health_check=None):
+        """
+        Constructor.
+
+        :type  max_size: int
+        :param max_size: The maximum number of idle connections. If the
+            pool is full, the least recently used connection is closed.
+        :type  idle_timeout: int
+        :param idle_timeout: Connections that were not used for the given
+            number of seconds are closed.
+        :type  keepalive: int
+        :param keepalive: Passed to :class:`Protocol.set_keepalive()` for
+            every connection that is added to the pool. 0 disables
+            keepalives.
+        :type  health_check: callable
+        :param health_check: A function that is called with a connection
+            before it is handed out. If it returns False or raises an
+            exception, the connection is closed. By default, the pool
+            sends a newline and waits for the prompt.
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.health_check = health_check or _check_prompt
+        self.lock = threading.Lock()
+        # id(conn) -> (key, account hash, conn, time)
+        self.connections = OrderedDict()
+
+    def __len__(self):
+        return len(self.connections)
+
+    def _get_key(self, host):
+        account = host.get_account()
+        return (host.get_address(),
+                host.get_tcp_port(),
+                host.get_protocol(),
+                account.__hash__() if account else None)
+
+    def _close(self, conn):
+        try:
+            conn.close(force=True)
+        except Exception:
+            pass  # The connection is discarded anyway.
+
+    def _expire(self, now):
+        # Must be called with the lock held.
+        expired = []
+        for conn_id, entry in list(self.connections.items()):
+            conn, last_used = entry[2:]
+            if now - last_used > self.idle_timeout:
+                del self.connections[conn_id]
+                expired.append(conn)
+        return expired
+
+    def _matches(self, key, entry):
+        conn_key, account_hash = entry[:2]
+        if key[3] is None:
+            return conn_key == key
+        return conn_key[:3] == key[:3] and account_hash == key[3]
+
+    def _pop(self, key):
+        with self.lock:
+            expired = self._expire(time.time())
+            found = None
+            for conn_id, entry in reversed(list(self.connections.items())):
+                conn = entry[2]
+                if self._matches(key, entry):
+                    del self.connections[conn_id]
+                    found = conn
+                    break
+        for conn in expired:
+            self._close(conn)
+        return found
+
+    def acquire(self, host):
+        """
+        Removes an open connection to the given host from the pool and
+        returns it. The connection is checked using the health check
+        first. Returns None if there is no usable connection.
+
+        :type  host: Host
+        :param host: The host to which a connection is needed.
+        :rtype:  Protocol|None
+        :return: An authenticated connection, or None.
+        """
+        key = self._get_key(host)
+        while True:
+            conn = self._pop(key)
+            if conn is None:
+                return None
+            try:
+                if self.health_check(conn):
+                    return conn
+            except Exception:
+                pass
+            self._close(conn)
+
+    def release(self, host, conn):
+        """
+        Returns the given connection to the pool. Connections that have
+        not completed the login procedure, or for which the account that
+        was used to log in is unknown, are closed instead.
+
+        :type  host: Host
+        :param host: The host to which the connection is open.
+        :type  conn: Protocol
+        :param conn: The connection.
+        """
+        account = conn.last_account
+        if not conn.is_app_authenticated() or account is None:
+            self._close(conn)
+            return
+        key = self._get_key(host)
+        account_hash = account.__hash__()
+        if key[3] is not None and key[3] != account_hash:
+            # Logged in using a different account than the one that is
+            # attached to the host.
+            self._close(conn)
+            return
+        conn.set_keepalive(self.keepalive)
+        with self.lock:
+            self.connections[id(conn)] = key, account_hash, conn, time.time()
+            evicted = []
+            while len(self.connections) > self.max_size:
+                conn_id, entry = self.connections.popitem(last=False)
+                evicted.append(entry[2])
+            evicted += self._expire(time.time())
+        for old in evicted:
+            self._close(old)
+
+    def close(self):
+        """
+        Closes all connections in the pool.
+        """
+        with self.lock:
+            connections = [entry[2] for entry in self.connections.values()]
+            self.connections.clear()
+        for conn in connections:
+            self._close(conn)
@@ -34,16 +34,18 @@ import socket
 import signal
 import errno
 import os
-from io import StringIO
 from functools import partial
+from tempfile import SpooledTemporaryFile
 from ..util.impl import Context, _Context
-from ..util.buffer import MonitoredBuffer
+from ..util.buffer import MonitoredBuffer, RingBuffer, LineMatcher
 from ..util.crypt import otp
 from ..util.event import Event
 from ..util.cast import to_regexs
 from ..util.tty import get_terminal_size
 from .drivers import driver_map, Driver
 from .osguesser import OsGuesser
+from .resolver import default_resolver
+from .sockets import open_socket, tune_socket
 from .exception import InvalidCommandException, LoginFailure, \
         TimeoutException, DriverReplacedException, ExpectCancelledException
 
@@ -56,6 +58,14 @@ except ImportError:
 
 _skey_re = re.compile(r'(?:s\/key|otp-md4) (\d+) (\S+)(?=\s|[\r\n])')
 
+# Matches the end of the last complete line, leaving the line break in
+# the buffer such that the prompt can still be matched.
+_line_end_re = re.compile(r'(?<=[^\r\n])(?=[\r\n]+[^\r\n]*\Z)')
+
+# Maps each set of error prompts to a LineMatcher, which is shared by all
+# connections that use the same driver.
+_error_matchers = {}
+
 
 class Protocol(object):
 
@@ -211,6 +221,7 @@ class Protocol(object):
           timing issues (this is a race condition that I'm not going to
           detail here).
     """
+    DEFAULT_PORT = None  # The TCP port that is used if none is given
 
     def __init__(self,
                  driver=None,
@@ -224,7 +235,17 @@ class Protocol(object):
                  verify_fingerprint=True,
                  account_factory=None,
                  banner_timeout=20,
-                 encoding='latin-1'):
+                 encoding='latin-1',
+                 capture='ring',
+                 capture_size=65536,
+                 driver_cache=None,
+                 resolver=None,
+                 tcp_nodelay=True,
+                 tcp_keepalive=0,
+                 tcp_keepalive_interval=None,
+                 tcp_keepalive_count=None,
+                 tcp_rcvbuf=None,
+                 tcp_sndbuf=None):
         """
         Constructor.
         The following events are provided:
@@ -235,7 +256,7 @@ class Protocol(object):
 
         :keyword driver: Driver()|str
         :keyword stdout: Where to write the device response. Defaults to
-            an in-memory buffer.
+            a buffer that is chosen using the capture argument.
         :keyword stderr: Where to write debug info. Defaults to stderr.
         :keyword debug: An integer between 0 (no debugging) and 5 (very
             verbose debugging) that specifies the amount of debug info
@@ -252,6 +273,40 @@ class Protocol(object):
         :keyword banner_timeout: The time to wait for the banner.
         :type encoding: str
         :keyword encoding: The encoding of data received from the remote host.
+        :type capture: str
+        :keyword capture: How the device response is kept if no stdout is
+            given. 'ring' keeps the last capture_size characters in memory,
+            'file' keeps everything, but moves it to a temporary file once
+            it exceeds capture_size characters, and 'off' discards it.
+        :type capture_size: int
+        :keyword capture_size: See the capture argument.
+        :type driver_cache: DriverCache
+        :keyword driver_cache: Remembers the detected driver of each host;
+            see :class:`Exscript.protocols.DriverCache`.
+        :type resolver: Resolver
+        :keyword resolver: Looks up the address of the host. Defaults to
+            a cache that is shared by all connections in the process; see
+            :class:`Exscript.protocols.Resolver`.
+        :type tcp_nodelay: bool
+        :keyword tcp_nodelay: Whether to disable Nagle's algorithm, such
+            that small writes are sent without waiting for the previous
+            packet to be acknowledged. None keeps the system default.
+        :type tcp_keepalive: int
+        :keyword tcp_keepalive: Enables TCP keepalives after the given
+            number of idle seconds, such that idle connections are not
+            dropped by firewalls. 0 keeps the system default.
+        :type tcp_keepalive_interval: int
+        :keyword tcp_keepalive_interval: The number of seconds between
+            unanswered keepalives. Defaults to tcp_keepalive.
+        :type tcp_keepalive_count: int
+        :keyword tcp_keepalive_count: The number of unanswered keepalives
+            after which the connection is dropped.
+        :type tcp_rcvbuf: int
+        :keyword tcp_rcvbuf: The size of the socket receive buffer in
+            bytes. None keeps the system default.
+        :type tcp_sndbuf: int
+        :keyword tcp_sndbuf: The size of the socket send buffer in bytes.
+            None keeps the system default.
         """
         self.data_received_event = Event()
         self.otp_requested_event = Event()
@@ -269,6 +324,7 @@ class Protocol(object):
         self.host = None
         self.port = None
         self.last_account = None
+        self.pooled = False
         self.termtype = termtype
         self.verify_fingerprint = verify_fingerprint
         self.manual_driver = None
@@ -281,11 +337,29 @@ class Protocol(object):
         self.account_factory = account_factory
         self.banner_timeout = banner_timeout
         self.encoding = encoding
+        self.driver_cache = driver_cache
+        self.driver_cache_key = None
+        self.cached_driver = None
         self.send_data = None
-        if stdout is None:
-            self.stdout = StringIO()
-        else:
+        if resolver is None:
+            resolver = default_resolver
+        self.resolver = resolver
+        self.tcp_nodelay = tcp_nodelay
+        self.tcp_keepalive = tcp_keepalive
+        self.tcp_keepalive_interval = tcp_keepalive_interval
+        self.tcp_keepalive_count = tcp_keepalive_count
+        self.tcp_rcvbuf = tcp_rcvbuf
+        self.tcp_sndbuf = tcp_sndbuf
+        if stdout is not None:
             self.stdout = stdout
+        elif capture == 'ring':
+            self.stdout = RingBuffer(capture_size)
+        elif capture == 'file':
+            self.stdout = SpooledTemporaryFile(capture_size, mode='w+')
+        elif capture == 'off':
+            self.stdout = None
+        else:
+            raise ValueError('invalid capture type: ' + repr(capture))
         if stderr is None:
             self.stderr = sys.stderr
         else:
@@ -343,8 +417,9 @@ class Protocol(object):
             text = data
 
         # Write to a logfile.
-        self.stdout.write(text)
-        self.stdout.flush()
+        if self.stdout is not None:
+            self.stdout.write(text)
+            self.stdout.flush()
         if self.log is not None:
             self.log.write(text)
 
@@ -617,6 +692,25 @@ class Protocol(object):
         """
         raise NotImplementedError()
 
+    def _tune_socket(self, sock):
+        # Called by the _connect_hook() implementations.
+        tune_socket(sock,
+                    self.tcp_nodelay,
+                    self.tcp_keepalive,
+                    self.tcp_keepalive_interval,
+                    self.tcp_keepalive_count)
+
+    def _connect_socket(self, hostname, port):
+        # Called by the _connect_hook() implementations. Returns a
+        # connected and tuned socket.
+        addrinfo = self.resolver.getaddrinfo(hostname, port)
+        sock = open_socket(addrinfo,
+                           self.connect_timeout or None,
+                           rcvbuf=self.tcp_rcvbuf,
+                           sndbuf=self.tcp_sndbuf)
+        self._tune_socket(sock)
+        return sock
+
     def connect(self, hostname=None, port=None):
         """
         Opens the connection to the remote host or IP address.
@@ -629,12 +723,57 @@ class Protocol(object):
         if hostname is not None:
             self.host = hostname
         conn = self._connect_hook(self.host, port)
+        self._load_cached_driver(port)
         self.os_guesser.protocol_info(self.get_remote_version())
         self.auto_driver = driver_map[self.guess_os()]
         if self.get_banner():
             self.os_guesser.data_received(self.get_banner(), False)
         return conn
 
+    def _load_cached_driver(self, port):
+        # Starts with the driver that was detected the last time, if any.
+        if self.driver_cache is None:
+            return
+        port = port or self.DEFAULT_PORT
+        if port is None:
+            self.driver_cache_key = self.host
+        else:
+            self.driver_cache_key = '%s:%s' % (self.host, port)
+        self.cached_driver = self.driver_cache.get(self.driver_cache_key)
+        if self.cached_driver is None:
+            return
+        name, confidence = self.cached_driver
+        if name in driver_map:
+            # Stay below the lock confidence, such that the OS guesser
+            # keeps looking and can correct a wrong entry.
+            lock_confidence = self.os_guesser.lock_confidence
+            confidence = min(confidence, lock_confidence - 1)
+            self.os_guesser.set('os', name, confidence)
+            self.auto_driver = driver_map[self.guess_os()]
+
+    def _store_cached_driver(self):
+        # Remembers the detected driver, unless it is what the cache
+        # already said.
+        if self.driver_cache_key is None:
+            return
+        confidence, name = self.os_guesser.info['os']
+        if name == 'unknown':
+            return
+        if self.cached_driver is not None:
+            cached_name, cached_confidence = self.cached_driver
+            if name == cached_name and confidence <= cached_confidence:
+                return
+        self.driver_cache.set(self.driver_cache_key, name, confidence)
+        self.cached_driver = name, confidence
+
+    def _remove_cached_driver(self):
+        # Called when the login failed. The cached driver may be wrong,
+        # or the device may have been replaced.
+        if self.driver_cache_key is None or self.cached_driver is None:
+            return
+        self.driver_cache.remove(self.driver_cache_key)
+        self.cached_driver = None
+
     def _get_account(self, account):
         if isinstance(account, Context) or isinstance(account, _Context):
             return account.context()
@@ -722,12 +861,16 @@ class Protocol(object):
             user = account.get_name()
             password = account.get_password()
             key = account.get_key()
-            if key is None:
-                self._dbg(1, "Attempting to authenticate %s." % user)
-                self._protocol_authenticate(user, password)
-            else:
-                self._dbg(1, "Authenticate %s with key." % user)
-                self._protocol_authenticate_by_key(user, key)
+            try:
+                if key is None:
+                    self._dbg(1, "Attempting to authenticate %s." % user)
+                    self._protocol_authenticate(user, password)
+                else:
+                    self._dbg(1, "Authenticate %s with key." % user)
+                    self._protocol_authenticate_by_key(user, key)
+            except LoginFailure:
+                self._remove_cached_driver()
+                raise
         self.proto_authenticated = True
 
     def is_protocol_authenticated(self):
@@ -867,8 +1010,13 @@ class Protocol(object):
             user = account.get_name()
             password = account.get_password()
             self._dbg(1, "Attempting to app-authenticate %s." % user)
-            self._app_authenticate(account, password, flush, bailout)
+            try:
+                self._app_authenticate(account, password, flush, bailout)
+            except (LoginFailure, TimeoutException):
+                self._remove_cached_driver()
+                raise
         self.app_authenticated = True
+        self._store_cached_driver()
 
     def is_app_authenticated(self):
         """
@@ -973,6 +1121,156 @@ class Protocol(object):
         self.send(command + '\r')
         return self.expect_prompt(consume)
 
+    def execute_stream(self, command):
+        """
+        Like execute(), but returns a generator that yields the lines of
+        the response as they are received, instead of collecting the
+        whole response in memory. The first line is the echo of the
+        command. Line breaks are removed.
+
+        Each line is checked for errors as it arrives. If an error prompt
+        matches, the remainder of the response is read and discarded,
+        and InvalidCommandException is raised.
+
+        If the iteration is stopped before the prompt was received, the
+        rest of the response is left in the buffer.
+        The response attribute (self.response) only contains the last
+        chunk of the response.
+
+        :type  command: string
+        :param command: The data that is sent to the remote host.
+        :rtype:  generator
+        :return: A generator of strings.
+        """
+        self.send(command + '\r')
+        prompt = self.get_prompt()
+        regexs = prompt + [_line_end_re]
+        error = None
+        lineno = 0
+        while True:
+            n, match = self.expect(regexs)
+            for line in self._split_stream_chunk(self.response, lineno == 0):
+                lineno += 1
+                if error is not None:
+                    continue
+                if lineno > 1:
+                    try:
+                        self._check_line(line, line)
+                    except InvalidCommandException as e:
+                        error = e
+                        continue
+                yield line
+            if n < len(prompt):
+                break
+        if error is not None:
+            raise error
+
+    def _split_stream_chunk(self, response, first):
+        # Splits a chunk of the response that was read by execute_stream()
+        # into lines.
+        # Depending on the protocol, the response may include the line
+        # break that precedes the match.
+        if response.endswith('\n'):
+            response = response[:-1]
+        if response.endswith('\r'):
+            response = response[:-1]
+        response = response.replace('\r\n', '\n')
+        lines = response.replace('\r', '\n').split('\n')
+        if not first:
+            # The chunk starts with the line break after the
+            # previous chunk.
+            lines = lines[1:]
+        return lines
+
+    def _split_responses(self, data, commands):
+        # Splits the given data at the echo of each of the given commands,
+        # if the echo directly follows a prompt. Returns the responses
+        # that precede each echo, without the prompt, and the remainder.
+        responses = []
+        start = 0
+        for command in commands:
+            pos = data.find(command, start + 1)
+            while pos >= 0:
+                # Like in expect(), only the tail is searched for a prompt.
+                offset = max(start, pos - 150)
+                match = None
+                for prompt in self.get_prompt():
+                    match = prompt.search(data[offset:pos])
+                    if match is not None:
+                        break
+                if match is not None:
+                    break
+                pos = data.find(command, pos + 1)
+            if pos < 0:
+                break
+            responses.append(data[start:offset + match.start()])
+            start = pos
+        responses.append(data[start:])
+        return responses
+
+    def _check_responses(self, responses):
+        # Returns the first InvalidCommandException for the given responses,
+        # if any.
+        error = None
+        for response in responses:
+            try:
+                self._check_response(response)
+            except InvalidCommandException as e:
+                error = error or e
+        return error
+
+    def execute_many(self, commands, window=10):
+        """
+        Like execute(), but for a list of commands. Instead of waiting
+        for the response of each command before sending the next one,
+        up to the given number of commands are sent ahead, which saves
+        one round trip per command.
+
+        The data received from the remote host is split into responses
+        by looking for the echo of each command that follows a prompt.
+        This requires the remote host to echo the commands, and to
+        buffer input that is received while a command is running, as
+        most devices do.
+
+        Like in expect_prompt(), each response is checked for errors.
+        If an error is found, no further commands are sent, and
+        InvalidCommandException is raised after the responses of the
+        commands that were already sent are received.
+        The response attribute (self.response) contains the response
+        of the last command that was received.
+
+        :type  commands: list(string)
+        :param commands: The commands that are sent to the remote host.
+        :type  window: int
+        :param window: The maximum number of commands that are sent ahead.
+        :rtype:  list(string)
+        :return: The response of each command, without the prompt.
+        """
+        commands = list(commands)
+        responses = []
+        error = None
+        sent = 0
+        while len(responses) < sent or (error is None and
+                                        sent < len(commands)):
+            while error is None and sent < len(commands) \
+                    and sent - len(responses) < max(window, 1):
+                self.send(commands[sent] + '\r')
+                sent += 1
+
+            # Each prompt at the end of the data completes at least one
+            # command.
+            self.expect(self.get_prompt())
+            in_flight = commands[len(responses) + 1:sent]
+            completed = self._split_responses(self.response, in_flight)
+            responses += completed
+            error = error or self._check_responses(completed)
+
+        if responses:
+            self.response = responses[-1]
+        if error is not None:
+            raise error
+        return responses
+
     def _domatch(self, prompt, flush):
         """
         Should be overwritten.
@@ -1082,18 +1380,39 @@ class Protocol(object):
             self._dbg(1, "DO NOT CONSUME PROMPT!")
             result = self.waitfor(self.get_prompt())
 
+        self._check_response(self.response)
+        return result
+
+    def _get_error_matcher(self):
+        regexs = self.get_error_prompt()
+        key = tuple(regexs)
+        matcher = _error_matchers.get(key)
+        if matcher is None:
+            if len(_error_matchers) >= 100:
+                _error_matchers.clear()
+            matcher = _error_matchers[key] = LineMatcher(regexs)
+        return matcher
+
+    def _check_match(self, result, response):
+        if result is None:
+            return
+        n, line = result
+        regex = self.get_error_prompt()[n]
+        args = repr(regex.pattern), repr(line)
+        self._dbg(5, "error prompt (%s) matches %s" % args)
+        raise InvalidCommandException('Device said:\n' + response)
+
+    def _check_response(self, response):
         # We skip the first line because it contains the echo of the command
         # sent.
-        self._dbg(5, "Checking %s for errors" % repr(self.response))
-        for line in self.response.split('\n')[1:]:
-            for prompt in self.get_error_prompt():
-                if not prompt.search(line):
-                    continue
-                args = repr(prompt.pattern), repr(line)
-                self._dbg(5, "error prompt (%s) matches %s" % args)
-                raise InvalidCommandException('Device said:\n' + self.response)
+        self._dbg(5, "Checking %s for errors" % repr(response))
+        start = response.find('\n') + 1
+        if start:
+            result = self._get_error_matcher().search(response, start)
+            self._check_match(result, response)
 
-        return result
+    def _check_line(self, line, response):
+        self._check_match(self._get_error_matcher().search(line), response)
 
     def add_monitor(self, pattern, callback, limit=80):
         """
@@ -1252,6 +1571,17 @@ class Protocol(object):
         """
         raise NotImplementedError()
 
+    def set_keepalive(self, interval):
+        """
+        Asks the protocol to keep the connection alive while it is idle,
+        by sending a keepalive every interval seconds. Protocols that do
+        not support keepalives ignore this.
+
+        :type  interval: int
+        :param interval: Seconds between keepalives; 0 to disable them.
+        """
+        pass
+
     def close(self, force=False):
         """
         Closes the connection with the remote host.
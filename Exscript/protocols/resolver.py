@@ -0,0 +1,160 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+A caching hostname resolver.
+"""
+from __future__ import absolute_import
+from builtins import object
+import time
+import socket
+import threading
+from collections import deque
+
+
+class Resolver(object):
+
+    """
+    Caches the results of socket.getaddrinfo() for a fixed time, such
+    that connections to the same host, as well as retries, do not query
+    the name service again. Failed lookups are cached as well, but for a
+    shorter time.
+
+    All connections share :data:`default_resolver` unless they are given
+    a resolver explicitly. :class:`Exscript.Queue` uses
+    :class:`resolve()` to look up all hosts before the jobs start.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=10, max_size=100000):
+        """
+        Constructor.
+
+        :type  ttl: int
+        :param ttl: The number of seconds for which an address is cached.
+            The system resolver does not tell the TTL of the DNS record,
+            so this is a fixed value.
+        :type  negative_ttl: int
+        :param negative_ttl: The number of seconds for which a failed
+            lookup is cached.
+        :type  max_size: int
+        :param max_size: The maximum number of cached hostnames. If
+            exceeded, the cache is cleared.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # host -> (expires, addrinfo, error type and arguments)
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.cache)
+
+    def _lookup(self, host):
+        # All address families are looked up at once, such that IPv4-only
+        # connections share the cache with all others.
+        with self.lock:
+            entry = self.cache.get(host)
+        if entry is not None and entry[0] > time.time():
+            return entry[1:]
+        # Errors are cached as their type and arguments, such that a new
+        # exception (with a new traceback) is raised for each lookup.
+        try:
+            result = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+            error = None
+            expires = time.time() + self.ttl
+        except socket.gaierror as e:
+            result = None
+            error = e.__class__, e.args
+            expires = time.time() + self.negative_ttl
+        with self.lock:
+            if len(self.cache) >= self.max_size:
+                self.cache.clear()
+            self.cache[host] = expires, result, error
+        return result, error
+
+    def getaddrinfo(self, host, port, family=0):
+        """
+        Like socket.getaddrinfo(host, port, family, socket.SOCK_STREAM),
+        but cached.
+
+        :type  host: str
+        :param host: The hostname or address.
+        :type  port: int
+        :param port: The TCP port number.
+        :type  family: int
+        :param family: The address family, e.g. socket.AF_INET. 0 means
+            any family.
+        :rtype:  list
+        :return: A list of 5-tuples, like socket.getaddrinfo().
+        """
+        result, error = self._lookup(host)
+        if error is not None:
+            cls, args = error
+            raise cls(*args)
+        return [(af, socktype, proto, canonname,
+                 sockaddr[:1] + (port,) + sockaddr[2:])
+                for af, socktype, proto, canonname, sockaddr in result
+                if family in (0, af)]
+
+    def resolve(self, hosts, max_threads=20):
+        """
+        Looks up the given hostnames in parallel using up to the given
+        number of threads, and waits until all lookups are done. Lookups
+        that fail are not reported; they fail again (from the cache) when
+        the address is needed.
+
+        :type  hosts: list(str)
+        :param hosts: The hostnames or addresses.
+        :type  max_threads: int
+        :param max_threads: The maximum number of concurrent lookups.
+        """
+        pending = deque(set(hosts))
+
+        def worker():
+            while True:
+                try:
+                    host = pending.popleft()
+                except IndexError:
+                    return
+                self._lookup(host)
+
+        threads = []
+        for n in range(min(max_threads, len(pending))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self.lock:
+            self.cache.clear()
+
+
+#: The resolver that is used by all connections that are not given a
+#: resolver explicitly.
+default_resolver = Resolver()
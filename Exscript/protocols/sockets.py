@@ -0,0 +1,214 @@
+#
+# Copyright (C) 2010-2017 Samuel Abels
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Opening and tuning TCP connections.
+"""
+from __future__ import absolute_import, division
+import time
+import os
+import errno
+import socket
+import selectors
+
+_in_progress = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def _interleave(addrinfo):
+    # Alternate between the address families, starting with the family
+    # of the first (i.e. the preferred) address, as described in RFC 8305.
+    families = []
+    by_family = {}
+    for info in addrinfo:
+        if info[0] not in by_family:
+            families.append(info[0])
+            by_family[info[0]] = []
+        by_family[info[0]].append(info)
+    result = []
+    while len(result) < len(addrinfo):
+        for family in families:
+            if by_family[family]:
+                result.append(by_family[family].pop(0))
+    return result
+
+
+def _start(info, rcvbuf, sndbuf):
+    family, socktype, proto, canonname, sockaddr = info
+    sock = socket.socket(family, socktype, proto)
+    try:
+        if rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        sock.setblocking(False)
+        err = sock.connect_ex(sockaddr)
+        if err not in (0,) + _in_progress:
+            raise socket.error(err, '%s => %s' % (os.strerror(err), sockaddr))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def open_socket(addrinfo,
+                timeout=None,
+                delay=.25,
+                rcvbuf=None,
+                sndbuf=None):
+    """
+    Connects to the first address in the given list that accepts the
+    connection, in the style of RFC 8305 ("Happy Eyeballs"). If an
+    attempt has not succeeded after the given delay, the next address
+    is tried in parallel, without giving up the first attempt. Attempts
+    that fail start the next one immediately. The first socket that
+    connects is returned; all others are closed.
+
+    The addresses are tried in the given order, except that the address
+    families are interleaved.
+
+    :type  addrinfo: list
+    :param addrinfo: A list of 5-tuples, as returned by
+        socket.getaddrinfo().
+    :type  timeout: float|None
+    :param timeout: The total number of seconds after which to give up.
+        None means no timeout.
+    :type  delay: float
+    :param delay: The number of seconds to wait before trying the next
+        address.
+    :type  rcvbuf: int|None
+    :param rcvbuf: The size of the receive buffer (SO_RCVBUF) in bytes.
+        It is set before connecting, because the TCP window scale is
+        negotiated during the handshake. None keeps the system default.
+    :type  sndbuf: int|None
+    :param sndbuf: The size of the send buffer (SO_SNDBUF) in bytes.
+    :rtype:  socket.socket
+    :return: The connected socket, in blocking mode.
+    """
+    queue = _interleave(addrinfo)
+    if not queue:
+        raise socket.error('getaddrinfo returns an empty list')
+    start = time.time()
+    deadline = None if timeout is None else start + timeout
+    selector = selectors.DefaultSelector()
+    error = None
+    next_attempt = start
+    try:
+        while True:
+            now = time.time()
+            while queue and (now >= next_attempt or not selector.get_map()):
+                info = queue.pop(0)
+                try:
+                    sock = _start(info, rcvbuf, sndbuf)
+                except socket.error as e:
+                    error = e
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE, info)
+                next_attempt = now + delay
+            if not selector.get_map():
+                raise error
+
+            wait = None if deadline is None else max(deadline - now, 0)
+            if queue:
+                wait = next_attempt - now if wait is None \
+                    else min(wait, next_attempt - now)
+            for key, mask in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0:
+                    sock.setblocking(True)
+                    return sock
+                error = socket.error(err, '%s => %s' % (os.strerror(err),
+                                                        key.data[4]))
+                sock.close()
+                next_attempt = time.time()
+
+            if deadline is not None and time.time() >= deadline:
+                raise socket.timeout('timed out')
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def set_keepalive(sock, idle, interval=None, count=None):
+    """
+    Enables or disables TCP keepalives on the given socket. Options
+    that the operating system does not support are ignored.
+
+    :type  sock: socket.socket
+    :param sock: A connected TCP socket.
+    :type  idle: int
+    :param idle: The number of idle seconds after which the first
+        keepalive is sent. 0 disables keepalives.
+    :type  interval: int|None
+    :param interval: The number of seconds between unanswered
+        keepalives. Defaults to idle.
+    :type  count: int|None
+    :param count: The number of unanswered keepalives after which the
+        connection is closed. None keeps the system default.
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(bool(idle)))
+    if not idle:
+        return
+    if interval is None:
+        interval = idle
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+    elif hasattr(socket, 'TCP_KEEPALIVE'):  # MacOS
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if count is not None and hasattr(socket, 'TCP_KEEPCNT'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+
+
+def tune_socket(sock,
+                nodelay=True,
+                keepalive=0,
+                keepalive_interval=None,
+                keepalive_count=None):
+    """
+    Applies the given options to a connected TCP socket. Sockets of
+    other families are left alone.
+
+    :type  sock: socket.socket
+    :param sock: A connected socket.
+    :type  nodelay: bool|None
+    :param nodelay: Whether to set TCP_NODELAY, i.e. to send small
+        writes immediately instead of waiting for outstanding
+        acknowledgements (Nagle's algorithm). None keeps the system
+        default.
+    :type  keepalive: int
+    :param keepalive: See :class:`set_keepalive()`. 0 leaves the system
+        default.
+    :type  keepalive_interval: int|None
+    :param keepalive_interval: See :class:`set_keepalive()`.
+    :type  keepalive_count: int|None
+    :param keepalive_count: See :class:`set_keepalive()`.
+    """
+    if sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    if nodelay is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))
+    if keepalive:
+        set_keepalive(sock, keepalive, keepalive_interval, keepalive_count)
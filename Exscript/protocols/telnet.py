@@ -28,6 +28,7 @@ from future import standard_library
 standard_library.install_aliases()
 from ..util.tty import get_terminal_size
 from . import telnetlib
+from .sockets import set_keepalive
 from .protocol import Protocol
 from .exception import ProtocolException, TimeoutException, \
         DriverReplacedException, ExpectCancelledException
@@ -38,6 +39,7 @@ class Telnet(Protocol):
     """
     The Telnet protocol adapter.
     """
+    DEFAULT_PORT = 23
 
     def __init__(self, **kwargs):
         Protocol.__init__(self, **kwargs)
@@ -51,17 +53,21 @@ class Telnet(Protocol):
         assert self.tn is None
         rows, cols = get_terminal_size()
         self.tn = telnetlib.Telnet(hostname,
-                                   port or 23,
+                                   port or self.DEFAULT_PORT,
                                    encoding=self.encoding,
                                    connect_timeout=self.connect_timeout,
                                    termsize=(rows, cols),
                                    termtype=self.termtype,
                                    stderr=self.stderr,
+                                   resolver=self.resolver,
+                                   rcvbuf=self.tcp_rcvbuf,
+                                   sndbuf=self.tcp_sndbuf,
                                    receive_callback=self._telnetlib_received)
         if self.debug >= 5:
             self.tn.set_debuglevel(1)
         if self.tn is None:
             return False
+        self._tune_socket(self.tn.sock)
         return True
 
     def send(self, data):
@@ -117,6 +123,11 @@ class Telnet(Protocol):
     def interact(self, key_handlers=None, handle_window_size=True):
         return self._open_shell(self.tn.sock, key_handlers, handle_window_size)
 
+    def set_keepalive(self, interval):
+        if self.tn is None:
+            return
+        set_keepalive(self.tn.sock, interval)
+
     def close(self, force=False):
         if self.tn is None:
             return
@@ -74,6 +74,7 @@ import selectors
 from time import monotonic as _time
 import struct
 from io import StringIO
+from .sockets import open_socket
 
 __all__ = ["Telnet"]
 py2 = sys.version_info[0] == 2
@@ -228,11 +229,14 @@ class Telnet(object):
         self.eof = 0
         self.encoding = encoding
         self.connect_timeout = kwargs.get('connect_timeout', None)
+        self.rcvbuf = kwargs.get('rcvbuf', None)
+        self.sndbuf = kwargs.get('sndbuf', None)
         self.window_size = kwargs.get('termsize')
         self.stdout = kwargs.get('stdout', sys.stdout)
         self.stderr = kwargs.get('stderr', sys.stderr)
         self.termtype = kwargs.get('termtype', 'dumb')
         self.data_callback = kwargs.get('receive_callback', None)
+        self.resolver = kwargs.get('resolver', None)
         self.data_callback_kwargs = {}
         if host:
             self.open(host, port)
@@ -251,22 +255,18 @@ class Telnet(object):
             port = TELNET_PORT
         self.host = host
         self.port = port
-        msg = "getaddrinfo returns an empty list"
-        for res in socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM):
-            af, socktype, proto, canonname, sa = res
-            try:
-                self.sock = socket.socket(af, socktype, proto)
-                self.sock.settimeout(self.connect_timeout)
-                self.sock.connect(sa)
-            except socket.error as msg_:
-                msg = '{} => telnet://{}:{}'.format(msg_, host, port)
-                if self.sock:
-                    self.sock.close()
-                self.sock = None
-                continue
-            break
-        if not self.sock:
-            raise socket.error(msg)
+        if self.resolver is None:
+            addrinfo = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        else:
+            addrinfo = self.resolver.getaddrinfo(host, port)
+        try:
+            self.sock = open_socket(addrinfo,
+                                    self.connect_timeout,
+                                    rcvbuf=self.rcvbuf,
+                                    sndbuf=self.sndbuf)
+        except socket.error as e:
+            raise e.__class__('{} => telnet://{}:{}'.format(e, host, port))
+        self.sock.settimeout(self.connect_timeout)
 
     def msg(self, msg, *args):
         """Print a debug message, when the debug level is > 0.
@@ -459,15 +459,34 @@ class Telnet(object):
         Set self.eof when connection is closed.  Don't block unless in
         the midst of an IAC sequence.
         """
-        buf = b''
+        buf = []
         try:
             while self.rawq:
-                # Handle non-IAC first (normal data).
-                char = self.rawq_getchar()
-                if char != IAC:
-                    buf = buf + char
+                # Handle non-IAC first (normal data). Everything up to the
+                # next IAC is copied in one go.
+                pos = self.rawq.find(IAC, self.irawq)
+                if pos < 0:
+                    buf.append(self.rawq[self.irawq:])
+                    self.rawq = b''
+                    self.irawq = 0
+                    break
+                if pos > self.irawq:
+                    buf.append(self.rawq[self.irawq:pos])
+
+                # Escaped 0xff in the data stream; by far the most
+                # common IAC sequence in large responses.
+                if self.rawq[pos + 1:pos + 2] == IAC:
+                    self.msg('IAC DATA')
+                    buf.append(IAC)
+                    self.irawq = pos + 2
+                    if self.irawq >= len(self.rawq):
+                        self.rawq = b''
+                        self.irawq = 0
                     continue
 
+                self.irawq = pos
+                self.rawq_getchar()  # The IAC itself.
+
                 # Interpret the command byte that follows after the IAC code.
                 command = self.rawq_getchar()
                 if command == theNULL:
@@ -475,7 +494,7 @@ class Telnet(object):
                     continue
                 elif command == IAC:
                     self.msg('IAC DATA')
-                    buf = buf + command
+                    buf.append(command)
                     continue
 
                 # DO: Indicates the request that the other party perform,
@@ -553,7 +572,7 @@ class Telnet(object):
                     self.msg('IAC %d not recognized' % ord(command))
         except EOFError:  # raised by self.rawq_getchar()
             pass
-        buf = buf.decode(self.encoding)
+        buf = b''.join(buf).decode(self.encoding)
         self.cookedq.write(buf)
         if self.data_callback is not None:
             self.data_callback(buf, **self.data_callback_kwargs)
@@ -591,9 +610,9 @@ class Telnet(object):
         if self.irawq >= len(self.rawq):
             self.rawq = b''
             self.irawq = 0
-        # The buffer size should be fairly small so as to avoid quadratic
-        # behavior in process_rawq() above.
-        buf = self.sock.recv(64)
+        # process_rawq() copies runs of normal data in bulk, so there
+        # is no need to keep the buffer size small.
+        buf = self.sock.recv(4096)
         self.msg("recv %s", repr(buf))
         self.eof = (not buf)
         self.rawq = self.rawq + buf
@@ -697,8 +716,8 @@ class Telnet(object):
             for i in indices:
                 m = relist[i].search(search_window)
                 if m is not None:
-                    e = m.end() - m.start()
-                    e = qlen - e + 1
+                    # The match is not necessarily at the end of the data.
+                    e = qlen - len(search_window) + m.start() + 1
                     self.cookedq.seek(0)
                     text = self.cookedq.read(e)
                     if flush:
@@ -33,6 +33,7 @@ import select
 import threading
 import weakref
 from functools import partial
+from collections import deque
 from multiprocessing import Pipe
 from .util.cast import to_hosts
 from .util.tty import get_terminal_size
@@ -41,7 +42,9 @@ from .util.decorator import get_label
 from .account import AccountManager, AccountProxy
 from .logger import logger_registry, LoggerProxy
 from .workqueue import WorkQueue, Task
+from .workqueue.job import ThreadPool
 from .protocols import prepare
+from .protocols.resolver import default_resolver
 
 
 def _account_factory(accm, host, account):
@@ -67,16 +70,48 @@ def _prepare_connection(func):
     and passes them as separate arguments to the wrapped function.
     """
     def _wrapped(job, *args, **kwargs):
-        job_id = id(job)
-        to_parent = job.data['pipe']
+        job_id = job.id
+        to_parent = job.data.get('pipe')
+        if to_parent is None:
+            to_parent = job.pipe  # The pipe of a process pool worker.
         host = job.data['host']
-
-        # Create a protocol adapter.
+        pool = job.data.get('pool')
         mkaccount = partial(_account_factory, to_parent, host)
-        pargs = {'account_factory': mkaccount,
-                 'stdout':          job.data['stdout']}
-        pargs.update(host.get_options())
-        conn = prepare(host, **pargs)
+
+        # Borrow an authenticated connection from the pool, if possible.
+        conn = None
+        if pool is not None:
+            conn = pool.acquire(host)
+        if conn is not None:
+            conn.account_factory = mkaccount
+            conn.pooled = True
+            conn.stdout = job.data['stdout']
+            connected = True
+        else:
+            # Create a protocol adapter.
+            pargs = {'account_factory': mkaccount,
+                     'stdout':          job.data['stdout'],
+                     'driver_cache':    job.data.get('driver_cache'),
+                     'resolver':        job.data.get('resolver')}
+            pargs.update(host.get_options())
+            conn = prepare(host, **pargs)
+            connected = False
+
+        def run():
+            # A connection that failed may be in any state, so only
+            # connections that succeeded are returned to the pool.
+            succeeded = False
+            try:
+                if not connected:
+                    conn.connect(host.get_address(), host.get_tcp_port())
+                result = func(job, host, conn, *args, **kwargs)
+                succeeded = True
+            finally:
+                if succeeded and pool is not None:
+                    pool.release(host, conn)
+                else:
+                    conn.close(force=True)
+            return result
 
         # Connect and run the function.
         log_options = get_label(func, 'log_to')
@@ -87,9 +122,7 @@ def _prepare_connection(func):
             proxy.add_log(job_id, job.name, job.failures + 1)
             conn.data_received_event.listen(log_cb)
             try:
-                conn.connect(host.get_address(), host.get_tcp_port())
-                result = func(job, host, conn, *args, **kwargs)
-                conn.close(force=True)
+                result = run()
             except:
                 proxy.log_aborted(job_id, serializeable_sys_exc_info())
                 raise
@@ -98,9 +131,7 @@ def _prepare_connection(func):
             finally:
                 conn.data_received_event.disconnect(log_cb)
         else:
-            conn.connect(host.get_address(), host.get_tcp_port())
-            result = func(job, host, conn, *args, **kwargs)
-            conn.close(force=True)
+            result = run()
         return result
 
     return _wrapped
@@ -120,29 +151,29 @@ def _call_logger(funcname, logger_id, *args):
     return getattr(logger, funcname)(*args)
 
 
-class _PipeHandler(threading.Thread):
+class _RequestHandler(object):
 
     """
-    Each PipeHandler holds an open pipe to a subprocess, to allow the
-    sub-process to access the accounts and communicate status information.
+    Handles the requests of a job, to allow the job to access the
+    accounts and communicate status information. The responses are
+    passed to the given reply function.
     """
 
-    def __init__(self, account_manager):
-        threading.Thread.__init__(self)
-        self.daemon = True
+    def __init__(self, account_manager, reply, executor=None):
         self.accm = account_manager
-        self.to_child, self.to_parent = Pipe()
+        self.reply = reply
+        self.executor = executor
 
     def _send_account(self, account):
         if account is None:
-            self.to_child.send(account)
+            self.reply(account)
             return
         response = (account.__hash__(),
                     account.get_name(),
                     account.get_password(),
                     account.get_authorization_password(),
                     account.get_key())
-        self.to_child.send(response)
+        self.reply(response)
 
     def _handle_request(self, request):
         try:
@@ -161,10 +192,10 @@ class _PipeHandler(threading.Thread):
             elif command == 'release-account':
                 account = self.accm.get_account_from_hash(arg)
                 account.release()
-                self.to_child.send('ok')
+                self.reply('ok')
             elif command == 'log-add':
                 log = _call_logger('add_log', *arg)
-                self.to_child.send(log)
+                self.reply(log)
             elif command == 'log-message':
                 _call_logger('log', *arg)
             elif command == 'log-aborted':
@@ -174,17 +205,82 @@ class _PipeHandler(threading.Thread):
             else:
                 raise Exception('invalid command on pipe: ' + repr(command))
         except Exception as e:
-            self.to_child.send(e)
+            self.reply(e)
             raise
 
+    def _handle_blocking_request(self, request):
+        try:
+            self._handle_request(request)
+        except Exception:
+            pass  # The error was passed to the job.
+
+    def __call__(self, request):
+        """
+        Handles the given request. None releases all accounts that were
+        acquired through this handler. If an executor was given,
+        requests that may wait for an account to become available are
+        passed to it, such that they do not block the caller.
+        """
+        if request is None:
+            self.accm.release_accounts(self)
+        elif self.executor is not None and \
+                request[0] in _BLOCKING_REQUESTS:
+            self.executor.submit(self._handle_blocking_request, request)
+        else:
+            self._handle_request(request)
+
+
+_BLOCKING_REQUESTS = ('acquire-account-for-host',
+                      'acquire-account-from-hash',
+                      'acquire-account')
+
+
+class _PipeHandler(threading.Thread):
+
+    """
+    Each PipeHandler holds an open pipe to a subprocess, to allow the
+    sub-process to access the accounts and communicate status information.
+    """
+
+    def __init__(self, account_manager):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.to_child, self.to_parent = Pipe()
+        self.handler = _RequestHandler(account_manager, self.to_child.send)
+
     def run(self):
         while True:
             try:
                 request = self.to_child.recv()
             except (EOFError, IOError):
-                self.accm.release_accounts(self)
+                self.handler(None)
                 break
-            self._handle_request(request)
+            self.handler._handle_request(request)
+
+
+class _LocalPipe(object):
+
+    """
+    Takes the place of the pipe for jobs that run in the parent process.
+    Requests are handled right away in the thread of the job, without a
+    pipe and without a _PipeHandler thread.
+    """
+
+    def __init__(self, account_manager):
+        self.responses = deque()
+        self.handler = _RequestHandler(account_manager, self.responses.append)
+
+    def send(self, request):
+        try:
+            self.handler._handle_request(request)
+        except Exception:
+            pass  # The error is returned by recv().
+
+    def recv(self):
+        return self.responses.popleft()
+
+    def close(self):
+        self.handler(None)
 
 
 class Queue(object):
@@ -201,7 +297,13 @@ class Queue(object):
                  host_driver=None,
                  exc_cb=None,
                  stdout=sys.stdout,
-                 stderr=sys.stderr):
+                 stderr=sys.stderr,
+                 connection_pool=None,
+                 driver_cache=None,
+                 resolver=None,
+                 resolve_threads=20,
+                 max_jobs_per_worker=100,
+                 processes=None):
         """
         Constructor. All arguments should be passed as keyword arguments.
         Depending on the verbosity level, the following types
@@ -229,7 +331,9 @@ class Queue(object):
         :type  verbose: int
         :param verbose: The verbosity level.
         :type  mode: str
-        :param mode: 'multiprocessing' or 'threading'
+        :param mode: 'multiprocessing', 'threading', 'threadpool',
+            'processpool', or 'hybrid'; see
+            :class:`Exscript.workqueue.WorkQueue`.
         :type  max_threads: int
         :param max_threads: The maximum number of concurrent threads.
         :type  host_driver: str
@@ -240,16 +344,50 @@ class Queue(object):
         :param stdout: The output channel, defaults to sys.stdout.
         :type  stderr: file
         :param stderr: The error channel, defaults to sys.stderr.
-        """
-        self.workqueue = WorkQueue(mode=mode)
+        :type  connection_pool: ConnectionPool
+        :param connection_pool: Keeps authenticated connections open
+            across jobs; see :class:`Exscript.protocols.ConnectionPool`.
+            Only supported in threading and threadpool mode.
+        :type  driver_cache: DriverCache
+        :param driver_cache: Remembers the detected driver of each host;
+            see :class:`Exscript.protocols.DriverCache`.
+        :type  resolver: Resolver
+        :param resolver: Looks up the addresses of the hosts; see
+            :class:`Exscript.protocols.Resolver`.
+        :type  resolve_threads: int
+        :param resolve_threads: The number of threads that look up the
+            addresses of all hosts before the jobs start. 0 leaves the
+            lookups to the jobs.
+        :type  max_jobs_per_worker: int
+        :param max_jobs_per_worker: In processpool and hybrid mode, the
+            number of hosts after which a worker process is replaced.
+        :type  processes: int
+        :param processes: In hybrid mode, the number of worker processes
+            among which the max_threads threads are spread. Defaults to
+            the number of CPUs.
+        """
+        if connection_pool is not None and \
+                mode not in ('threading', 'threadpool'):
+            raise ValueError('connection_pool requires threading mode')
+        self.workqueue = WorkQueue(mode=mode,
+                                   max_jobs_per_worker=max_jobs_per_worker,
+                                   request_handler=self._create_handler,
+                                   processes=processes)
         self.account_manager = AccountManager()
         self.pipe_handlers = weakref.WeakValueDictionary()
+        self.account_executor = ThreadPool()
         self.domain = domain
         self.verbose = verbose
         self.stdout = stdout
         self.stderr = stderr
         self.host_driver = host_driver
         self.exc_cb = exc_cb
+        self.connection_pool = connection_pool
+        self.driver_cache = driver_cache
+        if resolver is None:
+            resolver = default_resolver
+        self.resolver = resolver
+        self.resolve_threads = resolve_threads
         self.devnull = open(os.devnull, 'w')
         self.channel_map = {'fatal_errors': self.stderr,
                             'debug':        self.stdout}
@@ -328,6 +466,21 @@ class Queue(object):
         child.start()
         return child.to_parent
 
+    def _create_handler(self, to_child):
+        # Handles the requests of a job that runs in a worker process of
+        # the process pool. Requests that wait for an account are passed
+        # to a thread, such that they do not hold up the other jobs of
+        # the worker.
+        return _RequestHandler(self.account_manager,
+                               to_child.send,
+                               self.account_executor)
+
+    def _get_job_data(self):
+        return {'stdout':       self.channel_map['connection'],
+                'pool':         self.connection_pool,
+                'driver_cache': self.driver_cache,
+                'resolver':     self.resolver}
+
     def _del_status_bar(self):
         if self.status_bar_length == 0:
             return
@@ -383,11 +536,17 @@ class Queue(object):
     def _on_job_init(self, job):
         if job.data is None:
             job.data = {}
-        job.data['pipe'] = self._create_pipe()
-        job.data['stdout'] = self.channel_map['connection']
+        mode = self.workqueue.mode
+        if mode in ('threading', 'threadpool'):
+            job.data['pipe'] = _LocalPipe(self.account_manager)
+        elif mode == 'multiprocessing':
+            job.data['pipe'] = self._create_pipe()
+        job.data.update(self._get_job_data())
 
     def _on_job_destroy(self, job):
-        job.data['pipe'].close()
+        pipe = job.data.get('pipe')
+        if pipe is not None:
+            pipe.close()
 
     def _on_job_started(self, job):
         self._del_status_bar()
@@ -566,6 +725,7 @@ class Queue(object):
         finally:
             self._dbg(2, 'Destroying queue...')
             self.workqueue.destroy()
+            self.account_executor.shutdown()
             self.account_manager.reset()
             self.completed = 0
             self.total = 0
@@ -588,21 +748,37 @@ class Queue(object):
         self._dbg(2, 'Queue reset.')
         self._del_status_bar()
 
+    def _resolve(self, hosts):
+        # Looks up all addresses in parallel before the jobs start, such
+        # that the jobs find them in the cache.
+        if not self.resolve_threads:
+            return
+        addresses = [host.get_address() for host in hosts
+                     if host.get_protocol() not in ('dummy', 'pseudo')]
+        if addresses:
+            self._dbg(2, 'Resolving %d addresses.' % len(addresses))
+            self.resolver.resolve(addresses, self.resolve_threads)
+
     def _run(self, hosts, callback, queue_function, *args):
         hosts = to_hosts(hosts, default_domain=self.domain)
+        self._resolve(hosts)
         self.total += len(hosts)
         callback = _prepare_connection(callback)
         task = Task(self.workqueue)
         for host in hosts:
+            if self.host_driver is not None:
+                host.set_option('driver', self.host_driver)
+
+            # The data is complete before the job is enqueued, because
+            # worker processes of the process pool do not see later
+            # changes.
             name = host.get_name()
-            data = {'host': host}
+            data = self._get_job_data()
+            data['host'] = host
             job_id = queue_function(callback, name, *args, data=data)
             if job_id is not None:
                 task.add_job_id(job_id)
 
-            if self.host_driver is not None:
-                host.set_option('driver', self.host_driver)
-
         if task.is_completed():
             self._dbg(2, 'No jobs enqueued.')
             return None
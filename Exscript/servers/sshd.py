@@ -33,7 +33,6 @@ try:
 except ImportError:
     import Crypto
 import paramiko
-from copy import deepcopy
 from paramiko import ServerInterface
 from Exscript.version import __version__
 from .server import Server
@@ -49,7 +48,8 @@ class _ParamikoServer(ServerInterface):
     good_pub_key = paramiko.RSAKey(data=base64.decodestring(data))
 
     def __init__(self):
-        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.requests = {}  # channel id -> [Event, exec command or None]
 
         # Since each server is created in it's own thread, we must
         # re-initialize the random number generator to make sure that
@@ -63,6 +63,12 @@ class _ParamikoServer(ServerInterface):
             # detect the missing atfork() call, so they do not raise.
             pass
 
+    def get_request(self, chanid):
+        with self.lock:
+            if chanid not in self.requests:
+                self.requests[chanid] = [threading.Event(), None]
+            return self.requests[chanid]
+
     def check_channel_request(self, kind, chanid):
         if kind == 'session':
             return paramiko.OPEN_SUCCEEDED
@@ -78,7 +84,13 @@ class _ParamikoServer(ServerInterface):
         return 'password,publickey'
 
     def check_channel_shell_request(self, channel):
-        self.event.set()
+        self.get_request(channel.get_id())[0].set()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        request = self.get_request(channel.get_id())
+        request[1] = command
+        request[0].set()
         return True
 
     def check_channel_pty_request(self,
@@ -116,8 +128,8 @@ class SSHd(Server):
             keyfile = os.path.expanduser('~/.ssh/id_rsa')
         self.host_key = paramiko.RSAKey(filename=keyfile)
 
-    def _recvline(self, channel):
-        while not b'\n' in self.buf:
+    def _recvline(self, channel, buf):
+        while not b'\n' in buf[0]:
             if not self.running:
                 return None
             try:
@@ -125,14 +137,75 @@ class SSHd(Server):
             except socket.timeout:
                 continue
             if not data:
-                self.running = False
                 return None
-            self.buf += data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
-        lines = self.buf.split(b'\n')
-        self.buf = b'\n'.join(lines[1:])
+            buf[0] += data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        lines = buf[0].split(b'\n')
+        buf[0] = b'\n'.join(lines[1:])
         return lines[0].decode(self.encoding) + '\n'
 
+    def _handle_exec(self, channel, command):
+        # The command handlers of the device append its prompt, so the
+        # device is put into the logged-in state while the command runs,
+        # and restored afterwards.
+        device = self.device
+        state = device.logged_in, device.prompt_stage
+        device.logged_in = True
+        device.prompt_stage = device.PROMPT_STAGE_CUSTOM
+        try:
+            response = device.commands.eval(command.decode(self.encoding))
+        except Exception:
+            response = None  # Undefined command on a strict device.
+        finally:
+            device.logged_in, device.prompt_stage = state
+        if response is None:
+            channel.send_exit_status(127)
+            return
+        prompt = '\n' + device.get_prompt()
+        if response.endswith(prompt):
+            response = response[:-len(prompt)]
+        channel.sendall(response.encode(self.encoding))
+        channel.send_exit_status(0)
+
+    def _handle_channel(self, server, channel):
+        device = self.device
+        channel.settimeout(self.timeout)
+        try:
+            # wait for shell or exec request
+            event, command = server.get_request(channel.get_id())
+            event.wait(10)
+            if not event.is_set():
+                self._dbg(1, 'Client never asked for a shell.')
+                return
+            command = server.get_request(channel.get_id())[1]
+            if command is not None:
+                self._handle_exec(channel, command)
+                return
+
+            # send the banner, unless another channel logged in already
+            if device.logged_in:
+                res = '\n' + device.get_prompt()
+            else:
+                res = device.init()
+            channel.send(res)
+
+            # accept commands
+            buf = [b'']
+            while self.running:
+                line = self._recvline(channel, buf)
+                if line is None:
+                    break
+                response = device.do(line)
+                if response:
+                    channel.send(response)
+        except socket.error as err:
+            self._dbg(1, 'Client disappeared: ' + str(err))
+        finally:
+            channel.close()
+
     def _handle_connection(self, conn):
+        # Replies often consist of several small packets, such as the
+        # output, the exit status and the EOF of an exec channel.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         t = paramiko.Transport(conn)
         t.local_version = local_version
         try:
@@ -161,39 +234,27 @@ class SSHd(Server):
             conn.close()
             return
 
-        # Prepare virtual device.
-        device = deepcopy(self.device)
-
         # wait for auth
         channel = t.accept(2)
         if channel is None:
             self._dbg(1, 'Client disappeared before requesting channel.')
             t.close()
             return
-        channel.settimeout(self.timeout)
 
+        # Serve each channel in a thread, until all of them are closed.
+        threads = []
         try:
-            # wait for shell request
-            server.event.wait(10)
-            if not server.event.isSet():
-                self._dbg(1, 'Client never asked for a shell.')
-                t.close()
-                return
-
-            # send the banner
-            res = self.device.init()
-            channel.send(res)
-
-            # accept commands
-            while self.running:
-                line = self._recvline(channel)
-                if not line:
-                    continue
-                response = self.device.do(line)
-                if response:
-                    channel.send(response)
-        except socket.error as err:
-            self._dbg(1, 'Client disappeared: ' + str(err))
+            while t.is_active():
+                if channel is not None:
+                    thread = threading.Thread(target=self._handle_channel,
+                                              args=(server, channel))
+                    thread.daemon = True
+                    thread.start()
+                    threads.append(thread)
+                threads = [thread for thread in threads if thread.is_alive()]
+                if not threads:
+                    break
+                channel = t.accept(self.timeout)
         finally:
             # closing transport closes channel
             t.close()
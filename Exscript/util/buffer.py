@@ -26,7 +26,8 @@ A buffer object.
 from __future__ import absolute_import
 from builtins import object
 from builtins import str
-from io import StringIO
+import re
+from collections import deque
 from .cast import to_regexs
 
 
@@ -35,21 +36,27 @@ class MonitoredBuffer(object):
     """
     A specialized string buffer that allows for monitoring
     the content using regular expression-triggered callbacks.
+
+    The data is stored as a list of chunks, such that appending to the
+    buffer and removing data from its head do not require copying the
+    remaining content.
     """
 
     def __init__(self, io=None):
         """
         Constructor.
-        The data is stored in the given file-like object. If no object is
-        given, or the io argument is None, a new StringIO is used.
+        If a file-like object is given, it always receives a copy of the
+        content of the buffer. Removing data from the buffer rewrites
+        the object, so this is slower than using no object.
 
         :type  io: file-like object
-        :param io: A file-like object that is used for storing the data.
+        :param io: A file-like object that mirrors the content, or None.
         """
-        if io is None:
-            self.io = StringIO(u'')
-        else:
-            self.io = io
+        self.io = io
+        self.chunks = deque()
+        self.offset = 0   # Start of the content in the first chunk.
+        self.length = 0   # Number of characters in the buffer.
+        self.removed = 0  # Number of characters removed from the head.
         self.monitors = []
         self.clear()
 
@@ -57,7 +64,12 @@ class MonitoredBuffer(object):
         """
         Returns the content of the buffer.
         """
-        return self.io.getvalue()
+        if not self.chunks:
+            return u''
+        content = u''.join(self.chunks)[self.offset:]
+        self.chunks = deque((content,))
+        self.offset = 0
+        return content
 
     def size(self):
         """
@@ -66,7 +78,42 @@ class MonitoredBuffer(object):
         :rtype: int
         :return: The size of the buffer in bytes.
         """
-        return self.io.tell()
+        return self.length
+
+    def _head(self, bytes, remove):
+        bytes = min(max(bytes, 0), self.length)
+        result = []
+        wanted = bytes
+        offset = self.offset
+        for chunk in self.chunks:
+            if wanted <= 0:
+                break
+            end = offset + wanted
+            result.append(chunk[offset:end])
+            wanted -= len(chunk) - offset
+            offset = 0
+
+        if remove:
+            self.length -= bytes
+            self.removed += bytes
+            while bytes > 0:
+                avail = len(self.chunks[0]) - self.offset
+                if avail > bytes:
+                    self.offset += bytes
+                    break
+                self.chunks.popleft()
+                self.offset = 0
+                bytes -= avail
+            self._rewrite_io()
+        return u''.join(result)
+
+    def _rewrite_io(self):
+        if self.io is None:
+            return
+        self.io.seek(0)
+        if self.length:
+            self.io.write(str(self))
+        self.io.truncate()
 
     def head(self, bytes):
         """
@@ -76,11 +123,7 @@ class MonitoredBuffer(object):
         :type  bytes: int
         :param bytes: The number of bytes to return.
         """
-        oldpos = self.io.tell()
-        self.io.seek(0)
-        head = self.io.read(bytes)
-        self.io.seek(oldpos)
-        return head
+        return self._head(bytes, False)
 
     def tail(self, bytes):
         """
@@ -90,8 +133,22 @@ class MonitoredBuffer(object):
         :type  bytes: int
         :param bytes: The number of bytes to return.
         """
-        self.io.seek(max(0, self.size() - bytes))
-        return self.io.read()
+        bytes = min(max(bytes, 0), self.length)
+        result = []
+        wanted = bytes
+        for chunk in reversed(self.chunks):
+            if wanted <= 0:
+                break
+            if len(chunk) >= wanted:
+                result.append(chunk[len(chunk) - wanted:])
+                break
+            result.append(chunk)
+            wanted -= len(chunk)
+        result.reverse()
+        tail = u''.join(result)
+
+        # The first chunk may contain data that was already popped.
+        return tail[len(tail) - bytes:]
 
     def pop(self, bytes):
         """
@@ -100,13 +157,7 @@ class MonitoredBuffer(object):
         :type  bytes: int
         :param bytes: The number of bytes to return and remove.
         """
-        self.io.seek(0)
-        head = self.io.read(bytes)
-        tail = self.io.read()
-        self.io.seek(0)
-        self.io.write(tail)
-        self.io.truncate()
-        return head
+        return self._head(bytes, True)
 
     def append(self, data):
         """
@@ -116,7 +167,13 @@ class MonitoredBuffer(object):
         :type  data: str
         :param data: The data that is appended.
         """
-        self.io.write(data)
+        if not data:
+            return
+        self.chunks.append(data)
+        self.length += len(data)
+        if self.io is not None:
+            self.io.seek(0, 2)
+            self.io.write(data)
         if not self.monitors:
             return
 
@@ -124,24 +181,30 @@ class MonitoredBuffer(object):
         # If it does, we need to disable that monitor until the matching
         # data is no longer in the buffer. We accomplish this by keeping
         # track of the position of the last matching byte.
-        buf = str(self)
+        # Positions are counted from the start of the stream, so they
+        # remain valid when the head of the buffer is removed.
+        end = self.removed + self.length
         for item in self.monitors:
             regex_list, callback, bytepos, limit = item
-            bytepos = max(bytepos, len(buf) - limit)
+            start = max(bytepos, end - len(data) - limit, self.removed)
+            buf = self.tail(end - start)
             for i, regex in enumerate(regex_list):
-                match = regex.search(buf, bytepos)
+                match = regex.search(buf)
                 if match is not None:
-                    item[2] = match.end()
+                    item[2] = start + match.end()
                     callback(i, match)
 
     def clear(self):
         """
         Removes all data from the buffer.
         """
-        self.io.seek(0)
-        self.io.truncate()
+        self.removed += self.length
+        self.chunks.clear()
+        self.offset = 0
+        self.length = 0
+        self._rewrite_io()
         for item in self.monitors:
-            item[2] = 0
+            item[2] = self.removed
 
     def add_monitor(self, pattern, callback, limit=80):
         """
@@ -156,7 +219,272 @@ class MonitoredBuffer(object):
         :type  callback: callable
         :param callback: The function that is called.
         :type  limit: int
-        :param limit: The maximum size of the tail of the buffer
-                      that is searched, in number of bytes.
+        :param limit: The number of bytes preceding the newly received
+                      data that are searched in addition to that data.
+        """
+        self.monitors.append([to_regexs(pattern), callback, self.removed, limit])
+
+
+class TailMatcher(object):
+
+    """
+    Searches the tail of a :class:`MonitoredBuffer` for one of a list of
+    regular expressions, such as a prompt. Unlike searching the tail
+    from scratch, data is passed through the cleanup function only once,
+    and the regular expressions are not run again unless new data has
+    arrived, or the list of regular expressions has changed.
+    """
+
+    def __init__(self, window_size=150):
+        """
+        Constructor.
+
+        :type  window_size: int
+        :param window_size: The size of the searched tail, in bytes.
+        """
+        self.window_size = window_size
+        self.pos = 0
+        self.cleanup = None
+        self.regexs = None
+        self.window = u''
+        self.incomplete = u''
+
+    def _reset(self, buffer, cleanup):
+        end = buffer.removed + buffer.length
+        self.pos = max(buffer.removed, end - self.window_size)
+        self.cleanup = cleanup
+        self.regexs = None
+        self.window = u''
+        self.incomplete = u''
+
+    def search(self, buffer, regexs, cleanup=None):
+        """
+        Searches the tail of the given buffer for the given regular
+        expressions. The optional cleanup function is called with new
+        data, and must return a tuple containing the cleaned data and an
+        incomplete tail that is prepended to the next chunk of data.
+
+        Returns a tuple (index, match, window), where window is the
+        searched string, or None if none of the expressions matched.
+
+        :type  buffer: MonitoredBuffer
+        :param buffer: The buffer that is searched.
+        :type  regexs: list(re.RegexObject)
+        :param regexs: The regular expressions; the first match wins.
+        :type  cleanup: callable
+        :param cleanup: A function for cleaning the data before searching.
+        :rtype:  tuple(int, re.MatchObject, str)|None
+        :return: The result, or None.
+        """
+        end = buffer.removed + buffer.length
+        if cleanup != self.cleanup \
+                or self.pos < buffer.removed \
+                or self.pos > end:
+            self._reset(buffer, cleanup)
+        elif self.pos == end and regexs == self.regexs:
+            return None  # No new data since the last unsuccessful search.
+
+        # Data that does not fit into the window is never searched.
+        if end - self.pos > self.window_size:
+            self.pos = end - self.window_size
+            self.window = self.incomplete = u''
+
+        # Clean up the new data only.
+        data = self.incomplete + buffer.tail(end - self.pos)
+        self.pos = end
+        if cleanup is None:
+            self.incomplete = u''
+        else:
+            data, self.incomplete = cleanup(data)
+        window = (self.window + data)[-self.window_size:]
+
+        # Data may have been removed from the head of the buffer.
+        self.window = window = window[max(0, len(window) - buffer.length):]
+
+        self.regexs = regexs
+        for n, regex in enumerate(regexs):
+            match = regex.search(window)
+            if match is not None:
+                # The next search must not assume that nothing changed.
+                self.regexs = None
+                return n, match, window
+        return None
+
+
+class RingBuffer(object):
+
+    """
+    A file-like object that only keeps the given number of characters
+    that were most recently written to it.
+    """
+
+    def __init__(self, size=65536):
         """
-        self.monitors.append([to_regexs(pattern), callback, 0, limit])
+        Constructor.
+
+        :type  size: int
+        :param size: The maximum number of characters that are kept.
+        """
+        self.size = size
+        self.chunks = deque()
+        self.length = 0
+
+    def write(self, data):
+        """
+        Appends the given data, discarding the oldest data if the buffer
+        is full.
+
+        :type  data: str
+        :param data: The data that is written.
+        """
+        if not data:
+            return
+        self.chunks.append(data)
+        self.length += len(data)
+        while len(self.chunks) > 1 \
+                and self.length - len(self.chunks[0]) >= self.size:
+            self.length -= len(self.chunks.popleft())
+
+    def flush(self):
+        """
+        Does nothing; only provided for compatibility with file objects.
+        """
+        pass
+
+    def close(self):
+        """
+        Discards the content of the buffer.
+        """
+        self.chunks.clear()
+        self.length = 0
+
+    def getvalue(self):
+        """
+        Returns the content of the buffer.
+
+        :rtype:  str
+        :return: The last size characters that were written.
+        """
+        content = u''.join(self.chunks)
+        content = content[max(0, len(content) - self.size):]
+        self.chunks = deque((content,)) if content else deque()
+        self.length = len(content)
+        return content
+
+
+# Constructs that may behave differently when a line is searched as part
+# of a larger string: anchors for the start/end of the string, lookarounds
+# and backreferences (which break when the expression is wrapped in a
+# group).
+_line_unsafe_re = re.compile(r'\\[AZ1-9]|\(\?<?[=!]|\(\?P=')
+_inline_flags_re = re.compile(r'^\(\?[aiLmsux]+\)')
+
+
+class LineMatcher(object):
+
+    """
+    Searches a string for lines that match any of the given regular
+    expressions. Instead of running every expression against every line,
+    the expressions are combined into a single alternation that scans
+    the whole string in one pass.
+
+    The result is the same as searching each line that is produced by
+    splitting the string at '\\n' separately.
+    """
+
+    def __init__(self, regexs):
+        """
+        Constructor.
+
+        :type  regexs: list(re.RegexObject)
+        :param regexs: The regular expressions.
+        """
+        self.regexs = list(regexs)
+        self.combined = []  # (regex, group name -> index)
+        self.separate = []  # Expressions that can not be combined.
+
+        by_flags = {}
+        for n, regex in enumerate(self.regexs):
+            if _line_unsafe_re.search(regex.pattern):
+                self.separate.append(n)
+            else:
+                by_flags.setdefault(regex.flags, []).append(n)
+
+        for flags, indices in sorted(by_flags.items()):
+            groups = {}
+            alternatives = []
+            for n in indices:
+                pattern = _inline_flags_re.sub('', self.regexs[n].pattern)
+                groups['_line%d' % n] = n
+                alternatives.append('(?P<_line%d>%s)' % (n, pattern))
+            try:
+                regex = re.compile('|'.join(alternatives), flags | re.M)
+            except re.error:
+                # E.g. named groups that are used by more than one expression.
+                self.separate += indices
+                continue
+            self.combined.append((regex, groups))
+        self.separate.sort()
+
+    def _search_lines(self, string, start, end, indices):
+        # Searches each line in the given range separately.
+        for line in string[start:end].split('\n'):
+            for n in indices:
+                if self.regexs[n].search(line):
+                    return start, n, line
+            start += len(line) + 1
+        return None
+
+    def _search_combined(self, string, pos, regex, groups):
+        for match in regex.finditer(string, pos):
+            start = string.rfind('\n', 0, match.start()) + 1
+            if '\n' not in match.group(0):
+                end = string.find('\n', match.start())
+                end = len(string) if end < 0 else end
+                return start, groups[match.lastgroup], string[start:end]
+
+            # The match spans multiple lines, so each of them needs to be
+            # searched separately.
+            end = string.find('\n', match.end())
+            end = len(string) if end < 0 else end
+            result = self._search_lines(string, start, end,
+                                        sorted(groups.values()))
+            if result is not None:
+                return result
+        return None
+
+    def search(self, string, pos=0):
+        """
+        Returns the first line of the given string that matches any of the
+        expressions, together with the index of the expression that
+        matched. If multiple expressions match the same line, the one with
+        the lowest index wins.
+
+        :type  string: str
+        :param string: The string that is searched.
+        :type  pos: int
+        :param pos: The position at which the search starts. Must be the
+            start of a line.
+        :rtype:  tuple(int, str)|None
+        :return: A tuple (index, line), or None if no line matched.
+        """
+        results = []
+        for regex, groups in self.combined:
+            result = self._search_combined(string, pos, regex, groups)
+            if result is not None:
+                results.append(result)
+        if self.separate:
+            result = self._search_lines(string, pos, len(string),
+                                        self.separate)
+            if result is not None:
+                results.append(result)
+        if not results:
+            return None
+
+        # Each combined expression reports the first matching alternative,
+        # not necessarily the one with the lowest index.
+        start, n, line = min(results)
+        for i in range(n):
+            if self.regexs[i].search(line):
+                return i, line
+        return n, line
@@ -108,6 +108,9 @@ def _decorate(flush=True, attempts=1, only_authenticate=False):
     """
     def decorator(function):
         def decorated(job, host, conn, *args, **kwargs):
+            # Connections from a ConnectionPool are already logged in.
+            if conn.pooled and conn.is_app_authenticated():
+                return function(job, host, conn, *args, **kwargs)
             failed = 0
             while True:
                 try:
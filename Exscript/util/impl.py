@@ -26,9 +26,16 @@ Development tools.
 from builtins import object
 import sys
 import warnings
+import threading
 import traceback
 from functools import wraps
 
+#: Held while forking long-lived worker processes, and while starting a
+#: subprocess. Otherwise the pipes that the subprocess module opens would
+#: leak into a worker that is forked at the same time, and waiting for the
+#: subprocess would block until the worker exits.
+fork_lock = threading.Lock()
+
 
 def add_label(obj, name, **kwargs):
     """
@@ -101,7 +101,7 @@ def test_file(filename, **kwargs):
         _compile(None, filename, fp.read(), {}, **kwargs)
 
 
-def eval(conn, string, strip_command=True, **kwargs):
+def eval(conn, string, strip_command=True, window=1, **kwargs):
     """
     Compiles the given template and executes it on the given
     connection.
@@ -126,22 +126,28 @@ def eval(conn, string, strip_command=True, **kwargs):
 
     By setting strip_command to True, the first line is ommitted.
 
+    If window is greater than 1, consecutive commands in the template
+    are sent using :class:`Exscript.protocols.Protocol.execute_many()`,
+    with up to the given number of commands sent ahead.
+
     :type  conn: Exscript.protocols.Protocol
     :param conn: The connection on which to run the template.
     :type  string: string
     :param string: The template to compile.
     :type  strip_command: bool
     :param strip_command: Whether to strip the command echo from the response.
+    :type  window: int
+    :param window: The number of commands that may be sent ahead.
     :type  kwargs: dict
     :param kwargs: Variables to define in the template.
     :rtype:  dict
     :return: The variables that are defined after execution of the script.
     """
-    parser_args = {'strip_command': strip_command}
+    parser_args = {'strip_command': strip_command, 'window': window}
     return _run(conn, None, string, parser_args, **kwargs)
 
 
-def eval_file(conn, filename, strip_command=True, **kwargs):
+def eval_file(conn, filename, strip_command=True, window=1, **kwargs):
     """
     Convenience wrapper around eval() that reads the template from a file
     instead.
@@ -152,10 +158,12 @@ def eval_file(conn, filename, strip_command=True, **kwargs):
     :param filename: The name of the template file.
     :type  strip_command: bool
     :param strip_command: Whether to strip the command echo from the response.
+    :type  window: int
+    :param window: The number of commands that may be sent ahead.
     :type  kwargs: dict
     :param kwargs: Variables to define in the template.
     """
-    parser_args = {'strip_command': strip_command}
+    parser_args = {'strip_command': strip_command, 'window': window}
     with open(filename, 'r') as fp:
         return _run(conn, filename, fp.read(), parser_args, **kwargs)
 
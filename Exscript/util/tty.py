@@ -28,6 +28,7 @@ import sys
 import struct
 from subprocess import Popen, PIPE
 from builtins import int
+from .impl import fork_lock
 
 def _get_terminal_size(fd):
     try:
@@ -115,8 +116,9 @@ def get_terminal_size(default_rows=25, default_cols=80):
     # Try `stty size`
     with open(os.devnull, 'w') as devnull:
         try:
-            process = Popen(['stty', 'size'], stderr=devnull, stdout=PIPE,
-                            close_fds=True)
+            with fork_lock:
+                process = Popen(['stty', 'size'], stderr=devnull, stdout=PIPE,
+                                close_fds=True)
         except (OSError, ValueError):
             pass
         else:
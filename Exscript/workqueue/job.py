@@ -25,10 +25,11 @@ from builtins import object
 import sys
 import threading
 import multiprocessing
+from collections import deque
 from copy import copy
 from functools import partial
 from multiprocessing import Pipe
-from Exscript.util.impl import serializeable_sys_exc_info
+from Exscript.util.impl import serializeable_sys_exc_info, fork_lock
 
 
 class _ChildWatcher(threading.Thread):
@@ -93,6 +94,438 @@ Thread = _make_process_class(threading.Thread, 'Thread')
 Process = _make_process_class(multiprocessing.Process, 'Process')
 
 
+class PooledThread(object):
+
+    """
+    Has the same attributes as :class:`Thread`, but is executed by one
+    of the long-lived threads of a :class:`ThreadPool` instead of
+    starting a thread of its own.
+    """
+
+    def __init__(self, id, function, name, data):
+        self.id = id
+        self.pipe = None
+        self.function = function
+        self.name = name
+        self.failures = 0
+        self.data = data
+
+    def run(self):
+        """
+        Start the associated function.
+        """
+        self.function(self)
+
+
+class ThreadPool(object):
+
+    """
+    A set of threads that execute the functions passed to submit().
+    A thread is added whenever a function is submitted while all other
+    threads are busy, so the pool grows to the number of concurrently
+    running jobs. Threads are reused until shutdown() is called.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.functions = deque()
+        self.threads = []
+        self.jobs = {}  # id(job) -> job
+        self.idle = 0
+        self.running = True
+
+    def __len__(self):
+        return len(self.threads)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while self.running and not self.functions:
+                    self.idle += 1
+                    self.condition.wait()
+                    self.idle -= 1
+                if not self.functions:
+                    return
+                function, args = self.functions.popleft()
+            function(*args)
+
+    def submit(self, function, *args):
+        """
+        Calls the given function with the given arguments in one of the
+        threads of the pool.
+        """
+        with self.condition:
+            self.functions.append((function, args))
+            if len(self.functions) <= self.idle:
+                self.condition.notify()
+                return
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            self.threads.append(thread)
+        thread.start()
+
+    def register(self, job):
+        """
+        Called when the given job is enqueued. The threads share the
+        memory of the parent, so the job is only recorded.
+        """
+        with self.condition:
+            self.jobs[id(job)] = job
+
+    def unregister(self, job):
+        """
+        Removes the given job after it was completed.
+        """
+        with self.condition:
+            self.jobs.pop(id(job), None)
+
+    def run(self, job, on_complete):
+        """
+        Runs the child of the given job in one of the threads, and
+        passes the job and the exc_info (or None) to on_complete() when
+        done.
+        """
+        self.submit(job._run, on_complete)
+
+    def shutdown(self):
+        """
+        Lets the threads terminate once all submitted functions are
+        done. Does not wait for them.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+
+class PooledProcess(PooledThread):
+
+    """
+    Like :class:`PooledThread`, but executed by one of the worker
+    processes of a :class:`ProcessPool`. The pipe attribute is a
+    connection to the parent process that is private to the job, which
+    the job may use to send requests to the parent.
+    """
+    pass
+
+
+class _JobChannel(object):
+
+    """
+    One end of the connection between a job in a worker process and its
+    request handler in the parent. All jobs of a worker share the pipe
+    of the worker, so messages are tagged with the key of the job. In
+    the worker, the messages for the job are handed to it using put().
+    """
+
+    def __init__(self, channel, lock, command, key):
+        self.channel = channel
+        self.lock = lock
+        self.command = command
+        self.key = key
+        self.condition = threading.Condition()
+        self.messages = deque()
+        self.closed = False
+
+    def put(self, message):
+        with self.condition:
+            self.messages.append(message)
+            self.condition.notify()
+
+    def send(self, message):
+        with self.lock:
+            self.channel.send((self.command, self.key, message))
+
+    def recv(self):
+        with self.condition:
+            while not self.messages and not self.closed:
+                self.condition.wait()
+            if not self.messages:
+                raise EOFError('job channel is closed')
+            return self.messages.popleft()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+def _worker_main(channel, jobs):
+    # The main loop of a worker process. The jobs were inherited from
+    # the parent when the worker was forked, so only their keys are
+    # sent over the channel. Every job runs in a thread of its own.
+    # The parent forks while holding the fork lock, which is therefore
+    # still locked in the child.
+    fork_lock.release()
+    lock = threading.Lock()
+    channels = {}
+    threads = ThreadPool()
+
+    def run(key, failures):
+        seq, job = jobs[key]
+        child = PooledProcess(job.id, job.func, job.name, job.data)
+        child.failures = failures
+        child.pipe = channels[key]
+        try:
+            child.run()
+        except:
+            result = serializeable_sys_exc_info()
+        else:
+            result = None
+        with lock:
+            del channels[key]
+            channel.send(('job-completed', key, result))
+
+    while True:
+        try:
+            message = channel.recv()
+        except (EOFError, IOError):
+            break
+        if message is None:
+            break
+        command, key, arg = message
+        if command == 'job-start':
+            channels[key] = _JobChannel(channel, lock, 'job-request', key)
+            threads.submit(run, key, arg)
+        else:
+            channels[key].put(arg)
+    threads.shutdown()
+    channel.close()
+
+
+class _Worker(object):
+
+    def __init__(self, pool, known):
+        self.pool = pool
+        self.known = known
+        self.jobs_started = 0
+        self.retired = False
+        self.jobs = {}  # key -> (job, on_complete, handler)
+        self.lock = threading.Lock()
+        self.channel, child_channel = Pipe()
+        self.process = multiprocessing.Process(target=_worker_main,
+                                               args=(child_channel,
+                                                     pool.jobs))
+        self.process.daemon = True
+        self.process.start()
+        child_channel.close()
+        self.thread = threading.Thread(target=self._read)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _read(self):
+        while True:
+            try:
+                command, key, arg = self.channel.recv()
+            except (EOFError, IOError):
+                break
+            if command == 'job-completed':
+                self._handle(key, None)
+                self.pool._completed(self, key, arg)
+            else:
+                self._handle(key, arg)
+        self.process.join()
+        self.channel.close()
+        self.pool._exited(self)
+
+    def _handle(self, key, request):
+        handler = self.jobs[key][2]
+        if handler is None:
+            return
+        try:
+            handler(request)
+        except Exception:
+            pass  # The handler already passed the error to the job.
+
+    def start(self, key, job):
+        try:
+            with self.lock:
+                self.channel.send(('job-start', key, job.failures))
+        except (EOFError, IOError):
+            pass  # The worker died; _exited() reports the job as failed.
+
+    def stop(self):
+        try:
+            with self.lock:
+                self.channel.send(None)
+        except (EOFError, IOError):
+            pass  # Already gone.
+
+
+class ProcessPool(object):
+
+    """
+    A set of long-lived worker processes that run jobs. Workers are
+    forked as needed, and replaced after they ran the given number of
+    jobs, and when they die.
+
+    By default, every worker runs one job at a time, and a worker is
+    forked whenever a job is started while all other workers are busy,
+    so the pool grows to the number of concurrently running jobs.
+    If the processes argument is given, the pool grows to no more than
+    the given number of workers instead, and every worker runs the jobs
+    that it is given in threads. Once all workers are started, jobs are
+    passed to the worker that runs the fewest jobs, so the load is
+    spread across all processes.
+
+    Jobs are not pickled: a worker runs only the jobs that were
+    registered before it was forked, and receives their keys over a
+    pipe. Changes that are made to a job after it was registered are
+    not seen by the worker. Starting a job that no worker knows forks a
+    new worker, and workers that know none of the pending jobs are
+    retired.
+
+    Subprocesses that are started in the parent while a worker is forked
+    leak their pipes into the worker, unless they are started while
+    holding :data:`Exscript.util.impl.fork_lock`.
+    """
+
+    def __init__(self, max_jobs=100, request_handler=None, processes=0):
+        """
+        Constructor.
+
+        :type  max_jobs: int
+        :param max_jobs: The number of jobs after which a worker is
+            replaced. 0 means unlimited.
+        :type  request_handler: callable
+        :param request_handler: Called with a pipe-like object whenever
+            a job is started. Must return a function that is called with
+            every request that the job sends through its pipe attribute,
+            and with None once the job is completed. The function may
+            answer using the send() method of the pipe-like object. It
+            is called by the thread that reads the pipe of the worker,
+            so it should not block.
+        :type  processes: int
+        :param processes: The maximum number of workers, each of which
+            runs jobs in threads. 0 runs one job per worker.
+        """
+        self.max_jobs = max_jobs
+        self.request_handler = request_handler
+        self.processes = processes
+        self.lock = threading.Lock()
+        self.jobs = {}  # id(job) -> (seq, job)
+        self.seq = 0
+        self.workers = set()
+        self.running = True
+
+    def __len__(self):
+        return len(self.workers)
+
+    def register(self, job):
+        """
+        Makes the given job known to all workers that are forked from
+        now on. Must be called before the job is started.
+        """
+        with self.lock:
+            self.jobs[id(job)] = self.seq, job
+            self.seq += 1
+
+    def unregister(self, job):
+        """
+        Removes the given job after it was completed.
+        """
+        with self.lock:
+            self.jobs.pop(id(job), None)
+
+    def _select_worker(self, seq):
+        # Must be called with the lock held. Returns a worker that can
+        # run the job with the given seq, and a list of workers that
+        # were retired and have no jobs left.
+        active = [w for w in self.workers if not w.retired]
+        candidates = [w for w in active if w.known > seq]
+        for worker in candidates:
+            if not worker.jobs:
+                return worker, []
+        if candidates and self.processes and len(active) >= self.processes:
+            return min(candidates, key=lambda w: len(w.jobs)), []
+        oldest = min(s for s, job in self.jobs.values())
+        retired = [w for w in active if not w.jobs and w.known <= oldest]
+        if self.processes:
+            # Make room for a worker that knows the job.
+            busy = [w for w in active if w not in retired]
+            if len(busy) >= self.processes:
+                retired.append(min(busy, key=lambda w: len(w.jobs)))
+        for w in retired:
+            w.retired = True
+        return None, [w for w in retired if not w.jobs]
+
+    def _add_job(self, worker, key, job, on_complete):
+        # Must be called with the lock held.
+        handler = None
+        if self.request_handler is not None:
+            channel = _JobChannel(worker.channel,
+                                  worker.lock,
+                                  'job-response',
+                                  key)
+            handler = self.request_handler(channel)
+        worker.jobs[key] = job, on_complete, handler
+        worker.jobs_started += 1
+        if self.max_jobs and worker.jobs_started >= self.max_jobs:
+            worker.retired = True
+
+    def run(self, job, on_complete):
+        """
+        Runs the given job in one of the workers, and passes the job and
+        the exc_info (or None) to on_complete() when done.
+        """
+        key = id(job)
+        with self.lock:
+            seq = self.jobs[key][0]
+            worker, stale = self._select_worker(seq)
+            if worker is not None:
+                self._add_job(worker, key, job, on_complete)
+        for old in stale:
+            old.stop()
+        if worker is None:
+            with fork_lock:
+                with self.lock:
+                    known = self.seq
+                worker = _Worker(self, known)
+            with self.lock:
+                self.workers.add(worker)
+                self._add_job(worker, key, job, on_complete)
+        worker.start(key, job)
+
+    def _completed(self, worker, key, result):
+        with self.lock:
+            job, on_complete, handler = worker.jobs.pop(key)
+            if not self.running:
+                worker.retired = True
+            stop = worker.retired and not worker.jobs
+        if stop:
+            worker.stop()
+        on_complete(job, result)
+
+    def _exited(self, worker):
+        with self.lock:
+            self.workers.discard(worker)
+            keys = list(worker.jobs)
+        if not keys:
+            return
+        try:
+            raise Exception('worker process exited with code %s'
+                            % worker.process.exitcode)
+        except Exception:
+            result = serializeable_sys_exc_info()
+        for key in keys:
+            worker._handle(key, None)
+            with self.lock:
+                job, on_complete, handler = worker.jobs.pop(key)
+            on_complete(job, result)
+
+    def shutdown(self):
+        """
+        Stops the workers once they completed their current jobs. Does
+        not wait for them.
+        """
+        with self.lock:
+            self.running = False
+            idle = [w for w in self.workers if not w.retired and not w.jobs]
+            for worker in self.workers:
+                worker.retired = True
+        for worker in idle:
+            worker.stop()
+
+
 class Job(object):
     __slots__ = ('id',
                  'func',
@@ -113,12 +546,31 @@ class Job(object):
         self.child = None
         self.watcher = None
 
-    def start(self, child_cls, on_complete):
+    def start(self, child_cls, on_complete, pool=None, on_start=None):
         self.child = child_cls(self.id, self.func, self.name, self.data)
         self.child.failures = self.failures
+        if on_start is not None:
+            # Called before the child runs, such that listeners never
+            # see a job complete before it was started.
+            on_start(self.child)
+        if pool is not None:
+            # Completion is reported by the pool itself, so no watcher
+            # thread is needed.
+            pool.run(self, on_complete)
+            return
         self.watcher = _ChildWatcher(self.child, partial(on_complete, self))
         self.watcher.start()
 
+    def _run(self, on_complete):
+        try:
+            self.child.run()
+        except:
+            result = serializeable_sys_exc_info()
+        else:
+            result = None
+        on_complete(self, result)
+
     def join(self):
-        self.watcher.join()
+        if self.watcher is not None:
+            self.watcher.join()
         self.child = None
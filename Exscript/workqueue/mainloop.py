@@ -33,7 +33,7 @@ multiprocessing.process._cleanup = lambda: None
 
 class MainLoop(threading.Thread):
 
-    def __init__(self, collection, job_cls):
+    def __init__(self, collection, job_cls, pool=None):
         threading.Thread.__init__(self)
         self.job_init_event = Event()
         self.job_started_event = Event()
@@ -43,6 +43,7 @@ class MainLoop(threading.Thread):
         self.queue_empty_event = Event()
         self.collection = collection
         self.job_cls = job_cls
+        self.pool = pool
         self.debug = 5
         self.daemon = True
 
@@ -50,24 +51,39 @@ class MainLoop(threading.Thread):
         if self.debug >= level:
             print(msg)
 
+    def _append(self, queue, job, name=None, left=False, force=False):
+        # Must be called with the lock of the collection held, such that
+        # the job cannot be started before it is registered with the
+        # pool. Workers copy the job when they are forked, so it is
+        # registered only once it has an id, and not at all if it could
+        # not be added.
+        if left:
+            job.id = queue.appendleft(job, name, force=force)
+        else:
+            job.id = queue.append(job, name)
+        if self.pool is not None:
+            self.pool.register(job)
+        return job.id
+
     def enqueue(self, function, name, times, data):
         job = Job(function, name, times, data)
-        job.id = self.collection.append(job)
-        return job.id
+        return self.collection.with_lock(self._append, job)
 
     def enqueue_or_ignore(self, function, name, times, data):
         def conditional_append(queue):
             if queue.get_from_name(name) is not None:
                 return None
             job = Job(function, name, times, data)
-            job.id = queue.append(job, name)
-            return job.id
+            return self._append(queue, job, name)
         return self.collection.with_lock(conditional_append)
 
     def priority_enqueue(self, function, name, force_start, times, data):
         job = Job(function, name, times, data)
-        job.id = self.collection.appendleft(job, name, force=force_start)
-        return job.id
+        return self.collection.with_lock(self._append,
+                                         job,
+                                         name,
+                                         left=True,
+                                         force=force_start)
 
     def priority_enqueue_or_raise(self,
                                   function,
@@ -79,8 +95,7 @@ class MainLoop(threading.Thread):
             job = queue.get_from_name(name)
             if job is None:
                 job = Job(function, name, times, data)
-                job.id = queue.append(job, name)
-                return job.id
+                return self._append(queue, job, name)
             queue.prioritize(job, force=force_start)
             return None
         return self.collection.with_lock(conditional_append)
@@ -118,10 +133,14 @@ class MainLoop(threading.Thread):
             # Remove the watcher from the queue, and re-enque if needed.
             if exc_info and job.failures < job.times:
                 self._dbg(1, 'Restarting job "%s"' % job.name)
-                job.start(self.job_cls, self._on_job_completed)
-                self.job_started_event(job.child)
+                job.start(self.job_cls,
+                          self._on_job_completed,
+                          self.pool,
+                          self.job_started_event)
             else:
                 self.collection.task_done(job)
+                if self.pool is not None:
+                    self.pool.unregister(job)
 
     def run(self):
         while True:
@@ -134,7 +153,11 @@ class MainLoop(threading.Thread):
                 break  # self.collection.stop() was called.
 
             self.job_init_event(job)
-            job.start(self.job_cls, self._on_job_completed)
-            self.job_started_event(job.child)
+            job.start(self.job_cls,
+                      self._on_job_completed,
+                      self.pool,
+                      self.job_started_event)
             self._dbg(1, 'Job "%s" started.' % job.name)
+        if self.pool is not None:
+            self.pool.shutdown()
         self._dbg(2, 'Main loop terminated.')
@@ -21,20 +21,57 @@ from builtins import object
 # CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
-from uuid import uuid4
+import threading
+from heapq import heappush, heappop, heapify
+from itertools import count
 from collections import deque
 from multiprocessing import Condition, RLock
 
+# Item ids are unique within the process, such that they may be used
+# as keys across pipelines (e.g. by a Logger that is shared by several
+# queues).
+_ids = count(1)
+
+
+class _Entry(object):
+    __slots__ = ('id', 'item', 'name', 'key', 'done')
+
+    def __init__(self, item_id, item, name):
+        self.id = item_id
+        self.item = item
+        self.name = name
+        self.key = None  # The position in the queue, if queued.
+        self.done = None  # An Event, once somebody waits for the item.
+
+    def finish(self):
+        if self.done is not None:
+            self.done.set()
+
 
 class Pipeline(object):
 
     """
     A collection that is similar to Python's Queue object, except
     it also tracks items that are currently sleeping or in progress.
+
+    Queued items are kept in a heap that is ordered by a position key.
+    Items that are added to the left get decreasing keys, items that are
+    added to the right get increasing keys, so adding, prioritizing and
+    removing an item costs O(log n). Entries that became invalid (because
+    the item was prioritized, removed, or is sleeping) are left in the
+    heap and skipped when they reach the top.
+
+    To avoid waking every waiting thread whenever anything changes,
+    waiters are woken selectively: the condition wakes the threads that
+    call next(), the idle_condition wakes wait() and wait_all() only
+    once no item is working or queued, and wait_for_id() waits for an
+    event of the item.
     """
 
     def __init__(self, max_working=1):
-        self.condition = Condition(RLock())
+        lock = RLock()
+        self.condition = Condition(lock)
+        self.idle_condition = Condition(lock)
         self.max_working = max_working
         self.running = True
         self.paused = False
@@ -42,32 +79,47 @@ class Pipeline(object):
         self.force = None
         self.sleeping = None
         self.working = None
-        self.item2id = None
-        self.id2item = None  # for performance reasons
-        self.name2id = None
-        self.id2name = None
+        self.head = None
+        self.tail = None
+        self.item2entry = None
+        self.id2entry = None
+        self.name2entry = None
         self.clear()
 
     def __len__(self):
         with self.condition:
-            return len(self.id2item)
+            return len(self.id2entry)
 
     def __contains__(self, item):
         with self.condition:
-            return item in self.item2id
+            return item in self.item2entry
 
     def _register_item(self, name, item):
-        uuid = uuid4().hex
-        self.id2item[uuid] = item
-        self.item2id[item] = uuid
-        if name is None:
-            return uuid
-        if name in self.name2id:
+        if name is not None and name in self.name2entry:
             msg = 'an item named %s is already queued' % repr(name)
             raise AttributeError(msg)
-        self.name2id[name] = uuid
-        self.id2name[uuid] = name
-        return uuid
+        entry = _Entry(next(_ids), item, name)
+        self.id2entry[entry.id] = entry
+        self.item2entry[item] = entry
+        if name is not None:
+            self.name2entry[name] = entry
+        return entry
+
+    def _push(self, entry, left=False):
+        if left:
+            entry.key = self.head
+            self.head -= 1
+        else:
+            entry.key = self.tail
+            self.tail += 1
+        heappush(self.queue, (entry.key, entry.id))
+
+        # Drop the invalid entries once they make up most of the heap.
+        if len(self.queue) > 2 * len(self.id2entry) + 64:
+            self.queue = [(e.key, e.id) for e in self.id2entry.values()
+                          if e.key is not None and
+                          e.item not in self.sleeping]
+            heapify(self.queue)
 
     def get_from_name(self, name):
         """
@@ -75,18 +127,16 @@ class Pipeline(object):
         is known.
         """
         with self.condition:
-            try:
-                item_id = self.name2id[name]
-            except KeyError:
+            entry = self.name2entry.get(name)
+            if entry is None:
                 return None
-            return self.id2item[item_id]
-        return None
+            return entry.item
 
     def has_id(self, item_id):
         """
         Returns True if the queue contains an item with the given id.
         """
-        return item_id in self.id2item
+        return item_id in self.id2entry
 
     def task_done(self, item):
         with self.condition:
@@ -99,14 +149,13 @@ class Pipeline(object):
                 # child threads to complete.
                 self.condition.notify_all()
                 return
-            item_id = self.item2id.pop(item)
-            self.id2item.pop(item_id)
-            try:
-                name = self.id2name.pop(item_id)
-            except KeyError:
-                pass
-            else:
-                self.name2id.pop(name)
+            entry = self.item2entry.pop(item)
+            del self.id2entry[entry.id]
+            if entry.name is not None:
+                del self.name2entry[entry.name]
+            entry.finish()
+            if not self.working:
+                self.idle_condition.notify_all()
             self.condition.notify_all()
 
     def append(self, item, name=None):
@@ -114,20 +163,20 @@ class Pipeline(object):
         Adds the given item to the end of the pipeline.
         """
         with self.condition:
-            self.queue.append(item)
-            uuid = self._register_item(name, item)
+            entry = self._register_item(name, item)
+            self._push(entry)
             self.condition.notify_all()
-            return uuid
+            return entry.id
 
     def appendleft(self, item, name=None, force=False):
         with self.condition:
+            entry = self._register_item(name, item)
             if force:
                 self.force.append(item)
             else:
-                self.queue.appendleft(item)
-            uuid = self._register_item(name, item)
+                self._push(entry, True)
             self.condition.notify_all()
-            return uuid
+            return entry.id
 
     def prioritize(self, item, force=False):
         """
@@ -136,25 +185,31 @@ class Pipeline(object):
         with self.condition:
             # If the job is already running (or about to be forced),
             # there is nothing to be done.
-            if item in self.working or item in self.force:
+            entry = self.item2entry[item]
+            if entry.key is None:
                 return
-            self.queue.remove(item)
             if force:
+                entry.key = None
                 self.force.append(item)
             else:
-                self.queue.appendleft(item)
+                self._push(entry, True)
             self.condition.notify_all()
 
     def clear(self):
         with self.condition:
-            self.queue = deque()
+            if self.id2entry is not None:
+                for entry in self.id2entry.values():
+                    entry.finish()
+            self.queue = []
             self.force = deque()
             self.sleeping = set()
             self.working = set()
-            self.item2id = dict()
-            self.id2item = dict()
-            self.name2id = dict()
-            self.id2name = dict()
+            self.head = -1
+            self.tail = 0
+            self.item2entry = dict()
+            self.id2entry = dict()
+            self.name2entry = dict()
+            self.idle_condition.notify_all()
             self.condition.notify_all()
 
     def stop(self):
@@ -190,28 +245,36 @@ class Pipeline(object):
         assert item in self.sleeping
         with self.condition:
             self.sleeping.remove(item)
+            entry = self.item2entry.get(item)
+            if entry is not None and entry.key is not None:
+                # Restore the position of the item in the queue.
+                heappush(self.queue, (entry.key, entry.id))
             self.condition.notify_all()
 
     def wait_for_id(self, item_id):
         with self.condition:
-            while self.has_id(item_id):
-                self.condition.wait()
+            entry = self.id2entry.get(item_id)
+            if entry is None:
+                return
+            if entry.done is None:
+                entry.done = threading.Event()
+        entry.done.wait()
 
     def wait(self):
         """
         Waits for all currently running tasks to complete.
         """
-        with self.condition:
+        with self.idle_condition:
             while self.working:
-                self.condition.wait()
+                self.idle_condition.wait()
 
     def wait_all(self):
         """
         Waits for all queued and running tasks to complete.
         """
-        with self.condition:
+        with self.idle_condition:
             while len(self) > 0:
-                self.condition.wait()
+                self.idle_condition.wait()
 
     def with_lock(self, function, *args, **kwargs):
         with self.condition:
@@ -228,41 +291,22 @@ class Pipeline(object):
     def get_working(self):
         return list(self.working)
 
-    def _popleft_sleeping(self):
-        sleeping = []
-        while True:
-            try:
-                node = self.queue[0]
-            except IndexError:
-                break
-            if node not in self.sleeping:
-                break
-            sleeping.append(node)
-            self.queue.popleft()
-        return sleeping
-
     def _get_next(self, pop=True):
-        # We need to leave sleeping items in the queue because else we
-        # would not know their original position after they wake up.
-        # So we need to temporarily remove sleeping items from the top of
-        # the queue here.
-        sleeping = self._popleft_sleeping()
-
-        # Get the first non-sleeping item from the queue.
-        if pop:
-            try:
-                next = self.queue.popleft()
-            except IndexError:
-                next = None
-        else:
-            try:
-                next = self.queue[0]
-            except IndexError:
-                next = None
-
-        # Re-insert sleeping items.
-        self.queue.extendleft(sleeping)
-        return next
+        # Sleeping items keep their key, but are removed from the heap
+        # until they wake up.
+        queue = self.queue
+        while queue:
+            key, item_id = queue[0]
+            entry = self.id2entry.get(item_id)
+            if entry is None or entry.key != key or \
+                    entry.item in self.sleeping:
+                heappop(queue)
+                continue
+            if pop:
+                heappop(queue)
+                entry.key = None
+            return entry.item
+        return None
 
     def try_next(self):
         """
@@ -22,8 +22,10 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import
 from builtins import object
+from multiprocessing import cpu_count
 from ..util.event import Event
-from .job import Thread, Process
+from .job import Thread, Process, PooledThread, PooledProcess, \
+    ThreadPool, ProcessPool
 from .pipeline import Pipeline
 from .mainloop import MainLoop
 
@@ -39,7 +41,10 @@ class WorkQueue(object):
                  collection=None,
                  debug=0,
                  max_threads=1,
-                 mode='threading'):
+                 mode='threading',
+                 max_jobs_per_worker=100,
+                 request_handler=None,
+                 processes=None):
         """
         Constructor.
 
@@ -47,13 +52,43 @@ class WorkQueue(object):
         :param debug: The debug level.
         :type  max_threads: int
         :param max_threads: The maximum number of concurrent threads.
+        :type  mode: str
+        :param mode: 'threading' starts a new thread for every job,
+            'multiprocessing' starts a new process for every job,
+            'threadpool' runs the jobs on threads that are reused,
+            'processpool' runs them in worker processes that are reused,
+            and 'hybrid' runs them in threads that are spread across a
+            fixed number of worker processes; see
+            :class:`Exscript.workqueue.job.ProcessPool`.
+        :type  max_jobs_per_worker: int
+        :param max_jobs_per_worker: In processpool and hybrid mode, the
+            number of jobs after which a worker process is replaced.
+        :type  request_handler: callable
+        :param request_handler: In processpool and hybrid mode, handles
+            the requests that jobs send to the parent process; see
+            :class:`Exscript.workqueue.job.ProcessPool`.
+        :type  processes: int
+        :param processes: In hybrid mode, the number of worker processes.
+            Defaults to the number of CPUs.
         """
         if mode == 'threading':
             self.job_cls = Thread
+        elif mode == 'threadpool':
+            self.job_cls = PooledThread
+        elif mode in ('processpool', 'hybrid'):
+            self.job_cls = PooledProcess
         elif mode == 'multiprocessing':
             self.job_cls = Process
         else:
             raise TypeError('invalid "mode" argument: ' + repr(mode))
+        self.mode = mode
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.request_handler = request_handler
+        if mode != 'hybrid':
+            processes = 0
+        elif processes is None:
+            processes = cpu_count()
+        self.processes = processes
         if collection is None:
             self.collection = Pipeline(max_threads)
         else:
@@ -70,7 +105,15 @@ class WorkQueue(object):
         self._init()
 
     def _init(self):
-        self.main_loop = MainLoop(self.collection, self.job_cls)
+        if self.mode == 'threadpool':
+            pool = ThreadPool()
+        elif self.mode in ('processpool', 'hybrid'):
+            pool = ProcessPool(self.max_jobs_per_worker,
+                               self.request_handler,
+                               self.processes)
+        else:
+            pool = None
+        self.main_loop = MainLoop(self.collection, self.job_cls, pool)
         self.main_loop.debug = self.debug
         self.main_loop.job_init_event.listen(self.job_init_event)
         self.main_loop.job_started_event.listen(self.job_started_event)
@@ -0,0 +1,118 @@
+import sys
+import unittest
+import os.path
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from Exscript import Account, AccountPool, Logger
+from Exscript.emulators import VirtualDevice
+from Exscript.servers import Telnetd
+from Exscript.interpreter.exception import FailException
+from Exscript.util.log import log_to
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from Exscript.aioqueue import AsyncQueue
+else:
+    AsyncQueue = None
+
+
+def login(job, host, conn):
+    # Returning the coroutine works like an "async def" callback.
+    return conn.login()
+
+
+def fail(job, host, conn):
+    raise FailException('intentional error')
+
+
+@unittest.skipIf(AsyncQueue is None, 'requires Python 3.5 or later')
+class AsyncQueueTest(unittest.TestCase):
+    CORRELATE = AsyncQueue
+
+    def setUp(self):
+        self.hostname = '127.0.0.1'
+        self.port = 1239
+        self.url = 'telnet://%s:%d' % (self.hostname, self.port)
+        self.account = Account('user', password='password')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.device = VirtualDevice(self.hostname, echo=True)
+        self.daemon = Telnetd(self.hostname, self.port, self.device)
+        self.daemon.start()
+        time.sleep(.2)
+        self.queue = AsyncQueue(verbose=-1, max_sessions=3)
+
+    def tearDown(self):
+        self.daemon.exit()
+        self.daemon.join()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def testConstructor(self):
+        self.assertEqual(self.queue.get_max_sessions(), 3)
+        self.assertEqual(self.queue.get_progress(), 0.0)
+
+    def testGetProgress(self):
+        self.assertEqual(self.queue.get_progress(), 0.0)
+        self.testRun()
+        self.assertEqual(self.queue.get_progress(), 100.0)
+
+    def testSetMaxSessions(self):
+        self.queue.set_max_sessions(10)
+        self.assertEqual(self.queue.get_max_sessions(), 10)
+
+    def testGetMaxSessions(self):
+        self.testSetMaxSessions()
+
+    def testAddAccount(self):
+        self.queue.add_account(self.account)
+        self.assertEqual(self.queue.account_manager.default_pool.n_accounts(),
+                         1)
+
+    def testAddAccountPool(self):
+        pool = AccountPool([self.account])
+        self.queue.add_account_pool(pool, lambda host: True)
+        self.wait(self.queue.run([self.url] * 3, login))
+        self.assertEqual(self.queue.completed, 3)
+        self.assertEqual(self.queue.failed, 0)
+
+    def testRun(self):
+        self.queue.add_account(self.account)
+        self.wait(self.queue.run([self.url] * 5, login))
+        self.assertEqual(self.queue.completed, 5)
+        self.assertEqual(self.queue.failed, 0)
+
+        errors = []
+        self.queue.exc_cb = lambda name, exc_info: errors.append(name)
+        self.wait(self.queue.run([self.url] * 2, fail, attempts=2))
+        self.assertEqual(self.queue.completed, 7)
+        self.assertEqual(self.queue.failed, 2)
+        self.assertEqual(len(errors), 4)
+
+        # Dummy and pseudo devices need no network connection.
+        pseudo = os.path.join(os.path.dirname(__file__),
+                              'protocols',
+                              'pseudodev.py')
+        self.wait(self.queue.run(['dummy://dummy1', 'pseudo://' + pseudo],
+                                 login))
+        self.assertEqual(self.queue.completed, 9)
+        self.assertEqual(self.queue.failed, 2)
+
+    def testLogging(self):
+        logger = Logger()
+        self.queue.add_account(self.account)
+        self.wait(self.queue.run([self.url] * 2, log_to(logger)(login)))
+        self.assertEqual(len(logger.get_logs()), 2)
+        self.assertEqual(len(logger.get_succeeded_logs()), 2)
+        self.assertIn('Password:', str(logger.get_logs()[0]))
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(AsyncQueueTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
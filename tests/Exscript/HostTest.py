@@ -100,6 +100,18 @@ class HostTest(unittest.TestCase):
         self.assertEqual(self.host.get_option('verify_fingerprint'), True)
         self.assertEqual(self.host.get_options(), {'verify_fingerprint': True})
 
+        # Some options are only supported by SSH.
+        self.assertRaises(ValueError, self.host.set_option, 'exec_mode', True)
+        self.assertRaises(ValueError,
+                          self.host.set_option,
+                          'jump_host',
+                          'ssh://bastion')
+        self.host.set_protocol('ssh')
+        self.host.set_option('exec_mode', True)
+        self.assertEqual(self.host.get_option('exec_mode'), True)
+        self.assertRaises(ValueError, self.host.set_protocol, 'telnet')
+        self.assertEqual(self.host.get_protocol(), 'ssh')
+
     def testGetOption(self):
         pass  # Tested in testSetOption().
 
@@ -16,14 +16,16 @@ from tempfile import mkdtemp
 from multiprocessing import Value
 from multiprocessing.managers import BaseManager
 from Exscript import Queue, Account, AccountPool, FileLogger
-from Exscript.protocols import Protocol, Dummy
+from Exscript.queue import _LocalPipe
+from Exscript.protocols import Protocol, Dummy, ConnectionPool, DriverCache, \
+    Resolver
 from Exscript.interpreter.exception import FailException
-from Exscript.util.decorator import bind
+from Exscript.util.decorator import bind, autologin
 from Exscript.util.log import log_to
 
 
 def count_calls(job, data, **kwargs):
-    assert hasattr(job, 'start')
+    assert hasattr(job, 'run')
     assert 'testarg' in kwargs
     data.value += 1
 
@@ -33,6 +35,11 @@ def count_calls2(job, host, conn, data, **kwargs):
     count_calls(job, data, **kwargs)
 
 
+def count_os(job, host, conn, data, os):
+    if conn.guess_os() == os:
+        data.value += 1
+
+
 def count_and_fail(job, data, **kwargs):
     count_calls(job, data, **kwargs)
     raise FailException('intentional error')
@@ -202,6 +209,58 @@ class QueueTest(unittest.TestCase):
         self.assertEqual(response, 'ok')
         pipe.close()
 
+    def testLocalPipe(self):
+        account = Account('user', 'test')
+        self.accm.add_account(account)
+        pipe = _LocalPipe(self.accm)
+        pipe.send(('acquire-account', None))
+        self.assertEqual(pipe.recv()[0], account.__hash__())
+        pipe.send(('foo', None))
+        self.assertIsInstance(pipe.recv(), Exception)
+        pipe.close()
+        self.assertTrue(account.lock.acquire(False))  # Was released.
+        account.lock.release()
+
+        # Jobs that run in the parent process use no real pipe.
+        if self.mode not in ('threading', 'threadpool'):
+            return
+        pipes = []
+
+        def get_pipe(job, host, conn):
+            pipes.append(job.data['pipe'])
+        self.queue.run('dummy://dummy1', get_pipe)
+        self.queue.join()
+        self.assertIsInstance(pipes[0], _LocalPipe)
+
+    def testCreateHandler(self):
+        account = Account('user', 'test')
+        self.accm.add_account(account)
+        replies = []
+
+        class FakePipe(object):
+            send = replies.append
+        handler = self.queue._create_handler(FakePipe())
+        handler(('acquire-account-from-hash', account.__hash__()))
+        for n in range(100):
+            if replies:
+                break
+            time.sleep(.01)
+        self.assertEqual(replies[0][0], account.__hash__())
+
+        # Waiting for an account does not block the caller.
+        handler2 = self.queue._create_handler(FakePipe())
+        handler2(('acquire-account-from-hash', account.__hash__()))
+        self.assertEqual(len(replies), 1)
+
+        # Completing the job releases the account.
+        handler(None)
+        for n in range(100):
+            if len(replies) == 2:
+                break
+            time.sleep(.01)
+        self.assertEqual(replies[1][0], account.__hash__())
+        handler2(None)
+
     def testSetMaxThreads(self):
         self.assertEqual(1, self.queue.get_max_threads())
         self.queue.set_max_threads(2)
@@ -273,6 +332,71 @@ class QueueTest(unittest.TestCase):
         self.assertTrue(task is not None)
         return task
 
+    def testConnectionPool(self):
+        pool = ConnectionPool()
+        if self.mode in ('multiprocessing', 'processpool', 'hybrid'):
+            self.assertRaises(ValueError,
+                              Queue,
+                              mode=self.mode,
+                              connection_pool=pool)
+            return
+
+        connections = []
+
+        def remember_conn(job, host, conn):
+            connections.append(conn)
+
+        self.createQueue(verbose=-1, connection_pool=pool)
+        self.queue.add_account(Account('user', 'test'))
+        func = autologin()(remember_conn)
+        self.queue.run('dummy://dummy1', func)
+        self.queue.join()
+        self.queue.run('dummy://dummy1', func)
+        self.queue.run('dummy://dummy2', func)
+        self.queue.join()
+        self.assertEqual(len(connections), 3)
+        self.assertEqual(connections[0], connections[1])
+        self.assertNotEqual(connections[0], connections[2])
+        self.assertEqual(len(pool), 2)
+
+        # A connection is closed instead of released if the function
+        # fails.
+        closed = []
+
+        def fail(job, host, conn):
+            close = conn.close
+
+            def watch_close(force=False):
+                closed.append(force)
+                close(force)
+            conn.close = watch_close
+            connections.append(conn)
+            raise FailException('intentional error')
+
+        self.queue.run('dummy://dummy1', autologin()(fail))
+        self.queue.join()
+        self.assertEqual(connections[3], connections[0])
+        self.assertEqual(closed, [True])
+        self.assertEqual(len(pool), 1)
+        pool.close()
+
+    def testDriverCache(self):
+        cache = DriverCache(os.path.join(self.tempdir, 'drivers.db'))
+        cache.set('dummy1', 'ios', 60)
+        self.createQueue(verbose=-1, driver_cache=cache)
+        data = Value('i', 0)
+        func = bind(count_os, data, 'ios')
+        self.queue.run(['dummy://dummy1', 'dummy://dummy2'], func)
+        self.queue.join()
+        self.assertEqual(data.value, 1)
+
+    def testResolve(self):
+        resolver = Resolver()
+        self.createQueue(verbose=-1, resolver=resolver, resolve_threads=2)
+        self.queue.run(['dummy://dummy1', 'telnet://127.0.0.1:1'], count_calls)
+        self.assertEqual(list(resolver.cache.keys()), ['127.0.0.1'])
+        self.queue.join()
+
     def testIsCompleted(self):
         self.assertTrue(self.queue.is_completed())
         task = self.startTask()
@@ -428,10 +552,25 @@ class QueueTestMultiProcessing(QueueTest):
     mode = 'multiprocessing'
 
 
+class QueueTestThreadPool(QueueTest):
+    mode = 'threadpool'
+
+
+class QueueTestProcessPool(QueueTest):
+    mode = 'processpool'
+
+
+class QueueTestHybrid(QueueTest):
+    mode = 'hybrid'
+
+
 def suite():
     loader = unittest.TestLoader()
     suite1 = loader.loadTestsFromTestCase(QueueTest)
     suite2 = loader.loadTestsFromTestCase(QueueTestMultiProcessing)
-    return unittest.TestSuite((suite1, suite2))
+    suite3 = loader.loadTestsFromTestCase(QueueTestThreadPool)
+    suite4 = loader.loadTestsFromTestCase(QueueTestProcessPool)
+    suite5 = loader.loadTestsFromTestCase(QueueTestHybrid)
+    return unittest.TestSuite((suite1, suite2, suite3, suite4, suite5))
 if __name__ == '__main__':
     unittest.TextTestRunner(verbosity=2).run(suite())
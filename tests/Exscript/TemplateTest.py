@@ -26,7 +26,7 @@ class Log(object):
         return data
 
 
-def dummy_cb(job, host, conn, template_test):
+def dummy_cb(job, host, conn, template_test, window=1):
     # Warning: Assertions raised in this function happen in a subprocess!
     # Create a log object.
     log = Log()
@@ -45,7 +45,7 @@ def dummy_cb(job, host, conn, template_test):
     # Go.
     conn.login(flush=True)
     try:
-        template.eval_file(conn, tmpl, slot=10)
+        template.eval_file(conn, tmpl, slot=10, window=window)
     except Exception as e:
         print(log.data)
         raise
@@ -82,8 +82,8 @@ class TemplateTest(unittest.TestCase):
     def tearDown(self):
         self.queue.destroy()
 
-    def testTemplates(self):
-        callback = bind(log_to(self.logger)(dummy_cb), self)
+    def testTemplates(self, window=1):
+        callback = bind(log_to(self.logger)(dummy_cb), self, window=window)
         for test in os.listdir(test_dir):
             pseudo = os.path.join(test_dir, test, 'pseudodev.py')
             if os.path.exists(pseudo):
@@ -98,6 +98,9 @@ class TemplateTest(unittest.TestCase):
         report = format(self.logger, show_successful=False)
         self.assertTrue(not failed, report)
 
+    def testTemplatesPipelined(self):
+        self.testTemplates(window=5)
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromTestCase(TemplateTest)
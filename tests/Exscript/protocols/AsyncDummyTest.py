@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+import sys
+import unittest
+import re
+import os.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account
+from Exscript.emulators import VirtualDevice
+from Exscript.protocols.exception import TimeoutException
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from Exscript.protocols.aio import AsyncDummy
+else:
+    AsyncDummy = None
+
+
+@unittest.skipIf(AsyncDummy is None, 'requires Python 3.5 or later')
+class AsyncDummyTest(unittest.TestCase):
+    CORRELATE = AsyncDummy
+
+    def setUp(self):
+        self.hostname = '127.0.0.1'
+        self.account = Account('user', password='password')
+        self.prompt = self.hostname + '> '
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.device = VirtualDevice(self.hostname, echo=True)
+        self.device.add_command('ls', 'file1 file2')
+        self.protocol = AsyncDummy(device=self.device, timeout=1)
+
+    def tearDown(self):
+        self.wait(self.protocol.close(True))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def doLogin(self, flush=True):
+        self.wait(self.protocol.connect(self.hostname))
+        self.wait(self.protocol.login(self.account, flush=flush))
+
+    def testConstructor(self):
+        self.assertIsInstance(self.protocol, AsyncDummy)
+        self.assertIsInstance(AsyncDummy().device, VirtualDevice)
+
+    def testIsDummy(self):
+        self.assertTrue(self.protocol.is_dummy())
+
+    def testLogin(self):
+        self.doLogin(flush=False)
+        self.assertTrue(self.protocol.is_protocol_authenticated())
+        self.assertTrue(self.protocol.is_app_authenticated())
+        self.assertEqual(self.protocol.buffer.tail(len(self.prompt)),
+                         self.prompt)
+
+    def testSend(self):
+        self.doLogin()
+        self.protocol.send('ls\r')
+        self.wait(self.protocol.expect_prompt())
+        self.assertTrue(self.protocol.response.startswith('ls'))
+        self.assertIn('file1 file2', self.protocol.response)
+
+        # Nothing else is going to arrive.
+        self.assertRaises(TimeoutException,
+                          self.wait,
+                          self.protocol.expect(re.compile('notgoingtohappen')))
+
+    def testClose(self):
+        self.doLogin()
+        self.wait(self.protocol.close(True))
+        self.assertEqual(str(self.protocol.buffer), '')
+        self.wait(self.protocol.close(True))
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(AsyncDummyTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
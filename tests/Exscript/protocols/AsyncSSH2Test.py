@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+import sys
+import unittest
+import os.path
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account, PrivateKey
+from Exscript.emulators import VirtualDevice
+from Exscript.servers import sshd, SSHd
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from Exscript.protocols.aio import AsyncSSH2
+else:
+    AsyncSSH2 = None
+
+keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
+key = PrivateKey.from_file(keyfile)
+
+
+@unittest.skipIf(AsyncSSH2 is None, 'requires Python 3.5 or later')
+class AsyncSSH2Test(unittest.TestCase):
+    CORRELATE = AsyncSSH2
+
+    def setUp(self):
+        self.hostname = '127.0.0.1'
+        self.port = 1238
+        self.account = Account('user', password='password')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.device = VirtualDevice(self.hostname, echo=True)
+        self.device.add_command('df', 'foobar')
+        self.daemon = SSHd(self.hostname, self.port, self.device, key=key)
+        self.daemon.start()
+        time.sleep(.2)
+        self.protocol = AsyncSSH2(timeout=1)
+
+    def tearDown(self):
+        self.wait(self.protocol.close(True))
+        self.daemon.exit()
+        self.daemon.join()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def doConnect(self):
+        self.wait(self.protocol.connect(self.hostname, self.port))
+
+    def testConstructor(self):
+        self.assertIsInstance(self.protocol, AsyncSSH2)
+
+    def testGetBanner(self):
+        self.assertEqual(self.protocol.get_banner(), None)
+        self.doConnect()
+        self.assertEqual(self.protocol.get_banner(), None)
+
+    def testGetRemoteVersion(self):
+        self.assertEqual(self.protocol.get_remote_version(), None)
+        self.doConnect()
+        self.assertEqual(self.protocol.get_remote_version(),
+                         sshd.local_version)
+
+    def testSend(self):
+        self.assertRaises(AttributeError, self.protocol.send, 'ls')
+        self.doConnect()
+        self.wait(self.protocol.login(self.account))
+        self.protocol.send('df\r')
+        self.assertIsNotNone(self.protocol.sending)
+        self.wait(self.protocol.expect_prompt())
+        self.assertTrue(self.protocol.response.startswith('df'))
+        self.assertIn('foobar', self.protocol.response)
+        self.assertEqual(self.protocol.sending, None)
+
+    def testExecute(self):
+        self.protocol = AsyncSSH2(timeout=1, exec_mode=True)
+        received = []
+        self.protocol.data_received_event.connect(received.append)
+        self.doConnect()
+        self.wait(self.protocol.login(self.account))
+        del received[:]
+        self.assertEqual(self.wait(self.protocol.execute('df')), (0, None))
+        self.assertEqual(self.protocol.response, 'df\r\nfoobar')
+        self.assertEqual(''.join(received), 'foobar')
+
+    def testClose(self):
+        self.doConnect()
+        self.wait(self.protocol.close(True))
+        self.wait(self.protocol.close(True))
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(AsyncSSH2Test)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
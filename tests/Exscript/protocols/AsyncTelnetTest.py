@@ -0,0 +1,219 @@
+from __future__ import absolute_import
+import sys
+import unittest
+import re
+import os.path
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account
+from Exscript.emulators import VirtualDevice
+from Exscript.servers import Telnetd
+from Exscript.protocols.exception import InvalidCommandException, \
+    ExpectCancelledException
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from Exscript.protocols.aio import AsyncTelnet
+else:
+    AsyncTelnet = None
+
+
+@unittest.skipIf(AsyncTelnet is None, 'requires Python 3.5 or later')
+class AsyncTelnetTest(unittest.TestCase):
+    CORRELATE = AsyncTelnet
+
+    def setUp(self):
+        self.hostname = '127.0.0.1'
+        self.port = 1237
+        self.account = Account('user', password='password')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.device = VirtualDevice(self.hostname, echo=True)
+        self.device.add_command('ls', 'file1 file2')
+        self.device.add_command('seq',
+                                '\n'.join(str(i) for i in range(500)))
+        self.device.add_command('this-command-causes-an-error',
+                                '\ncommand not found')
+        self.createDaemon()
+        self.daemon.start()
+        time.sleep(.2)
+        self.createProtocol()
+
+    def tearDown(self):
+        self.wait(self.protocol.close(True))
+        self.daemon.exit()
+        self.daemon.join()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def createDaemon(self):
+        self.daemon = Telnetd(self.hostname, self.port, self.device)
+
+    def createProtocol(self):
+        self.protocol = AsyncTelnet(timeout=1)
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def doConnect(self):
+        self.wait(self.protocol.connect(self.hostname, self.port))
+
+    def doLogin(self, flush=True):
+        self.doConnect()
+        self.wait(self.protocol.login(self.account, flush=flush))
+
+    def testConstructor(self):
+        self.assertIsInstance(self.protocol, AsyncTelnet)
+
+    def testConnect(self):
+        self.assertEqual(self.protocol.response, None)
+        self.doConnect()
+        self.assertEqual(self.protocol.response, None)
+        self.assertEqual(self.protocol.get_host(), self.hostname)
+
+    def testLogin(self):
+        self.doLogin(flush=False)
+        self.assertTrue(self.protocol.response is not None)
+        self.assertTrue(self.protocol.is_protocol_authenticated())
+        self.assertTrue(self.protocol.is_app_authenticated())
+        self.assertTrue(self.protocol.is_app_authorized())
+
+    def testAuthenticate(self):
+        self.doConnect()
+        self.wait(self.protocol.authenticate(self.account, flush=False))
+        self.assertTrue(self.protocol.is_protocol_authenticated())
+        self.assertTrue(self.protocol.is_app_authenticated())
+        self.assertFalse(self.protocol.is_app_authorized())
+
+    def testProtocolAuthenticate(self):
+        self.doConnect()
+        self.wait(self.protocol.protocol_authenticate(self.account))
+        self.assertTrue(self.protocol.is_protocol_authenticated())
+        self.assertFalse(self.protocol.is_app_authenticated())
+
+    def testAppAuthenticate(self):
+        self.testProtocolAuthenticate()
+        self.wait(self.protocol.app_authenticate(self.account, flush=False))
+        self.assertTrue(self.protocol.is_app_authenticated())
+        self.assertFalse(self.protocol.is_app_authorized())
+
+    def testAppAuthorize(self):
+        self.testAppAuthenticate()
+        response = self.protocol.response
+        self.wait(self.protocol.app_authorize(self.account, flush=True))
+        self.assertEqual(self.protocol.response, response)
+        self.assertTrue(self.protocol.is_app_authorized())
+
+    def testAutoAppAuthorize(self):
+        self.testAppAuthenticate()
+        response = self.protocol.response
+        self.wait(self.protocol.auto_app_authorize(self.account, flush=True))
+        self.assertEqual(self.protocol.response, response)
+        self.assertTrue(self.protocol.is_app_authorized())
+
+    def testAutoinit(self):
+        self.doLogin()
+        self.wait(self.protocol.autoinit())
+
+    def testSend(self):
+        self.doLogin()
+        self.protocol.send('ls\r')
+        self.wait(self.protocol.expect_prompt())
+        self.assertTrue(self.protocol.response.startswith('ls'))
+
+    def testExecute(self):
+        self.doLogin()
+        self.wait(self.protocol.execute('ls'))
+        self.assertTrue(self.protocol.response.startswith('ls'))
+        self.assertIn('file1 file2', self.protocol.response)
+
+        self.protocol.set_error_prompt('.')
+        self.assertRaises(InvalidCommandException,
+                          self.wait,
+                          self.protocol.execute('this-command-causes-an-error'))
+
+    def testExecuteStream(self):
+        self.doLogin()
+
+        async def collect(command):
+            lines = []
+            async for line in self.protocol.execute_stream(command):
+                lines.append(line)
+            return lines
+        lines = self.wait(collect('seq'))
+        self.assertEqual(lines[0], 'seq')
+        self.assertEqual(lines[1:], [str(i) for i in range(500)])
+
+        # The rest of the response is skipped if an error is found.
+        self.protocol.set_error_prompt('command not found')
+        self.assertRaises(InvalidCommandException,
+                          self.wait,
+                          collect('this-command-causes-an-error'))
+        self.wait(self.protocol.execute('ls'))
+        self.assertTrue(self.protocol.response.startswith('ls'))
+
+    def testExecuteMany(self):
+        self.doLogin()
+        responses = self.wait(self.protocol.execute_many(['ls'] * 3, 3))
+        self.assertEqual(len(responses), 3)
+        for response in responses:
+            self.assertTrue(response.startswith('ls'), response)
+            self.assertIn('file1 file2', response)
+
+    def testWaitfor(self):
+        self.doLogin()
+        oldresponse = self.protocol.response
+        self.protocol.send('ls\r')
+        self.wait(self.protocol.waitfor(re.compile(r'[\r\n]')))
+        self.assertNotEqual(oldresponse, self.protocol.response)
+        oldresponse = self.protocol.response
+        self.wait(self.protocol.waitfor(re.compile(r'[\r\n]')))
+        self.assertEqual(oldresponse, self.protocol.response)
+
+    def testExpect(self):
+        self.doLogin()
+        oldresponse = self.protocol.response
+        self.protocol.send('ls\r')
+        self.wait(self.protocol.expect(re.compile(r'[\r\n]')))
+        self.assertNotEqual(oldresponse, self.protocol.response)
+
+    def testExpectPrompt(self):
+        self.doLogin()
+        oldresponse = self.protocol.response
+        self.protocol.send('ls\r')
+        self.wait(self.protocol.expect_prompt())
+        self.assertNotEqual(oldresponse, self.protocol.response)
+
+    def testCancelExpect(self):
+        self.doLogin()
+        self.protocol.data_received_event.connect(
+            lambda data: self.protocol.cancel_expect())
+        self.protocol.send('ls\r')
+        self.assertRaises(ExpectCancelledException,
+                          self.wait,
+                          self.protocol.expect('notgoingtohappen'))
+
+    def testClose(self):
+        self.doLogin()
+        self.wait(self.protocol.close(True))
+        self.wait(self.protocol.close(True))
+
+    def testConcurrentSessions(self):
+        # The test server listens with a backlog of one, so connections
+        # may be accepted with a delay.
+        conns = [AsyncTelnet(timeout=10) for i in range(3)]
+        for step in (lambda c: c.connect(self.hostname, self.port),
+                     lambda c: c.login(self.account),
+                     lambda c: c.execute('ls')):
+            self.wait(asyncio.gather(*[step(c) for c in conns]))
+        for conn in conns:
+            self.assertIn('file1 file2', conn.response)
+            self.wait(conn.close(True))
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(AsyncTelnetTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
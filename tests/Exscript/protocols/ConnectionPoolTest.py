@@ -0,0 +1,111 @@
+import sys
+import unittest
+import time
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account, Host
+from Exscript.protocols import Dummy
+from Exscript.protocols.pool import ConnectionPool
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    CORRELATE = ConnectionPool
+
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2)
+        self.account = Account('user', 'test')
+        self.host1 = Host('dummy://host1')
+        self.host2 = Host('dummy://host2')
+
+    def login(self, host):
+        conn = Dummy()
+        conn.connect(host.get_address(), host.get_tcp_port())
+        conn.login(self.account)
+        return conn
+
+    def testConstructor(self):
+        self.assertEqual(len(self.pool), 0)
+        self.assertEqual(self.pool.max_size, 2)
+
+    def testAcquire(self):
+        self.assertEqual(self.pool.acquire(self.host1), None)
+        conn = self.login(self.host1)
+        self.pool.release(self.host1, conn)
+        self.assertEqual(self.pool.acquire(self.host2), None)
+        self.assertEqual(self.pool.acquire(self.host1), conn)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+
+        # Hosts that have an account attached only get connections that
+        # were logged in using that account.
+        self.pool.release(self.host1, conn)
+        host = Host('dummy://host1')
+        host.set_account(Account('user', 'test'))
+        self.assertEqual(self.pool.acquire(host), None)
+        host.set_account(self.account)
+        self.assertEqual(self.pool.acquire(host), conn)
+
+        # Hosts without an account do not get connections that were
+        # logged in using an account that was attached to the host.
+        self.pool.release(host, conn)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+        self.assertEqual(self.pool.acquire(host), conn)
+
+        # Connections that fail the health check are discarded.
+        self.pool.health_check = lambda conn: False
+        self.pool.release(self.host1, conn)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+        self.assertEqual(len(self.pool), 0)
+
+        # So are connections that were idle for too long.
+        self.pool.health_check = lambda conn: True
+        self.pool.idle_timeout = 0
+        self.pool.release(self.host1, conn)
+        time.sleep(.01)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+        self.assertEqual(len(self.pool), 0)
+
+    def testRelease(self):
+        # Connections that are not logged in are closed.
+        conn = Dummy()
+        conn.connect('host1', None)
+        self.pool.release(self.host1, conn)
+        self.assertEqual(len(self.pool), 0)
+
+        # So are connections for which the account is unknown.
+        conn = self.login(self.host1)
+        conn.last_account = None
+        self.pool.release(self.host1, conn)
+        self.assertEqual(len(self.pool), 0)
+
+        # And connections that were logged in using an account other
+        # than the one that is attached to the host.
+        host = Host('dummy://host1')
+        host.set_account(Account('user', 'test'))
+        self.pool.release(host, self.login(self.host1))
+        self.assertEqual(len(self.pool), 0)
+
+        # The least recently used connection is evicted.
+        conn1 = self.login(self.host1)
+        conn2 = self.login(self.host2)
+        conn3 = self.login(self.host1)
+        self.pool.release(self.host1, conn1)
+        self.pool.release(self.host2, conn2)
+        self.pool.release(self.host1, conn3)
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(self.pool.acquire(self.host1), conn3)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+        self.assertEqual(self.pool.acquire(self.host2), conn2)
+
+    def testClose(self):
+        self.pool.release(self.host1, self.login(self.host1))
+        self.pool.release(self.host2, self.login(self.host2))
+        self.pool.close()
+        self.assertEqual(len(self.pool), 0)
+        self.assertEqual(self.pool.acquire(self.host1), None)
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(ConnectionPoolTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
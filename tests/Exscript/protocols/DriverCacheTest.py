@@ -0,0 +1,77 @@
+import sys
+import unittest
+import time
+import os
+import shutil
+import pickle
+from tempfile import mkdtemp
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.protocols.drivercache import DriverCache
+
+
+class DriverCacheTest(unittest.TestCase):
+    CORRELATE = DriverCache
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'drivers.db')
+        self.cache = DriverCache(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testConstructor(self):
+        self.assertTrue(os.path.exists(self.filename))
+        self.assertEqual(self.cache.ttl, 86400)
+        self.assertEqual(self.cache.min_confidence, 50)
+
+        # Opening an existing database keeps its content.
+        self.cache.set('host1:22', 'ios', 60)
+        self.assertEqual(DriverCache(self.filename).get('host1:22'),
+                         ('ios', 60))
+
+        # The cache can be passed to other processes.
+        cache = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(cache.get('host1:22'), ('ios', 60))
+
+    def testGet(self):
+        self.assertEqual(self.cache.get('host1:22'), None)
+        self.cache.set('host1:22', 'ios', 60)
+        self.assertEqual(self.cache.get('host1:22'), ('ios', 60))
+        self.assertEqual(self.cache.get('host1:23'), None)
+
+        # Expired entries are ignored.
+        self.cache.ttl = 0
+        time.sleep(.01)
+        self.assertEqual(self.cache.get('host1:22'), None)
+
+    def testSet(self):
+        self.cache.set('host1:22', 'ios', 60)
+        self.cache.set('host1:22', 'nxos', 95)
+        self.assertEqual(self.cache.get('host1:22'), ('nxos', 95))
+
+        # Weak guesses are not stored.
+        self.cache.set('host2:22', 'shell', 20)
+        self.assertEqual(self.cache.get('host2:22'), None)
+
+    def testRemove(self):
+        self.cache.remove('host1:22')
+        self.cache.set('host1:22', 'ios', 60)
+        self.cache.set('host2:22', 'ios', 60)
+        self.cache.remove('host1:22')
+        self.assertEqual(self.cache.get('host1:22'), None)
+        self.assertEqual(self.cache.get('host2:22'), ('ios', 60))
+
+    def testClear(self):
+        self.cache.set('host1:22', 'ios', 60)
+        self.cache.set('host2:22', 'ios', 60)
+        self.cache.clear()
+        self.assertEqual(self.cache.get('host1:22'), None)
+        self.assertEqual(self.cache.get('host2:22'), None)
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(DriverCacheTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
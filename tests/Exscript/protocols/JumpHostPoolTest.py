@@ -0,0 +1,240 @@
+import sys
+import unittest
+import os
+import socket
+import select
+import threading
+import shutil
+import paramiko
+from tempfile import mkdtemp
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account, Host
+from Exscript.protocols import JumpHostPool
+from Exscript.protocols.exception import LoginFailure
+
+keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
+
+
+def _forward(channel, sock):
+    try:
+        while True:
+            readable, writeable, excp = select.select([channel, sock], [], [])
+            if channel in readable:
+                data = channel.recv(4096)
+                if not data:
+                    break
+                sock.sendall(data)
+            if sock in readable:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                channel.sendall(data)
+    except (socket.error, EOFError):
+        pass
+    finally:
+        channel.close()
+        sock.close()
+
+
+class _BastionServer(paramiko.ServerInterface):
+
+    def __init__(self):
+        self.destinations = {}
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if password == 'test':
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.destinations[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+
+class Bastion(threading.Thread):
+
+    """
+    A jump host that forwards direct-tcpip channels, for testing.
+    """
+
+    def __init__(self, host, port):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.host_key = paramiko.RSAKey(filename=keyfile)
+        self.connections = 0
+        self.running = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(5)
+        self.listener.settimeout(.1)
+
+    def _handle_connection(self, conn):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        server = _BastionServer()
+        try:
+            transport.start_server(server=server)
+            while self.running and transport.is_active():
+                channel = transport.accept(.1)
+                if channel is None:
+                    continue
+                destination = server.destinations.pop(channel.get_id())
+                sock = socket.create_connection(destination)
+                thread = threading.Thread(target=_forward,
+                                          args=(channel, sock))
+                thread.daemon = True
+                thread.start()
+        except (socket.error, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            transport.close()
+
+    def run(self):
+        while self.running:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            self.connections += 1
+            thread = threading.Thread(target=self._handle_connection,
+                                      args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def save_host_key(self, filename, hostname):
+        host_keys = paramiko.HostKeys()
+        host_keys.add(hostname, self.host_key.get_name(), self.host_key)
+        host_keys.save(filename)
+
+    def exit(self):
+        self.running = False
+        self.join()
+        self.listener.close()
+
+
+class JumpHostPoolTest(unittest.TestCase):
+    CORRELATE = JumpHostPool
+
+    def setUp(self):
+        self.bastion = Bastion('127.0.0.1', 1240)
+        self.bastion.start()
+        self.echo = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.echo.bind(('127.0.0.1', 0))
+        self.echo.listen(5)
+        self.echo_port = self.echo.getsockname()[1]
+        self.tmpdir = mkdtemp()
+        self.known_hosts = os.path.join(self.tmpdir, 'known_hosts')
+        self.bastion.save_host_key(self.known_hosts, '127.0.0.1')
+        self.pool = JumpHostPool(max_channels=2,
+                                 max_transports=2,
+                                 known_hosts=self.known_hosts)
+        self.jump_host = Host('ssh://127.0.0.1:1240')
+        self.jump_host.set_account(Account('user', 'test'))
+
+    def tearDown(self):
+        self.pool.close()
+        self.bastion.exit()
+        self.echo.close()
+        shutil.rmtree(self.tmpdir)
+
+    def openChannel(self, **kwargs):
+        channel = self.pool.open_channel(self.jump_host,
+                                         '127.0.0.1',
+                                         self.echo_port,
+                                         timeout=5,
+                                         **kwargs)
+        conn, addr = self.echo.accept()
+        self.addCleanup(conn.close)
+        return channel, conn
+
+    def testConstructor(self):
+        self.assertEqual(len(self.pool), 0)
+        self.assertEqual(self.pool.max_channels, 2)
+        self.assertEqual(self.pool.max_transports, 2)
+
+    def testOpenChannel(self):
+        channel, conn = self.openChannel()
+        channel.sendall(b'hello')
+        self.assertEqual(conn.recv(5), b'hello')
+        conn.sendall(b'world')
+        self.assertEqual(channel.recv(5), b'world')
+        self.assertEqual(len(self.pool), 1)
+
+        # Channels share the connection to the jump host until it is full.
+        self.openChannel()
+        self.assertEqual(len(self.pool), 1)
+        self.assertEqual(self.bastion.connections, 1)
+        self.openChannel()
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(self.bastion.connections, 2)
+
+        # max_transports is reached, so the least loaded one is used.
+        self.openChannel()
+        self.openChannel()
+        self.assertEqual(len(self.pool), 2)
+
+        # Closed channels free the connection up again.
+        channel.close()
+        self.openChannel()
+        self.assertEqual(self.bastion.connections, 2)
+
+        # Wrong passwords are reported.
+        host = Host('ssh://127.0.0.1:1240')
+        host.set_account(Account('user', 'wrong'))
+        self.assertRaises(LoginFailure,
+                          self.pool.open_channel,
+                          host,
+                          '127.0.0.1',
+                          self.echo_port)
+
+    def testHostKeys(self):
+        # Unknown host keys are rejected, unless the connection does not
+        # verify fingerprints.
+        self.pool = JumpHostPool(known_hosts=os.devnull)
+        self.assertRaises(paramiko.SSHException, self.openChannel)
+        self.assertEqual(len(self.pool), 0)
+        self.openChannel(verify_fingerprint=False)
+        self.assertEqual(len(self.pool), 1)
+
+        # Connections that verify fingerprints do not reuse connections
+        # that were opened without checking the key.
+        self.assertRaises(paramiko.SSHException, self.openChannel)
+
+        # Changed keys are always rejected.
+        filename = os.path.join(self.tmpdir, 'changed')
+        host_keys = paramiko.HostKeys()
+        host_keys.add('127.0.0.1', 'ssh-rsa', paramiko.RSAKey.generate(1024))
+        host_keys.save(filename)
+        self.pool = JumpHostPool(known_hosts=filename)
+        self.assertRaises(paramiko.BadHostKeyException,
+                          self.openChannel,
+                          verify_fingerprint=False)
+
+    def testConnect(self):
+        # The socket to the jump host is opened by the given function.
+        addresses = []
+
+        def connect(address, port):
+            addresses.append((address, port))
+            return socket.create_connection((address, port))
+        self.openChannel(connect=connect)
+        self.assertEqual(addresses, [('127.0.0.1', 1240)])
+
+    def testClose(self):
+        channel, conn = self.openChannel()
+        self.pool.close()
+        self.assertEqual(len(self.pool), 0)
+        self.assertTrue(channel.closed)
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(JumpHostPoolTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
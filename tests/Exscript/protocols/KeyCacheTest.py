@@ -0,0 +1,229 @@
+import sys
+import unittest
+import os
+import time
+import shutil
+import threading
+from tempfile import mkdtemp
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+import paramiko
+from Exscript.protocols import keycache
+from Exscript.protocols.keycache import FileCache, KnownHostsWriter
+
+keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
+
+
+class ParseError(Exception):
+
+    def __init__(self, filename, reason):
+        Exception.__init__(self, 'cannot parse %s: %s' % (filename, reason))
+        self.filename = filename
+        self.reason = reason
+
+
+class FileCacheTest(unittest.TestCase):
+    CORRELATE = FileCache
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'file')
+        self.loaded = []
+        self.cache = FileCache(self.load)
+        self.write('one')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, filename, *args):
+        self.loaded.append((filename,) + args)
+        with open(filename) as fp:
+            data = fp.read()
+        if data == 'invalid':
+            raise ValueError('invalid data')
+        if data == 'unparsable':
+            raise ParseError(filename, 'unparsable data')
+        return data
+
+    def write(self, data):
+        with open(self.filename, 'w') as fp:
+            fp.write(data)
+
+    def testConstructor(self):
+        self.assertEqual(len(self.cache), 0)
+
+    def testGet(self):
+        self.assertEqual(self.cache.get(self.filename), 'one')
+        self.assertEqual(self.cache.get(self.filename), 'one')
+        self.assertEqual(self.loaded, [(self.filename,)])
+
+        # Extra arguments are part of the key.
+        self.assertEqual(self.cache.get(self.filename, 'x'), 'one')
+        self.assertEqual(len(self.loaded), 2)
+        self.assertEqual(len(self.cache), 2)
+
+        # Changed files are parsed again.
+        self.write('three')
+        self.assertEqual(self.cache.get(self.filename), 'three')
+        self.assertEqual(len(self.loaded), 3)
+
+        self.assertRaises(OSError, self.cache.get, self.filename + 'x')
+
+        # Errors are cached until the file changes.
+        self.write('invalid')
+        self.assertRaises(ValueError, self.cache.get, self.filename)
+        self.assertRaises(ValueError, self.cache.get, self.filename)
+        self.assertEqual(len(self.loaded), 4)
+        self.write('five')
+        self.assertEqual(self.cache.get(self.filename), 'five')
+        self.assertEqual(len(self.loaded), 5)
+
+        # Errors whose constructor does not take their own args are
+        # raised as they are, and each caller gets a new instance.
+        self.write('unparsable')
+        errors = []
+        for n in range(2):
+            try:
+                self.cache.get(self.filename)
+            except ParseError as e:
+                errors.append(e)
+        self.assertEqual(len(errors), 2)
+        self.assertIsNot(errors[0], errors[1])
+        self.assertEqual(errors[1].reason, 'unparsable data')
+        self.assertEqual(len(self.loaded), 6)
+
+    def testGetConcurrent(self):
+        # Loading a file does not block lookups of other files.
+        other = os.path.join(self.tmpdir, 'other')
+        with open(other, 'w') as fp:
+            fp.write('two')
+        started = threading.Event()
+        proceed = threading.Event()
+
+        def load(filename):
+            if filename == self.filename:
+                started.set()
+                proceed.wait(10)
+            return self.load(filename)
+        self.cache = FileCache(load)
+        thread = threading.Thread(target=self.cache.get,
+                                  args=(self.filename,))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(10))
+            self.assertEqual(self.cache.get(other), 'two')
+        finally:
+            proceed.set()
+            thread.join()
+        self.assertEqual(self.cache.get(self.filename), 'one')
+        self.assertEqual(len(self.loaded), 2)
+
+    def testMakeKey(self):
+        self.cache = FileCache(self.load, lambda arg: (len(arg),))
+        self.assertEqual(self.cache.get(self.filename, 'x'), 'one')
+        self.assertEqual(self.cache.get(self.filename, 'y'), 'one')
+        self.assertEqual(self.cache.get(self.filename, 'xy'), 'one')
+        self.assertEqual(self.loaded, [(self.filename, 'x'),
+                                       (self.filename, 'xy')])
+        self.assertEqual(sorted(k[1] for k in self.cache.entries), [1, 2])
+
+    def testClear(self):
+        self.cache.get(self.filename)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.cache.get(self.filename)
+        self.assertEqual(len(self.loaded), 2)
+
+
+class KnownHostsWriterTest(unittest.TestCase):
+    CORRELATE = KnownHostsWriter
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'known_hosts')
+        self.writer = KnownHostsWriter(self.filename, batch_size=2)
+        self.key = paramiko.RSAKey.from_private_key_file(keyfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def lookup(self, hostname):
+        return keycache.lookup_host_keys(self.filename, hostname)
+
+    def testConstructor(self):
+        self.assertEqual(self.writer.batch_size, 2)
+        self.assertFalse(os.path.exists(self.filename))
+
+    def testAdd(self):
+        self.writer.add('host1', self.key)
+        self.assertFalse(os.path.exists(self.filename))
+        self.writer.add('host2', self.key)
+        self.assertEqual(self.lookup('host1'), {'ssh-rsa': self.key})
+        self.assertEqual(self.lookup('host2'), {'ssh-rsa': self.key})
+        self.assertEqual(self.lookup('host3'), {})
+
+    def testLookup(self):
+        self.assertEqual(self.writer.lookup('host1'), {})
+        self.writer.add('host1', self.key)
+        self.assertEqual(self.writer.lookup('host1'), {'ssh-rsa': self.key})
+        self.writer.flush()
+        self.assertEqual(self.writer.lookup('host1'), {})
+
+    def testFlush(self):
+        self.writer.flush()
+        self.assertFalse(os.path.exists(self.filename))
+        self.writer.add('host1', self.key)
+        self.writer.flush()
+        self.assertEqual(self.lookup('host1'), {'ssh-rsa': self.key})
+
+        # Keys are appended.
+        self.writer.add('host2', self.key)
+        self.writer.flush()
+        with open(self.filename) as fp:
+            self.assertEqual(len(fp.readlines()), 2)
+
+
+class keycacheTest(unittest.TestCase):
+
+    def testLookupHostKeys(self):
+        tmpdir = mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'known_hosts')
+            key = paramiko.RSAKey.from_private_key_file(keyfile)
+            host_keys = paramiko.HostKeys()
+            host_keys.add('host1', 'ssh-rsa', key)
+            host_keys.add(host_keys.hash_host('host2'), 'ssh-rsa', key)
+            host_keys.save(filename)
+            lookup = keycache.lookup_host_keys
+            self.assertEqual(lookup(filename, 'host1'), {'ssh-rsa': key})
+            self.assertEqual(lookup(filename, 'host2'), {'ssh-rsa': key})
+            self.assertEqual(lookup(filename, 'host3'), {})
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testLoadPrivateKey(self):
+        key = keycache.load_private_key(paramiko.RSAKey, keyfile)
+        self.assertIsInstance(key, paramiko.RSAKey)
+        self.assertTrue(keycache.load_private_key(paramiko.RSAKey, keyfile)
+                        is key)
+
+        # The password is not part of the cache key.
+        keycache.load_private_key(paramiko.RSAKey, keyfile, 'secret')
+        for entry_key in keycache.private_key_cache.entries:
+            self.assertNotIn('secret', entry_key)
+
+    def testGetKnownHostsWriter(self):
+        writer = keycache.get_known_hosts_writer('~/known_hosts')
+        self.assertEqual(writer.filename,
+                         os.path.expanduser('~/known_hosts'))
+        self.assertTrue(keycache.get_known_hosts_writer('~/known_hosts')
+                        is writer)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(FileCacheTest),
+                               loader.loadTestsFromTestCase(KnownHostsWriterTest),
+                               loader.loadTestsFromTestCase(keycacheTest)])
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
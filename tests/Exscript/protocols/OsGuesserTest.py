@@ -78,6 +78,32 @@ class OsGuesserTest(unittest.TestCase):
                 osg.data_received(char, False)
             self.assertEqual(osg.get('os'), osname)
 
+        # Only the tail of a long head is kept.
+        osg = OsGuesser(window_size=100)
+        motd = 'Unauthorized access is prohibited.\r\n' * 100
+        for pos in range(0, len(motd), 7):
+            osg.data_received(motd[pos:pos + 7], False)
+        self.assertEqual(len(osg.auth_buffer), 100)
+        osg.data_received('\r\nCisco Nexus Operating System (NX-OS) Software',
+                          False)
+        self.assertEqual(osg.get('os'), 'nxos')
+
+        # Once locked in, the guess no longer changes.
+        osg.data_received('\r\nJUNOS 10.1 built by builder\r\n', False)
+        osg.data_received('\r\nRP/0/RSP0/CPU0:router#', True)
+        self.assertEqual(osg.get('os'), 'nxos')
+
+    def testIsLocked(self):
+        osg = OsGuesser()
+        self.assertFalse(osg.is_locked())
+        osg.set('os', 'ios', 89)
+        self.assertFalse(osg.is_locked())
+        osg.set('os', 'nxos', 95)
+        self.assertTrue(osg.is_locked())
+
+        # An unknown OS is never locked in.
+        self.assertFalse(OsGuesser(lock_confidence=0).is_locked())
+
     def testProtocolInfo(self):
         osg = OsGuesser()
         osg.protocol_info('')
@@ -8,13 +8,15 @@ import os.path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 import time
+import shutil
+from tempfile import mkdtemp
 from functools import partial
 from configparser import RawConfigParser
 from Exscript import Account, PrivateKey
 from Exscript.emulators import VirtualDevice
 from Exscript.protocols.exception import TimeoutException, \
-    InvalidCommandException, ExpectCancelledException
-from Exscript.protocols import drivers
+    InvalidCommandException, ExpectCancelledException, LoginFailure
+from Exscript.protocols import drivers, DriverCache
 from Exscript.protocols.protocol import Protocol
 
 
@@ -55,6 +57,8 @@ class ProtocolTest(unittest.TestCase):
         ls_response = '-rw-r--r--  1 sab  nmc    1628 Aug 18 10:02 file'
         self.device.add_command('ls',   ls_response)
         self.device.add_command('df',   'foobar')
+        self.device.add_command('seq',
+                                '\n'.join(str(i) for i in range(5000)))
         self.device.add_command('exit', '')
         self.device.add_command('this-command-causes-an-error',
                                 '\ncommand not found')
@@ -143,6 +147,19 @@ class ProtocolTest(unittest.TestCase):
     def testConstructor(self):
         self.assertIsInstance(self.protocol, Protocol)
 
+        # By default, only the tail of the conversation is kept.
+        protocol = Protocol(capture_size=10)
+        protocol._receive_cb('0123456789' * 10)
+        self.assertEqual(protocol.stdout.getvalue(), '0123456789')
+        protocol = Protocol(capture='file', capture_size=10)
+        protocol._receive_cb('0123456789' * 10)
+        protocol.stdout.seek(0)
+        self.assertEqual(protocol.stdout.read(), '0123456789' * 10)
+        protocol = Protocol(capture='off')
+        protocol._receive_cb('0123456789')
+        self.assertEqual(protocol.stdout, None)
+        self.assertRaises(ValueError, Protocol, capture='foo')
+
     def testCopy(self):
         self.assertEqual(self.protocol, self.protocol.__copy__())
 
@@ -462,6 +479,54 @@ class ProtocolTest(unittest.TestCase):
                           self.protocol.execute,
                           'this-command-causes-an-error')
 
+    def testExecuteMany(self):
+        # Test can not work on the abstract base.
+        if self.protocol.__class__ == Protocol:
+            self.assertRaises(Exception, self.protocol.execute_many, ['ls'])
+            return
+        self.doLogin()
+        commands = ['ls', 'df', 'ls', 'df', 'ls']
+        for window in (1, 2, 10):
+            responses = self.protocol.execute_many(commands, window)
+            self.assertEqual(len(responses), len(commands))
+            for command, response in zip(commands, responses):
+                self.assertTrue(response.startswith(command), response)
+            self.assertIn('foobar', responses[1])
+            self.assertNotIn('foobar', responses[2])
+            self.assertEqual(self.protocol.response, responses[-1])
+
+        # Make sure that we raise an error if any response matches
+        # the error prompt, and that the connection remains usable.
+        self.protocol.set_error_prompt('command not found')
+        commands = ['ls', 'this-command-causes-an-error', 'df', 'ls']
+        self.assertRaises(InvalidCommandException,
+                          self.protocol.execute_many,
+                          commands,
+                          2)
+        self.protocol.execute('df')
+        self.assertTrue(self.protocol.response.startswith('df'))
+
+    def testExecuteStream(self):
+        # Test can not work on the abstract base.
+        if self.protocol.__class__ == Protocol:
+            self.assertRaises(Exception,
+                              list,
+                              self.protocol.execute_stream('ls'))
+            return
+        self.doLogin()
+        lines = list(self.protocol.execute_stream('seq'))
+        self.assertEqual(lines[0], 'seq')
+        self.assertEqual(lines[1:], [str(i) for i in range(5000)])
+
+        # Make sure that we raise an error if the device responds
+        # with something that matches any of the error prompts, and
+        # that the rest of the response is skipped.
+        self.protocol.set_error_prompt('command not found')
+        stream = self.protocol.execute_stream('this-command-causes-an-error')
+        self.assertRaises(InvalidCommandException, list, stream)
+        self.protocol.execute('df')
+        self.assertTrue(self.protocol.response.startswith('df'))
+
     def testWaitfor(self):
         # Test can not work on the abstract base.
         if self.protocol.__class__ == Protocol:
@@ -558,6 +623,14 @@ class ProtocolTest(unittest.TestCase):
             return
         # Can't really be tested.
 
+    def testSetKeepalive(self):
+        self.protocol.set_keepalive(10)
+        if self.protocol.__class__ == Protocol:
+            return
+        self.doConnect()
+        self.protocol.set_keepalive(10)
+        self.protocol.set_keepalive(0)
+
     def testClose(self):
         if self.protocol.__class__ != Protocol:
             self.doConnect()
@@ -583,6 +656,57 @@ class ProtocolTest(unittest.TestCase):
         self.assertTrue(self.protocol.is_app_authorized())
         self.assertEqual('shell', self.protocol.guess_os())
 
+    def testDriverCache(self):
+        # Test can not work on the abstract base.
+        if self.protocol.__class__ == Protocol:
+            return
+        tmpdir = mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'drivers.db')
+            cache = DriverCache(filename, min_confidence=0)
+            self.protocol.driver_cache = cache
+            self.doLogin()
+            self.assertEqual('shell', self.protocol.guess_os())
+            key = self.protocol.driver_cache_key
+            self.assertEqual(cache.get(key)[0], 'shell')
+
+            # The next connection starts with the cached driver.
+            self.protocol.close(True)
+            cache.set(key, 'ios', 60)
+            self.createProtocol()
+            self.protocol.driver_cache = cache
+            self.doConnect()
+            self.assertEqual('ios', self.protocol.guess_os())
+
+            # Without a port, the default port of the protocol is used.
+            self.protocol._load_cached_driver(None)
+            port = self.protocol.DEFAULT_PORT
+            if port is None:
+                expected = self.hostname
+            else:
+                expected = '%s:%s' % (self.hostname, port)
+            self.assertEqual(self.protocol.driver_cache_key, expected)
+
+            # A cached entry does not lock the OS guesser.
+            self.protocol.close(True)
+            cache.set(key, 'ios', 100)
+            self.createProtocol()
+            self.protocol.driver_cache = cache
+            self.doConnect()
+            self.assertEqual('ios', self.protocol.guess_os())
+            self.assertFalse(self.protocol.os_guesser.is_locked())
+
+            # A failed login removes the entry.
+            def fail(*args, **kwargs):
+                raise LoginFailure('login failed')
+            self.protocol._app_authenticate = fail
+            self.assertRaises(LoginFailure,
+                              self.protocol.app_authenticate,
+                              self.account)
+            self.assertEqual(cache.get(key), None)
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromTestCase(ProtocolTest)
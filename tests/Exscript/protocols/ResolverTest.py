@@ -0,0 +1,88 @@
+import sys
+import unittest
+import os
+import socket
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.protocols import Resolver
+from Exscript.protocols import resolver
+
+
+class ResolverTest(unittest.TestCase):
+    CORRELATE = Resolver
+
+    def setUp(self):
+        self.resolver = Resolver(ttl=60, negative_ttl=60)
+        self.lookups = []
+        self.getaddrinfo = socket.getaddrinfo
+
+        def getaddrinfo(host, port, family=0, socktype=0):
+            self.lookups.append(host)
+            if host == 'unknown':
+                raise socket.gaierror('unknown host')
+            return [(socket.AF_INET6, socket.SOCK_STREAM, 6, '',
+                     ('::1', 0, 0, 0)),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('127.0.0.1', 0))]
+        resolver.socket.getaddrinfo = getaddrinfo
+
+    def tearDown(self):
+        resolver.socket.getaddrinfo = self.getaddrinfo
+
+    def testConstructor(self):
+        self.assertEqual(len(self.resolver), 0)
+        self.assertEqual(self.resolver.ttl, 60)
+
+    def testGetaddrinfo(self):
+        result = self.resolver.getaddrinfo('localhost', 22)
+        self.assertEqual([r[4] for r in result],
+                         [('::1', 22, 0, 0), ('127.0.0.1', 22)])
+        result = self.resolver.getaddrinfo('localhost', 23, socket.AF_INET)
+        self.assertEqual([r[4] for r in result], [('127.0.0.1', 23)])
+        self.assertEqual(self.lookups, ['localhost'])
+
+        # Failed lookups are cached, too.
+        self.assertRaises(socket.gaierror,
+                          self.resolver.getaddrinfo, 'unknown', 22)
+        self.assertRaises(socket.gaierror,
+                          self.resolver.getaddrinfo, 'unknown', 22)
+        self.assertEqual(self.lookups, ['localhost', 'unknown'])
+
+        # Each lookup raises a new exception.
+        errors = []
+        for n in range(2):
+            try:
+                self.resolver.getaddrinfo('unknown', 22)
+            except socket.gaierror as e:
+                errors.append(e)
+        self.assertIsNot(errors[0], errors[1])
+        self.assertEqual(errors[0].args, ('unknown host',))
+
+        # Expired entries are looked up again.
+        self.resolver.ttl = 0
+        self.resolver.clear()
+        self.resolver.getaddrinfo('localhost', 22)
+        time.sleep(.01)
+        self.resolver.getaddrinfo('localhost', 22)
+        self.assertEqual(self.lookups.count('localhost'), 3)
+
+    def testResolve(self):
+        hosts = ['host%d' % n for n in range(50)] + ['unknown', 'host1']
+        self.resolver.resolve(hosts, max_threads=5)
+        self.assertEqual(len(self.resolver), 51)
+        self.assertEqual(sorted(self.lookups), sorted(set(hosts)))
+        self.resolver.getaddrinfo('host1', 22)
+        self.assertEqual(len(self.lookups), 51)
+        self.resolver.resolve([])
+
+    def testClear(self):
+        self.resolver.getaddrinfo('localhost', 22)
+        self.resolver.clear()
+        self.assertEqual(len(self.resolver), 0)
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(ResolverTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
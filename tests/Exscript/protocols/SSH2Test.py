@@ -3,11 +3,17 @@ import sys
 import unittest
 import re
 import os.path
+import socket
+import shutil
+from tempfile import mkdtemp
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 from .ProtocolTest import ProtocolTest
+from .JumpHostPoolTest import Bastion
 from Exscript.servers import sshd, SSHd
-from Exscript.protocols import SSH2
+from Exscript.protocols import SSH2, SSH2Channel, ssh2, JumpHostPool
+from Exscript.protocols.exception import ProtocolException, \
+    InvalidCommandException
 from Exscript import PrivateKey
 
 keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
@@ -25,6 +31,187 @@ class SSH2Test(ProtocolTest):
 
     def testConstructor(self):
         self.assertIsInstance(self.protocol, SSH2)
+        self.assertEqual(SSH2(read_size=1024).read_size, 1024)
+        self.assertRaises(ValueError, SSH2, exec_mode='foo')
+
+    def testTuneSocket(self):
+        self.protocol = SSH2(timeout=1, tcp_nodelay=False, tcp_sndbuf=32768)
+        self.doConnect()
+        sock = self.protocol.sock
+        self.assertFalse(sock.getsockopt(socket.IPPROTO_TCP,
+                                         socket.TCP_NODELAY))
+        self.assertFalse(sock.getsockopt(socket.SOL_SOCKET,
+                                         socket.SO_KEEPALIVE))
+        self.assertGreaterEqual(sock.getsockopt(socket.SOL_SOCKET,
+                                                socket.SO_SNDBUF), 32768)
+
+    def testKnownHosts(self):
+        tmpdir = mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'known_hosts')
+            self.protocol = SSH2(timeout=1,
+                                 known_hosts=filename,
+                                 verify_fingerprint=False)
+            self.doConnect()
+            self.protocol.close(True)
+            with open(filename) as fp:
+                self.assertIn(self.hostname + ' ssh-rsa ', fp.read())
+
+            # Known keys are not added again.
+            added = []
+            self.protocol = SSH2(timeout=1,
+                                 known_hosts=filename,
+                                 verify_fingerprint=False)
+            self.protocol._missing_host_key = added.append
+            self.doConnect()
+            self.assertEqual(added, [])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testJumpHost(self):
+        bastion = Bastion(self.hostname, 1240)
+        bastion.start()
+        tmpdir = mkdtemp()
+        known_hosts = os.path.join(tmpdir, 'known_hosts')
+        bastion.save_host_key(known_hosts, self.hostname)
+        pool = JumpHostPool(known_hosts=known_hosts)
+        try:
+            # Both sessions are tunneled through one connection to the
+            # jump host.
+            for n in range(2):
+                self.protocol = SSH2(timeout=1,
+                                     jump_host='ssh://user:test@%s:1240'
+                                               % self.hostname,
+                                     jump_host_pool=pool)
+                self.doLogin()
+                self.protocol.execute('df')
+                self.assertIn('foobar', self.protocol.response)
+                self.protocol.close(True)
+            self.assertEqual(bastion.connections, 1)
+            self.assertEqual(len(pool), 1)
+
+            # The socket options of the connection apply to the jump host
+            # connection as well.
+            pool.close()
+            self.protocol = SSH2(timeout=1,
+                                 tcp_nodelay=False,
+                                 jump_host='ssh://user:test@%s:1240'
+                                           % self.hostname,
+                                 jump_host_pool=pool)
+            self.doLogin()
+            tunnel = list(pool.tunnels.values())[0][0]
+            sock = tunnel.transport.sock
+            self.assertFalse(sock.getsockopt(socket.IPPROTO_TCP,
+                                             socket.TCP_NODELAY))
+        finally:
+            pool.close()
+            bastion.exit()
+            shutil.rmtree(tmpdir)
+
+    def testOpenChannel(self):
+        self.assertRaises(ProtocolException, self.protocol.open_channel)
+        self.doLogin()
+
+        # Each channel has its own buffer and prompt matching.
+        channel = self.protocol.open_channel()
+        self.assertIsInstance(channel, SSH2Channel)
+        self.assertTrue(channel.is_app_authenticated())
+        channel.send('df\r')
+        self.protocol.execute('ls')
+        channel.expect_prompt()
+        self.assertIn('foobar', channel.response)
+        self.assertIn('file', self.protocol.response)
+        self.assertRaises(ProtocolException, channel.connect)
+
+        # Closing the channel leaves the connection open.
+        channel.close(True)
+        self.protocol.execute('df')
+        self.assertIn('foobar', self.protocol.response)
+
+        # Exec channels run a single command.
+        channel = self.protocol.open_channel('df')
+        self.assertEqual(channel.get_exit_status(), 0)
+        self.assertEqual(str(channel.buffer), 'foobar')
+        channel.close(True)
+        channel = self.protocol.open_channel('no-such-command')
+        self.assertEqual(channel.get_exit_status(), 127)
+        channel.close(True)
+
+    def testExecCommand(self):
+        self.assertRaises(ProtocolException, self.protocol.exec_command, 'df')
+        self.doLogin()
+        received = []
+        self.protocol.data_received_event.connect(received.append)
+        self.assertEqual(self.protocol.exec_command('df'), 0)
+        self.assertEqual(self.protocol.response, 'foobar')
+        self.assertEqual(''.join(received), 'foobar')
+        self.assertEqual(self.protocol.exec_command('no-such-command'), 127)
+        self.assertEqual(self.protocol.response, '')
+
+        # The shell is still usable.
+        self.protocol.execute('df')
+        self.assertIn('foobar', self.protocol.response)
+
+        # Exec requests do not change the state of the device, so the
+        # interactive login still works afterwards.
+        self.protocol.close(True)
+        self.createProtocol()
+        self.doConnect()
+        self.protocol.protocol_authenticate(self.account)
+        self.assertEqual(self.protocol.exec_command('df'), 0)
+        self.protocol.app_authenticate(self.account)
+        self.protocol.execute('df')
+        self.assertIn('foobar', self.protocol.response)
+
+    def testExecMode(self):
+        self.protocol = SSH2(timeout=1, exec_mode=True)
+        self.doLogin()
+        self.assertEqual(self.protocol.execute('df'), (0, None))
+        self.assertEqual(self.protocol.response, 'df\r\nfoobar')
+        self.assertEqual(self.protocol.exit_status, 0)
+        self.assertRaises(InvalidCommandException,
+                          self.protocol.execute,
+                          'this-command-causes-an-error')
+        self.protocol.close(True)
+
+        # In 'auto' mode, exec channels are used if the driver allows it.
+        self.protocol = SSH2(timeout=1, exec_mode='auto')
+        self.doLogin()
+        self.protocol.set_driver('generic')
+        self.protocol.execute('df')
+        self.assertEqual(self.protocol.exit_status, None)
+        self.protocol.set_driver('shell')
+        self.protocol.execute('df')
+        self.assertEqual(self.protocol.exit_status, 0)
+
+    def testFillBuffer(self):
+        # Everything that is available is read at once, and listeners are
+        # notified once per read.
+        class Channel(object):
+            def __init__(self, chunks):
+                self.sock, self.peer = socket.socketpair()
+                self.chunks = chunks
+                self.peer.send(b'x')
+
+            def fileno(self):
+                return self.sock.fileno()
+
+            def recv_ready(self):
+                return bool(self.chunks)
+
+            def recv(self, size):
+                return self.chunks.pop(0) if self.chunks else b''
+
+        received = []
+        self.protocol.data_received_event.connect(received.append)
+        self.protocol.shell = Channel([b'foo', b'bar', b'baz'])
+        try:
+            self.assertTrue(self.protocol._fill_buffer())
+            self.assertEqual(received, ['foobarbaz'])
+            self.assertEqual(str(self.protocol.buffer), 'foobarbaz')
+            self.assertFalse(self.protocol._fill_buffer())
+        finally:
+            self.protocol.shell = None
 
     def testGetRemoteVersion(self):
         self.assertEqual(self.protocol.get_remote_version(), None)
@@ -34,6 +221,30 @@ class SSH2Test(ProtocolTest):
     def testLogin(self):
         self.assertRaises(IOError, ProtocolTest.testLogin, self)
 
+    def testAuthMethodCache(self):
+        ssh2._auth_methods.clear()
+        key = self.hostname, self.port, self.user
+        self.doLogin()
+        method = ssh2._auth_methods[key]
+        self.assertEqual(method, '_paramiko_auth_password')
+        self.protocol.close(True)
+
+        # The next login starts with the method that worked, and does
+        # not bother the server with auth_none.
+        auth_none = []
+        self.createProtocol()
+        self.doConnect()
+        self.protocol.client.auth_none = auth_none.append
+        self.protocol.login(self.account)
+        self.assertEqual(auth_none, [])
+        self.protocol.close(True)
+
+        # If the method fails, it is forgotten, and the others are tried.
+        ssh2._auth_methods[key] = '_paramiko_auth_agent'
+        self.createProtocol()
+        self.doLogin()
+        self.assertEqual(ssh2._auth_methods[key], method)
+
     def testAuthenticate(self):
         self.assertRaises(IOError, ProtocolTest.testAuthenticate, self)
 
@@ -4,6 +4,7 @@ import unittest
 import re
 import os
 import time
+import socket
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from .ProtocolTest import ProtocolTest
@@ -24,6 +25,19 @@ class TelnetTest(ProtocolTest):
     def testConstructor(self):
         self.assertIsInstance(self.protocol, Telnet)
 
+    def testTuneSocket(self):
+        self.protocol = Telnet(timeout=1,
+                               tcp_keepalive=30,
+                               tcp_rcvbuf=32768)
+        self.doConnect()
+        sock = self.protocol.tn.sock
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP,
+                                        socket.TCP_NODELAY))
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_KEEPALIVE))
+        self.assertGreaterEqual(sock.getsockopt(socket.SOL_SOCKET,
+                                                socket.SO_RCVBUF), 32768)
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromTestCase(TelnetTest)
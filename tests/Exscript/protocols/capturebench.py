@@ -0,0 +1,45 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the memory that is used to
+# record the conversation with a device. It keeps a number of Protocol
+# objects open, feeds a few hundred KB of output into each of them, and
+# prints the memory that is in use afterwards for every capture policy.
+import sys
+import os
+import tracemalloc
+from io import StringIO
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.protocols.protocol import Protocol
+
+KB = 1024
+SESSIONS = 50
+line = u'interface GigabitEthernet0/1\r\n description uplink to core\r\n'
+chunk = line * (16 * KB // len(line))
+
+
+def run(factory):
+    tracemalloc.start()
+    sessions = []
+    for n in range(SESSIONS):
+        protocol = factory()
+        protocol.app_authenticated = True  # Skip the login-time OS guessing
+        for i in range(16):
+            protocol._receive_cb(chunk)
+        sessions.append(protocol)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for protocol in sessions:
+        if protocol.stdout is not None:
+            protocol.stdout.close()
+    return current / KB / KB, peak / KB / KB
+
+
+if __name__ == '__main__':
+    # "StringIO" is the unbounded buffer that was used by default before.
+    for name, factory in (('StringIO', lambda: Protocol(stdout=StringIO())),
+                          ('ring', lambda: Protocol(capture='ring')),
+                          ('file', lambda: Protocol(capture='file')),
+                          ('off', lambda: Protocol(capture='off'))):
+        current, peak = run(factory)
+        print('%-9s %8.1f MB retained, %8.1f MB peak' % (name, current, peak))
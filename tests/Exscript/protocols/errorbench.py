@@ -0,0 +1,51 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the CPU time that is spent
+# in checking a large response for error messages, such as the output of
+# "show running-config". It runs the error prompts of a driver against
+# a response with 100k lines, once using the per-line loop that
+# Protocol._check_response() used before, and once using a LineMatcher.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.util.buffer import LineMatcher
+from Exscript.protocols.drivers import driver_map
+
+LINES = 100000
+line = u'interface GigabitEthernet0/1\r\n description uplink to core\r\n'
+
+
+def legacy_search(regexs, response):
+    # The algorithm that Protocol._check_response() used before.
+    for line in response.split('\n')[1:]:
+        for n, regex in enumerate(regexs):
+            if regex.search(line):
+                return n, line
+    return None
+
+
+def run(search, regexs, response):
+    start = time.process_time()
+    result = search(regexs, response)
+    return time.process_time() - start, result
+
+
+def matcher_search(regexs, response):
+    return LineMatcher(regexs).search(response, response.find('\n') + 1)
+
+
+if __name__ == '__main__':
+    body = line * (LINES // 2)
+    for name in ('generic', 'ios', 'junos'):
+        regexs = driver_map[name].error_re
+        for label, response in (('clean', u'show run\r\n' + body),
+                                ('error', u'show run\r\n' + body
+                                 + u'% Invalid input detected\r\n'
+                                 + u'error: syntax error\r\n')):
+            before, before_result = run(legacy_search, regexs, response)
+            after, after_result = run(matcher_search, regexs, response)
+            assert before_result == after_result
+            print('%-8s %-5s %7.3fs before, %7.3fs after'
+                  % (name, label, before, after))
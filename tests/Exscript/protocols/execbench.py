@@ -0,0 +1,49 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for comparing the time that is needed to
+# run commands through the interactive shell with the time that is
+# needed to run them on SSH exec channels. It starts the local SSH
+# server, runs the same command a number of times in both modes, and
+# prints the wall clock and CPU time per command.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account, PrivateKey
+from Exscript.emulators import VirtualDevice
+from Exscript.servers import SSHd
+from Exscript.protocols import SSH2
+
+keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
+COMMANDS = 200
+line = 'interface GigabitEthernet0/1\n description uplink to core\n'
+
+
+def run(exec_mode):
+    conn = SSH2(timeout=5, exec_mode=exec_mode)
+    conn.connect('127.0.0.1', 1243)
+    conn.login(Account('user', 'test'))
+    start, cpu_start = time.time(), time.process_time()
+    for n in range(COMMANDS):
+        conn.execute('show')
+    elapsed = time.time() - start
+    cpu = time.process_time() - cpu_start
+    conn.close(force=True)
+    return elapsed / COMMANDS * 1000, cpu / COMMANDS * 1000
+
+
+if __name__ == '__main__':
+    device = VirtualDevice('router1', echo=True)
+    device.add_command('show', line * 100)
+    daemon = SSHd('127.0.0.1', 1243, device, key=PrivateKey.from_file(keyfile))
+    daemon.start()
+    time.sleep(.5)
+    try:
+        for name, exec_mode in (('shell', False), ('exec', True)):
+            elapsed, cpu = run(exec_mode)
+            print('%-6s %6.2f ms/command, %6.2f ms CPU/command'
+                  % (name, elapsed, cpu))
+    finally:
+        daemon.exit()
+        daemon.join()
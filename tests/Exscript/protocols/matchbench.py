@@ -0,0 +1,53 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the CPU time that is spent
+# in looking for a prompt while receiving a large response, such as
+# "show running-config". It feeds one MB of output through the prompt
+# matching code in chunks of the given size, the way SSH2._domatch()
+# does, and prints the CPU time per MB.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.util.buffer import MonitoredBuffer, TailMatcher
+from Exscript.protocols.drivers import driver_map
+
+MB = 1024 * 1024
+line = u'interface GigabitEthernet0/1\r\n description uplink to core\r\n'
+
+
+def legacy_search(buffer, prompt, cleanup):
+    # The algorithm that SSH2._domatch() used before TailMatcher.
+    search_window = buffer.tail(150)
+    search_window, incomplete_tail = cleanup(search_window)
+    for n, regex in enumerate(prompt):
+        match = regex.search(search_window)
+        if match is not None:
+            return n, match, search_window
+    return None
+
+
+def run(driver, chunk_size, search):
+    data = line * (MB // len(line)) + u'\r\nrouter1#'
+    prompt = driver.prompt_re
+    cleanup = driver.clean_response_for_re_match
+    buffer = MonitoredBuffer()
+    start = time.process_time()
+    for pos in range(0, len(data), chunk_size):
+        buffer.append(data[pos:pos + chunk_size])
+        result = search(buffer, prompt, cleanup)
+        if result is not None:
+            break
+    assert result is not None
+    return (time.process_time() - start) * MB / len(data)
+
+
+if __name__ == '__main__':
+    for name in ('generic', 'ios', 'hp_pro_curve'):
+        driver = driver_map[name]
+        for chunk_size in (200, 4096, 65536):
+            before = run(driver, chunk_size, legacy_search)
+            after = run(driver, chunk_size, TailMatcher().search)
+            print('%-14s %6d bytes/read: %7.3fs/MB before, %7.3fs/MB after'
+                  % (name, chunk_size, before, after))
@@ -0,0 +1,68 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the CPU time that is spent
+# in the OsGuesser during the login procedure. It feeds a message of
+# the day followed by each of the banners in the banners/ directory
+# through OsGuesser.data_received() in small chunks, and prints the CPU
+# time per login.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.protocols.osguesser import OsGuesser
+from Exscript.protocols.drivers import drivers
+
+CHUNK_SIZE = 64
+motd = u'Unauthorized access is prohibited and will be prosecuted.\r\n' * 30
+
+
+class LegacyOsGuesser(OsGuesser):
+
+    """
+    The algorithm that OsGuesser used before: the whole head is searched
+    by every driver whenever new data arrives.
+    """
+
+    def __init__(self):
+        OsGuesser.__init__(self)
+        self.protocol_os_map = [d._check_protocol for d in drivers]
+        self.auth_os_map = [d._check_head for d in drivers]
+        self.os_map = [d._check_response for d in drivers]
+
+    def data_received(self, data, app_authentication_done):
+        if app_authentication_done:
+            if self.get('os', 80) in ('unknown', None):
+                self.set_from_match('os', self.os_map, data)
+            return
+        self.auth_buffer += data
+        self.set_from_match('os', self.auth_os_map, self.auth_buffer)
+        self.set_from_match('os', self.os_map,      self.auth_buffer)
+
+
+def run(cls, banners):
+    results = []
+    start = time.process_time()
+    for banner in banners:
+        data = motd + banner
+        osg = cls()
+        for pos in range(0, len(data), CHUNK_SIZE):
+            osg.data_received(data[pos:pos + CHUNK_SIZE], False)
+        results.append(osg.get('os'))
+    return (time.process_time() - start) / len(banners), results
+
+
+if __name__ == '__main__':
+    dirname = os.path.join(os.path.dirname(__file__), 'banners')
+    banners = []
+    for filename in sorted(os.listdir(dirname)):
+        if filename.startswith('.'):
+            continue
+        with open(os.path.join(dirname, filename)) as fp:
+            banners.append(fp.read().rstrip('\n'))
+    before, before_results = run(LegacyOsGuesser, banners)
+    after, after_results = run(OsGuesser, banners)
+    changed = sum(1 for a, b in zip(before_results, after_results) if a != b)
+    print('%d banners, %d guesses changed' % (len(banners), changed))
+    print('%7.2fms/login before, %7.2fms/login after'
+          % (before * 1000, after * 1000))
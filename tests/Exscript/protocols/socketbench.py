@@ -0,0 +1,57 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the effect of the socket
+# options on the time per command. It starts the local Telnet and SSH
+# servers, runs the same commands with Nagle's algorithm enabled and
+# disabled (tcp_nodelay), and prints the wall clock time per command.
+# Nagle's algorithm only delays a write that follows another one that
+# was not yet acknowledged, which is rare in the interactive shell, but
+# common on SSH exec channels.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript import Account, PrivateKey
+from Exscript.emulators import VirtualDevice
+from Exscript.servers import Telnetd, SSHd
+from Exscript.protocols import Telnet, SSH2
+
+keyfile = os.path.join(os.path.dirname(__file__), 'id_rsa')
+COMMANDS = 200
+line = 'interface GigabitEthernet0/1\n description uplink to core\n'
+
+
+def run(cls, port, **kwargs):
+    conn = cls(timeout=5, **kwargs)
+    conn.connect('127.0.0.1', port)
+    conn.login(Account('user', 'test'))
+    start = time.time()
+    for n in range(COMMANDS):
+        conn.execute('show')
+    elapsed = time.time() - start
+    conn.close(force=True)
+    return elapsed / COMMANDS * 1000
+
+
+if __name__ == '__main__':
+    device = VirtualDevice('router1', echo=True)
+    device.add_command('show', line * 20)
+    telnetd = Telnetd('127.0.0.1', 1244, device)
+    sshd = SSHd('127.0.0.1', 1245, device, key=PrivateKey.from_file(keyfile))
+    telnetd.start()
+    sshd.start()
+    time.sleep(.5)
+    try:
+        for name, cls, port, kwargs in (('telnet', Telnet, 1244, {}),
+                                        ('ssh', SSH2, 1245, {}),
+                                        ('ssh exec', SSH2, 1245,
+                                         {'exec_mode': True})):
+            for nodelay in (False, True):
+                elapsed = run(cls, port, tcp_nodelay=nodelay, **kwargs)
+                print('%-8s tcp_nodelay=%-5s %7.2f ms/command'
+                      % (name, nodelay, elapsed))
+    finally:
+        for daemon in (telnetd, sshd):
+            daemon.exit()
+            daemon.join()
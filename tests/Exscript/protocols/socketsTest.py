@@ -0,0 +1,125 @@
+import sys
+import unittest
+import os
+import socket
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+import Exscript.protocols.sockets
+from Exscript.protocols.sockets import open_socket, set_keepalive, \
+    tune_socket
+
+
+def addrinfo(host, port):
+    return (socket.AF_INET, socket.SOCK_STREAM, 6, '', (host, port))
+
+
+class socketsTest(unittest.TestCase):
+    CORRELATE = Exscript.protocols.sockets
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+
+        # A listening socket with a full backlog whose connections are
+        # never accepted, such that connection attempts hang like they
+        # do with an unreachable address.
+        self.dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.dead.bind(('127.0.0.2', 0))
+        self.dead.listen(0)
+        self.dead_port = self.dead.getsockname()[1]
+        self.filler = []
+
+    def tearDown(self):
+        self.server.close()
+        self.dead.close()
+        for sock in self.filler:
+            sock.close()
+
+    def testOpenSocket(self):
+        sock = open_socket([addrinfo('127.0.0.1', self.port)], 1)
+        self.assertEqual(sock.getpeername(), ('127.0.0.1', self.port))
+        self.assertEqual(sock.gettimeout(), None)
+        sock.close()
+
+        # Refused connections fail over to the next address at once.
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        start = time.time()
+        sock = open_socket([addrinfo('127.0.0.1', closed_port),
+                            addrinfo('127.0.0.1', self.port)], 5, delay=2)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(sock.getpeername(), ('127.0.0.1', self.port))
+        sock.close()
+
+        # If no address accepts the connection, the last error is raised.
+        self.assertRaises(socket.error,
+                          open_socket,
+                          [addrinfo('127.0.0.1', closed_port)],
+                          1)
+        self.assertRaises(socket.error, open_socket, [], 1)
+        closed.close()
+
+    def testSetKeepalive(self):
+        sock = open_socket([addrinfo('127.0.0.1', self.port)], 1)
+        set_keepalive(sock, 20, 5, 3)
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_KEEPALIVE))
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP,
+                                             socket.TCP_KEEPIDLE), 20)
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP,
+                                             socket.TCP_KEEPINTVL), 5)
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP,
+                                             socket.TCP_KEEPCNT), 3)
+        set_keepalive(sock, 0)
+        self.assertFalse(sock.getsockopt(socket.SOL_SOCKET,
+                                         socket.SO_KEEPALIVE))
+        sock.close()
+
+    def testTuneSocket(self):
+        sock = open_socket([addrinfo('127.0.0.1', self.port)], 1)
+        tune_socket(sock)
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP,
+                                        socket.TCP_NODELAY))
+        self.assertFalse(sock.getsockopt(socket.SOL_SOCKET,
+                                         socket.SO_KEEPALIVE))
+        tune_socket(sock, nodelay=False, keepalive=60)
+        self.assertFalse(sock.getsockopt(socket.IPPROTO_TCP,
+                                         socket.TCP_NODELAY))
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_KEEPALIVE))
+        sock.close()
+
+    def testOpenSocketStaggered(self):
+        # Fill the backlog of the dead server.
+        while True:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            self.filler.append(sock)
+            if sock.connect_ex(('127.0.0.2', self.dead_port)) != 0:
+                break
+            if len(self.filler) > 10:
+                return  # The OS does not enforce the backlog.
+        dead = addrinfo('127.0.0.2', self.dead_port)
+
+        # An address that does not respond is skipped after the delay.
+        start = time.time()
+        sock = open_socket([dead, addrinfo('127.0.0.1', self.port)], 5, .1)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(sock.getpeername(), ('127.0.0.1', self.port))
+        sock.close()
+
+        # The timeout applies to all attempts together.
+        start = time.time()
+        self.assertRaises(socket.timeout, open_socket, [dead, dead], .3, .1)
+        self.assertLess(time.time() - start, 1)
+
+
+def suite():
+    return unittest.TestLoader().loadTestsFromTestCase(socketsTest)
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,92 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the CPU time that is spent
+# in telnetlib.Telnet.process_rawq() while receiving a large response.
+# It feeds one MB of data through fill_rawq()/process_rawq() from a fake
+# socket, once without any IAC sequences and once with an escaped IAC
+# every few bytes and an IAC NOP every few more, and prints the CPU time
+# per MB.
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.protocols import telnetlib
+from Exscript.protocols.telnetlib import IAC
+
+MB = 1024 * 1024
+NOP = b'\xf1'
+
+
+class FakeSocket(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.sent = []
+
+    def recv(self, size):
+        data = self.data[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class LegacyTelnet(telnetlib.Telnet):
+
+    """
+    The byte-by-byte algorithm that process_rawq() used before, reduced
+    to the part that the payloads below exercise.
+    """
+
+    def process_rawq(self):
+        buf = b''
+        try:
+            while self.rawq:
+                char = self.rawq_getchar()
+                if char != IAC:
+                    buf = buf + char
+                    continue
+                command = self.rawq_getchar()
+                if command == IAC:
+                    buf = buf + command
+        except EOFError:
+            pass
+        self.cookedq.write(buf.decode(self.encoding))
+
+    def fill_rawq(self):
+        if self.irawq >= len(self.rawq):
+            self.rawq = b''
+            self.irawq = 0
+        buf = self.sock.recv(64)
+        self.eof = (not buf)
+        self.rawq = self.rawq + buf
+
+
+def run(cls, payload):
+    tn = cls()
+    tn.sock = FakeSocket(payload)
+    start = time.process_time()
+    while not tn.eof:
+        tn.fill_rawq()
+        tn.process_rawq()
+    elapsed = time.process_time() - start
+    return elapsed * MB / len(payload), tn.cookedq.getvalue()
+
+
+if __name__ == '__main__':
+    line = b'interface GigabitEthernet0/1\r\n description uplink\r\n'
+    plain = line * (MB // len(line))
+    chunk = (b'abc' + IAC + IAC + b'def') * 4 + IAC + NOP
+    heavy = chunk * (MB // len(chunk))
+    for name, payload, expected in (('IAC-free', plain, plain),
+                                    ('IAC-heavy', heavy,
+                                     (b'abc' + IAC + b'def') * 4 *
+                                     (MB // len(chunk)))):
+        before, before_result = run(LegacyTelnet, payload)
+        after, after_result = run(telnetlib.Telnet, payload)
+        assert before_result == after_result == expected.decode('latin1')
+        print('%-10s %7.3fs/MB before, %7.3fs/MB after'
+              % (name, before, after))
@@ -6,9 +6,11 @@ import re
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
+from io import StringIO
 from tempfile import TemporaryFile
 from functools import partial
-from Exscript.util.buffer import MonitoredBuffer
+from Exscript.util.buffer import MonitoredBuffer, TailMatcher, RingBuffer, \
+    LineMatcher
 
 
 class bufferTest(unittest.TestCase):
@@ -19,6 +21,19 @@ class bufferTest(unittest.TestCase):
         with TemporaryFile() as f:
             MonitoredBuffer(f)
 
+        # The given object mirrors the content of the buffer.
+        io = StringIO()
+        b = MonitoredBuffer(io)
+        b.append('foo')
+        b.append('bar')
+        self.assertEqual(io.getvalue(), 'foobar')
+        b.pop(2)
+        self.assertEqual(io.getvalue(), 'obar')
+        b.append('baz')
+        self.assertEqual(io.getvalue(), 'obarbaz')
+        b.clear()
+        self.assertEqual(io.getvalue(), '')
+
     def testSize(self):
         b = MonitoredBuffer()
         self.assertEqual(b.size(), 0)
@@ -72,6 +87,16 @@ class bufferTest(unittest.TestCase):
         self.assertEqual(b.pop(10), 'obardoh')
         self.assertEqual(str(b), '')
 
+        # Pop across chunk boundaries.
+        for chunk in ('ab', 'cde', 'f', 'ghij'):
+            b.append(chunk)
+        self.assertEqual(b.pop(3), 'abc')
+        self.assertEqual(b.head(4), 'defg')
+        self.assertEqual(b.tail(8), 'defghij')
+        self.assertEqual(b.pop(5), 'defgh')
+        self.assertEqual(b.size(), 2)
+        self.assertEqual(str(b), 'ij')
+
     def testAppend(self):
         b = MonitoredBuffer()
         self.assertEqual(str(b), '')
@@ -128,8 +153,172 @@ class bufferTest(unittest.TestCase):
         self.assertEqual(data.get('args')[1].group(0), 'abc')
         self.assertEqual(data.get('kwargs'), {})
 
+        # Removing data from the head must not re-trigger the monitor.
+        data.pop('args')
+        data.pop('kwargs')
+        b.pop(b.size() - 1)
+        b.append('x')
+        self.assertEqual(data, {})
+
+        # Matches in data that is larger than the limit are found.
+        b.append('abc' + 'x' * 200)
+        self.assertEqual(data.get('args')[1].group(0), 'abc')
+
+
+class TailMatcherTest(unittest.TestCase):
+    CORRELATE = TailMatcher
+
+    def testConstructor(self):
+        self.assertEqual(TailMatcher().window_size, 150)
+        self.assertEqual(TailMatcher(10).window_size, 10)
+
+    def testSearch(self):
+        b = MonitoredBuffer()
+        m = TailMatcher(10)
+        prompt = [re.compile(r'[\r\n]\w+> $'), re.compile(r'foo')]
+        self.assertEqual(m.search(b, prompt), None)
+
+        b.append('x' * 100 + '\nho')
+        self.assertEqual(m.search(b, prompt), None)
+        self.assertEqual(m.search(b, prompt), None)
+        b.append('st> ')
+        n, match, window = m.search(b, prompt)
+        self.assertEqual(n, 0)
+        self.assertEqual(match.group(0), '\nhost> ')
+        self.assertEqual(window, 'xxx\nhost> ')
+
+        # Searching again finds the same match, and a different list
+        # of expressions is applied to the same window.
+        self.assertEqual(m.search(b, prompt)[1].group(0), '\nhost> ')
+        self.assertEqual(m.search(b, prompt[1:]), None)
+
+        # Data that was removed from the buffer is not searched.
+        b.pop(b.size())
+        self.assertEqual(m.search(b, prompt), None)
+        b.append('foo')
+        n, match, window = m.search(b, prompt)
+        self.assertEqual(n, 1)
+        self.assertEqual(window, 'foo')
+
+        # The cleanup function only sees new data.
+        seen = []
+
+        def cleanup(data):
+            seen.append(data)
+            if data.endswith('\x1b'):
+                return data[:-1], data[-1:]
+            return data.replace('\x1b', ''), ''
+        b.clear()
+        b.append('\nrouter\x1b')
+        self.assertEqual(m.search(b, prompt, cleanup), None)
+        b.append('> ')
+        n, match, window = m.search(b, prompt, cleanup)
+        self.assertEqual(match.group(0), '\nrouter> ')
+        self.assertEqual(seen, ['\nrouter\x1b', '\x1b> '])
+
+
+class RingBufferTest(unittest.TestCase):
+    CORRELATE = RingBuffer
+
+    def testConstructor(self):
+        self.assertEqual(RingBuffer().size, 65536)
+        self.assertEqual(RingBuffer(10).getvalue(), '')
+
+    def testWrite(self):
+        b = RingBuffer(10)
+        b.write('')
+        b.write('abc')
+        self.assertEqual(b.getvalue(), 'abc')
+        b.write('defghijkl')
+        self.assertEqual(b.getvalue(), 'cdefghijkl')
+        for char in 'mnopqrstuvwxyz':
+            b.write(char)
+        self.assertLessEqual(len(b.chunks), 11)
+        self.assertEqual(b.getvalue(), 'qrstuvwxyz')
+        b.write('0123456789' * 10)
+        self.assertEqual(b.getvalue(), '0123456789')
+
+        # A size of zero discards everything.
+        b = RingBuffer(0)
+        b.write('abc')
+        self.assertEqual(b.getvalue(), '')
+
+    def testFlush(self):
+        b = RingBuffer(10)
+        b.write('abc')
+        b.flush()
+        self.assertEqual(b.getvalue(), 'abc')
+
+    def testClose(self):
+        b = RingBuffer(10)
+        b.write('abc')
+        b.close()
+        self.assertEqual(b.getvalue(), '')
+
+    def testGetvalue(self):
+        b = RingBuffer(5)
+        b.write('abc')
+        b.write('def')
+        self.assertEqual(b.getvalue(), 'bcdef')
+        self.assertEqual(b.getvalue(), 'bcdef')
+        b.write('g')
+        self.assertEqual(b.getvalue(), 'cdefg')
+
+
+class LineMatcherTest(unittest.TestCase):
+    CORRELATE = LineMatcher
+
+    def testConstructor(self):
+        regexs = [re.compile(r'foo'), re.compile(r'bar', re.I),
+                  re.compile(r'baz'), re.compile(r'x\Z')]
+        m = LineMatcher(regexs)
+        self.assertEqual(m.regexs, regexs)
+        self.assertEqual(len(m.combined), 2)
+        self.assertEqual(m.separate, [3])
+
+        # Expressions that can not be combined are searched separately.
+        m = LineMatcher([re.compile(r'(?P<a>foo)'), re.compile(r'(?P<a>x)')])
+        self.assertEqual(m.combined, [])
+        self.assertEqual(m.separate, [0, 1])
+
+    def testSearch(self):
+        def search(regexs, string, pos=0):
+            regexs = [re.compile(r, re.I) for r in regexs]
+            return LineMatcher(regexs).search(string, pos)
+
+        self.assertEqual(search([r'error'], ''), None)
+        self.assertEqual(search([r'error'], 'one\ntwo\r\n'), None)
+        self.assertEqual(search([r'error'], 'one\nan Error\r\nerror'),
+                         (0, 'an Error\r'))
+        self.assertEqual(search([r'error'], 'error\nfoo\n', 1), None)
+        self.assertEqual(search([r'error'], 'error\nfoo error\n', 6),
+                         (0, 'foo error'))
+
+        # The first line wins, and within a line, the first expression.
+        self.assertEqual(search([r'foo', r'bar'], 'x\nbar\nfoo'),
+                         (1, 'bar'))
+        self.assertEqual(search([r'foo', r'bar'], 'x\nbar foo\nfoo'),
+                         (0, 'bar foo'))
+
+        # Anchors refer to the start and end of each line.
+        self.assertEqual(search([r'^error'], 'x\n error\nerror 2'),
+                         (0, 'error 2'))
+        self.assertEqual(search([r'error$'], 'error 1\nerror\n2'),
+                         (0, 'error'))
+        self.assertEqual(search([r'^%?\s*error'], 'x\n%\n\nerror'),
+                         (0, 'error'))
+        self.assertEqual(search([r'^%?\s*error'], 'x\n%\n\nfoo'), None)
+        self.assertEqual(search([r'\Aerror'], 'x\nerror\nfoo', 2),
+                         (0, 'error'))
+        self.assertEqual(search([r'(a)b\1'], 'x\nab\nabab aba'),
+                         (0, 'abab aba'))
+
 
 def suite():
-    return unittest.TestLoader().loadTestsFromTestCase(bufferTest)
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(bufferTest),
+                               loader.loadTestsFromTestCase(TailMatcherTest),
+                               loader.loadTestsFromTestCase(RingBufferTest),
+                               loader.loadTestsFromTestCase(LineMatcherTest)])
 if __name__ == '__main__':
     unittest.TextTestRunner(verbosity=2).run(suite())
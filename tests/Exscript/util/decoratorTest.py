@@ -23,6 +23,7 @@ class FakeConnection(object):
         self.host = None
         self.logged_in = False
         self.authenticated = False
+        self.pooled = False
 
     def connect(self, hostname, port):
         self.host = hostname
@@ -38,6 +39,9 @@ class FakeConnection(object):
         self.authenticated = True
         self.login_flushed = flush
 
+    def is_app_authenticated(self):
+        return self.logged_in or self.authenticated
+
     def close(self, force):
         self.connected = False
         self.close_forced = force
@@ -106,6 +110,19 @@ class decoratorTest(unittest.TestCase):
         result = bound(job, host, conn, 'one', 'two', three=3)
         self.assertEqual(result, 123)
 
+        # Unless they came from a connection pool, connections that are
+        # already logged in are logged in again.
+        conn.login_flushed = None
+        result = bound(job, host, conn, 'one', 'two', three=3)
+        self.assertEqual(result, 123)
+        self.assertEqual(conn.login_flushed, False)
+
+        # Pooled connections that are already logged in are not.
+        conn.pooled = True
+        conn.login = None
+        result = bound(job, host, conn, 'one', 'two', three=3)
+        self.assertEqual(result, 123)
+
         # Monkey patch the fake connection such that the login fails.
         conn = FakeConnection()
         data = Value('i', 0)
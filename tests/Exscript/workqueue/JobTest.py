@@ -10,7 +10,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 from multiprocessing import Pipe
 from tempfile import NamedTemporaryFile
 from pickle import dumps, loads
-from Exscript.workqueue.job import Thread, Process, Job
+import time
+from Exscript.workqueue.job import Thread, Process, PooledThread, \
+    ThreadPool, ProcessPool, Job
 
 
 def do_nothing(job):
@@ -42,6 +44,256 @@ class ProcessTest(ThreadTest):
     CORRELATE = Process
 
 
+class PooledThreadTest(unittest.TestCase):
+    CORRELATE = PooledThread
+
+    def testConstructor(self):
+        job = PooledThread(1, do_nothing, 'myaction', 'foo')
+        self.assertEqual(do_nothing, job.function)
+        self.assertEqual(job.data, 'foo')
+        self.assertEqual(job.failures, 0)
+
+    def testRun(self):
+        called = []
+        job = PooledThread(1, called.append, 'myaction', None)
+        job.run()
+        self.assertEqual(called, [job])
+
+
+class ThreadPoolTest(unittest.TestCase):
+    CORRELATE = ThreadPool
+
+    def setUp(self):
+        self.pool = ThreadPool()
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def testConstructor(self):
+        self.assertEqual(len(self.pool), 0)
+
+    def testSubmit(self):
+        done = threading.Semaphore(0)
+        threads = set()
+
+        def function(n):
+            threads.add(threading.current_thread())
+            done.release()
+
+        # Sequential functions are all run by the same thread.
+        for n in range(10):
+            self.pool.submit(function, n)
+            done.acquire()
+            time.sleep(.01)
+        self.assertEqual(len(self.pool), 1)
+        self.assertEqual(len(threads), 1)
+
+        # Concurrent functions get a thread each.
+        lock = threading.Lock()
+        lock.acquire()
+
+        def blocking():
+            with lock:
+                done.release()
+        for n in range(3):
+            self.pool.submit(blocking)
+        self.assertEqual(len(self.pool), 3)
+        lock.release()
+        for n in range(3):
+            done.acquire()
+
+    def testRegister(self):
+        job1 = Job(do_nothing, 'job1', 1, None)
+        job2 = Job(do_nothing, 'job2', 1, None)
+        self.pool.register(job1)
+        self.pool.register(job2)
+        self.assertEqual(self.pool.jobs, {id(job1): job1, id(job2): job2})
+
+    def testUnregister(self):
+        job1 = Job(do_nothing, 'job1', 1, None)
+        job2 = Job(do_nothing, 'job2', 1, None)
+        self.pool.register(job1)
+        self.pool.register(job2)
+        self.pool.unregister(job1)
+        self.assertEqual(self.pool.jobs, {id(job2): job2})
+        self.pool.unregister(job1)  # Unknown jobs are ignored.
+        self.pool.unregister(job2)
+        self.assertEqual(self.pool.jobs, {})
+
+    def testRun(self):
+        results = []
+        done = threading.Semaphore(0)
+
+        def on_complete(job, result):
+            results.append((job, result))
+            done.release()
+
+        for function in (do_nothing, raise_error):
+            job = Job(function, 'myaction', 1, None)
+            job.child = PooledThread(1, function, 'myaction', None)
+            self.pool.register(job)
+            self.pool.run(job, on_complete)
+            self.assertTrue(done.acquire(timeout=10))
+            self.pool.unregister(job)
+
+        # on_complete() is called on success and on failure.
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][1], None)
+        job, result = results[1]
+        self.assertEqual(job.func, raise_error)
+        self.assertEqual(result[0], ValueError)
+        self.assertEqual(self.pool.jobs, {})
+
+    def testShutdown(self):
+        done = threading.Event()
+        self.pool.submit(lambda: time.sleep(.1))
+        self.pool.submit(done.set)
+        self.pool.shutdown()
+        self.assertTrue(done.wait(5))
+        for thread in self.pool.threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+
+def send_pid(job):
+    job.pipe.send(('pid', os.getpid(), job.data))
+
+
+def wait(job):
+    job.pipe.send(('wait', os.getpid(), job.data))
+    job.pipe.send(('echo', os.getpid(), job.pipe.recv()))
+
+
+def raise_error(job):
+    raise ValueError('foo')
+
+
+def crash(job):
+    os._exit(1)
+
+
+class ProcessPoolTest(unittest.TestCase):
+    CORRELATE = ProcessPool
+
+    def setUp(self):
+        self.requests = []
+        self.results = []
+        self.waiting = []
+        self.completed = []
+        self.done = threading.Semaphore(0)
+        self.wait = threading.Semaphore(0)
+        self.pool = ProcessPool(max_jobs=2, request_handler=self.handler)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def handler(self, pipe):
+        def handle(request):
+            if request is None:
+                self.completed.append(pipe)
+                return
+            self.requests.append(request)
+            if request[0] == 'wait':
+                self.waiting.append(pipe)
+                self.wait.release()
+        return handle
+
+    def on_complete(self, job, result):
+        self.results.append((job, result))
+        self.done.release()
+
+    def create_job(self, function, data=None):
+        job = Job(function, 'myaction', 1, data)
+        self.pool.register(job)
+        return job
+
+    def run_job(self, job):
+        self.pool.run(job, self.on_complete)
+        self.assertTrue(self.done.acquire(timeout=10))
+        self.pool.unregister(job)
+
+    def testConstructor(self):
+        self.assertEqual(len(self.pool), 0)
+        self.assertEqual(self.pool.max_jobs, 2)
+
+    def testRegister(self):
+        job = self.create_job(do_nothing)
+        self.assertEqual(self.pool.jobs[id(job)], (0, job))
+
+    def testUnregister(self):
+        job = self.create_job(do_nothing)
+        self.pool.unregister(job)
+        self.assertEqual(self.pool.jobs, {})
+
+    def testRun(self):
+        # Workers only know the jobs that were registered before they
+        # were started.
+        jobs = [self.create_job(send_pid, n) for n in range(3)]
+        jobs.append(self.create_job(raise_error))
+        jobs.append(self.create_job(crash))
+        jobs.append(self.create_job(send_pid, 5))
+
+        # Jobs run in a worker process, which is reused until it ran
+        # max_jobs jobs.
+        for job in jobs[:3]:
+            self.run_job(job)
+            self.assertEqual(self.results[-1], (job, None))
+        pids = [pid for command, pid, data in self.requests]
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual([data for c, p, data in self.requests], [0, 1, 2])
+
+        # Errors are passed to on_complete().
+        self.run_job(jobs[3])
+        self.assertEqual(self.results[-1][1][0], ValueError)
+
+        # So is the death of a worker, which is then replaced.
+        self.run_job(jobs[4])
+        self.assertIn('exited with code 1', str(self.results[-1][1][1]))
+        self.run_job(jobs[5])
+        self.assertEqual(self.results[-1], (jobs[5], None))
+        self.assertEqual(self.requests[-1][2], 5)
+
+        # Jobs that were registered after a worker was started are
+        # passed to a new worker.
+        self.run_job(self.create_job(send_pid, 6))
+        self.assertNotEqual(self.requests[-1][1], self.requests[-2][1])
+
+    def testRunInThreads(self):
+        # With a fixed number of processes, jobs run in threads, and are
+        # spread across all workers.
+        self.pool.shutdown()
+        self.pool = ProcessPool(request_handler=self.handler, processes=2)
+        jobs = [self.create_job(wait, n) for n in range(4)]
+        for job in jobs:
+            self.pool.run(job, self.on_complete)
+        for job in jobs:
+            self.assertTrue(self.wait.acquire(timeout=10))
+        self.assertEqual(len(self.pool), 2)
+        pids = [pid for command, pid, data in self.requests]
+        self.assertEqual([pids.count(pid) for pid in set(pids)], [2, 2])
+        for n, pipe in enumerate(self.waiting):
+            pipe.send(n)
+        for job in jobs:
+            self.assertTrue(self.done.acquire(timeout=10))
+        echoed = [data for c, p, data in self.requests if c == 'echo']
+        self.assertEqual(sorted(echoed), [0, 1, 2, 3])
+        self.assertEqual([r for j, r in self.results], [None] * 4)
+
+        # The handler of every job is told when the job is completed.
+        self.assertEqual(sorted(map(id, self.completed)),
+                         sorted(map(id, self.waiting)))
+
+    def testShutdown(self):
+        self.run_job(self.create_job(do_nothing))
+        self.assertEqual(len(self.pool), 1)
+        worker = list(self.pool.workers)[0]
+        self.pool.shutdown()
+        worker.thread.join(10)
+        self.assertEqual(len(self.pool), 0)
+
+
 class JobTest(unittest.TestCase):
 
     def testConstructor(self):
@@ -63,7 +315,11 @@ def suite():
     loader = unittest.TestLoader()
     suite1 = loader.loadTestsFromTestCase(ThreadTest)
     suite2 = loader.loadTestsFromTestCase(ProcessTest)
-    suite3 = loader.loadTestsFromTestCase(JobTest)
-    return unittest.TestSuite((suite1, suite2, suite3))
+    suite3 = loader.loadTestsFromTestCase(PooledThreadTest)
+    suite4 = loader.loadTestsFromTestCase(ThreadPoolTest)
+    suite5 = loader.loadTestsFromTestCase(ProcessPoolTest)
+    suite6 = loader.loadTestsFromTestCase(JobTest)
+    return unittest.TestSuite((suite1, suite2, suite3, suite4, suite5,
+                               suite6))
 if __name__ == '__main__':
     unittest.TextTestRunner(verbosity=2).run(suite())
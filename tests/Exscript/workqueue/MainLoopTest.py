@@ -8,7 +8,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 from Exscript.workqueue.mainloop import MainLoop
 from Exscript.workqueue.pipeline import Pipeline
-from Exscript.workqueue.job import Process
+from Exscript.workqueue.job import Process, PooledProcess, ProcessPool
 
 
 class MainLoopTest(unittest.TestCase):
@@ -28,6 +28,26 @@ class MainLoopTest(unittest.TestCase):
 
         # Note: Further testing is done in WorkQueueTest.py
 
+    def testPoolRegistration(self):
+        pool = ProcessPool()
+        ml = MainLoop(Pipeline(), PooledProcess, pool)
+        nop = lambda x: None
+
+        # Jobs are registered with the pool once they have an id.
+        job_id = ml.enqueue_or_ignore(nop, 'test', 1, None)
+        ml.priority_enqueue(nop, None, False, 1, None)
+        ids = sorted(job.id for seq, job in pool.jobs.values())
+        self.assertEqual(ids[0], job_id)
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(None, ids)
+
+        # Jobs that could not be added are not registered.
+        self.assertRaises(AttributeError,
+                          ml.priority_enqueue,
+                          nop, 'test', False, 1, None)
+        self.assertEqual(len(pool.jobs), 2)
+        pool.shutdown()
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromTestCase(MainLoopTest)
@@ -70,6 +70,10 @@ class PipelineTest(unittest.TestCase):
         self.assertEqual(self.pipeline.has_id(id1), True)
         self.assertEqual(self.pipeline.has_id(id2), True)
 
+        # Ids are sequential, and unique across pipelines.
+        self.assertEqual(id2, id1 + 1)
+        self.assertEqual(Pipeline().append(item1), id2 + 1)
+
     def testTaskDone(self):
         self.testNext()
 
@@ -112,6 +116,19 @@ class PipelineTest(unittest.TestCase):
         self.pipeline.prioritize(item1, True)
         self.assertEqual(self.pipeline.try_next(), item1)
 
+        # Prioritizing the same items over and over does not grow the
+        # queue without bounds.
+        self.pipeline.clear()
+        items = [object() for n in range(10)]
+        for item in items:
+            self.pipeline.append(item)
+        for n in range(1000):
+            self.pipeline.prioritize(items[n % 10])
+        self.assertLess(len(self.pipeline.queue), 100)
+        self.pipeline.set_max_working(10)
+        result = [next(self.pipeline) for item in items]
+        self.assertEqual(result, list(reversed(items)))
+
     def testClear(self):
         self.testAppendleft()
         self.assertEqual(len(self.pipeline), 4)
@@ -204,6 +221,24 @@ class PipelineTest(unittest.TestCase):
         self.assertRaises(Exception, self.pipeline.wake, item2)
         self.assertEqual(len(self.pipeline), 2)
 
+        # Queued items that are sleeping are skipped, and keep their
+        # position when they wake up.
+        self.pipeline.clear()
+        self.pipeline.set_max_working(3)
+        item3 = object()
+        self.pipeline.append(item1)
+        self.pipeline.append(item2)
+        self.pipeline.append(item3)
+        self.pipeline.sleep(item1)
+        self.pipeline.sleep(item2)
+        self.assertEqual(self.pipeline.try_next(), item3)
+        self.pipeline.wake(item2)
+        self.assertEqual(self.pipeline.try_next(), item2)
+        self.pipeline.wake(item1)
+        self.assertEqual(next(self.pipeline), item1)
+        self.assertEqual(next(self.pipeline), item2)
+        self.assertEqual(next(self.pipeline), item3)
+
     def testWake(self):
         self.testSleep()
 
@@ -228,6 +263,31 @@ class PipelineTest(unittest.TestCase):
         self.pipeline.wait_for_id(id1)  # Must not deadlock.
         self.assertEqual(len(self.pipeline), 1)
 
+        # Unknown ids return immediately.
+        self.pipeline.wait_for_id(id1)
+
+        # Waiters for other items are not woken when an item completes,
+        # but are when the pipeline is cleared.
+        completed = []
+
+        class wait_for_id(Thread):
+
+            def run(inner_self):
+                self.pipeline.wait_for_id(id2)
+                completed.append(id2)
+        thread = wait_for_id()
+        thread.daemon = True
+        thread.start()
+        item3 = object()
+        self.pipeline.appendleft(item3)
+        self.pipeline.set_max_working(2)
+        self.pipeline.task_done(next(self.pipeline))
+        thread.join(.1)
+        self.assertEqual(completed, [])
+        self.pipeline.clear()
+        thread.join(5)
+        self.assertEqual(completed, [id2])
+
     def testWait(self):
         item1 = object()
         item2 = object()
@@ -29,13 +29,36 @@ nop = lambda x: None
 
 class WorkQueueTest(unittest.TestCase):
     CORRELATE = WorkQueue
+    mode = 'threading'
 
     def setUp(self):
-        self.wq = WorkQueue()
+        self.wq = WorkQueue(mode=self.mode)
 
     def testConstructor(self):
         self.assertEqual(1, self.wq.get_max_threads())
         self.assertEqual(0, self.wq.debug)
+        self.assertRaises(TypeError, WorkQueue, mode='foo')
+
+    def testEvents(self):
+        events = []
+        self.wq.job_started_event.connect(lambda j: events.append('start'))
+        self.wq.job_error_event.connect(lambda j, e: events.append('error'))
+        self.wq.job_succeeded_event.connect(lambda j: events.append('ok'))
+        self.wq.job_aborted_event.connect(lambda j: events.append('abort'))
+
+        def fail_twice(job):
+            if job.failures < 2:
+                raise Exception('failure %d' % job.failures)
+        self.wq.enqueue(fail_twice, times=3)
+        self.wq.wait_until_done()
+        self.assertEqual(events, ['start', 'error', 'start', 'error',
+                                  'start', 'ok'])
+
+        del events[:]
+        self.wq.enqueue(fail_twice, times=2)
+        self.wq.wait_until_done()
+        self.assertEqual(events, ['start', 'error', 'start', 'error',
+                                  'abort'])
 
     def testSetDebug(self):
         self.assertEqual(0, self.wq.debug)
@@ -55,10 +78,10 @@ class WorkQueueTest(unittest.TestCase):
         self.assertEqual(0, self.wq.get_length())
         id = self.wq.enqueue(nop)
         self.assertEqual(1, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.enqueue(nop)
         self.assertEqual(2, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         self.wq.shutdown(True)
         self.assertEqual(0, self.wq.get_length())
 
@@ -85,10 +108,10 @@ class WorkQueueTest(unittest.TestCase):
         self.assertEqual(0, self.wq.get_length())
         id = self.wq.enqueue_or_ignore(nop, 'one')
         self.assertEqual(1, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.enqueue_or_ignore(nop, 'two')
         self.assertEqual(2, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.enqueue_or_ignore(nop, 'one')
         self.assertEqual(2, self.wq.get_length())
         self.assertEqual(id, None)
@@ -103,10 +126,10 @@ class WorkQueueTest(unittest.TestCase):
         self.assertEqual(0, self.wq.get_length())
         id = self.wq.priority_enqueue(nop)
         self.assertEqual(1, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.priority_enqueue(nop)
         self.assertEqual(2, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
 
     def testPriorityEnqueueOrRaise(self):
         self.assertEqual(0, self.wq.get_length())
@@ -114,10 +137,10 @@ class WorkQueueTest(unittest.TestCase):
         self.wq.pause()
         id = self.wq.priority_enqueue_or_raise(nop, 'foo')
         self.assertEqual(1, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.priority_enqueue_or_raise(nop, 'bar')
         self.assertEqual(2, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.priority_enqueue_or_raise(nop, 'foo')
         self.assertEqual(2, self.wq.get_length())
         self.assertEqual(id, None)
@@ -150,10 +173,10 @@ class WorkQueueTest(unittest.TestCase):
         self.assertEqual(0, self.wq.get_length())
         id = self.wq.enqueue(nop)
         self.assertEqual(1, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         id = self.wq.enqueue(nop)
         self.assertEqual(2, self.wq.get_length())
-        self.assertIsInstance(id, str)
+        self.assertIsInstance(id, int)
         self.wq.destroy()
         self.assertEqual(0, self.wq.get_length())
 
@@ -178,7 +201,24 @@ class WorkQueueTest(unittest.TestCase):
         pass  # See testEnqueue()
 
 
+class WorkQueueTestThreadPool(WorkQueueTest):
+    mode = 'threadpool'
+
+
+class WorkQueueTestProcessPool(WorkQueueTest):
+    mode = 'processpool'
+
+
+class WorkQueueTestHybrid(WorkQueueTest):
+    mode = 'hybrid'
+
+
 def suite():
-    return unittest.TestLoader().loadTestsFromTestCase(WorkQueueTest)
+    loader = unittest.TestLoader()
+    suite1 = loader.loadTestsFromTestCase(WorkQueueTest)
+    suite2 = loader.loadTestsFromTestCase(WorkQueueTestThreadPool)
+    suite3 = loader.loadTestsFromTestCase(WorkQueueTestProcessPool)
+    suite4 = loader.loadTestsFromTestCase(WorkQueueTestHybrid)
+    return unittest.TestSuite((suite1, suite2, suite3, suite4))
 if __name__ == '__main__':
     unittest.TextTestRunner(verbosity=2).run(suite())
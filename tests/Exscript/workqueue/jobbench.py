@@ -0,0 +1,60 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring the overhead of scheduling
+# a job. It runs a number of jobs that do nothing in each mode of the
+# WorkQueue and prints the wall clock time per job and the number of
+# threads and processes that were started.
+import sys
+import os
+import time
+import threading
+import multiprocessing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.workqueue import WorkQueue
+
+JOBS = 5000
+
+
+def nop(job):
+    pass
+
+
+def run(mode, max_threads, jobs):
+    wq = WorkQueue(mode=mode, max_threads=max_threads)
+    started = {threading.Thread: 0, multiprocessing.Process: 0}
+    originals = dict((cls, cls.start) for cls in started)
+
+    def count(cls):
+        def counting_start(obj):
+            started[cls] += 1
+            originals[cls](obj)
+        return counting_start
+    for cls in started:
+        cls.start = count(cls)
+    try:
+        start = time.time()
+        for n in range(jobs):
+            wq.enqueue(nop)
+        wq.wait_until_done()
+        elapsed = time.time() - start
+    finally:
+        for cls, original in originals.items():
+            cls.start = original
+    wq.destroy()
+    return (elapsed / jobs * 1000000,
+            started[threading.Thread],
+            started[multiprocessing.Process])
+
+
+if __name__ == '__main__':
+    for mode, jobs in (('threading', JOBS),
+                       ('threadpool', JOBS),
+                       ('multiprocessing', JOBS // 10),
+                       ('processpool', JOBS // 10),
+                       ('hybrid', JOBS // 10)):
+        for max_threads in (1, 20):
+            elapsed, threads, processes = run(mode, max_threads, jobs)
+            print('%-15s max_threads=%-2d %8.1f us/job, %5d threads,'
+                  ' %4d processes for %d jobs'
+                  % (mode, max_threads, elapsed, threads, processes, jobs))
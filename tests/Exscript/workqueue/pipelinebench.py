@@ -0,0 +1,136 @@
+from __future__ import print_function, division
+# This script is not meant to provide a fully automated test, it's
+# merely a hack/starting point for measuring how the cost of scheduling
+# grows with the length of the queue. It fills a Pipeline with the given
+# number of items, moves a few random items to the front (the way
+# priority_enqueue_or_raise() does), lets a few items at the front of
+# the queue sleep while the next ones are taken, and prints the time
+# per operation for the old and the new algorithm.
+# It also starts one thread per item that waits for the item using
+# wait_for_id() (the way Task.wait() does), completes all items, and
+# prints the time that it takes until all threads returned.
+import sys
+import os
+import time
+import random
+import threading
+from uuid import uuid4
+from collections import deque
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from Exscript.workqueue import Pipeline
+
+OPS = 1000
+
+
+class LegacyPipeline(Pipeline):
+
+    """
+    The deque-based algorithm that Pipeline used before, reduced to the
+    part that is measured below.
+    """
+
+    def clear(self):
+        Pipeline.clear(self)
+        self.queue = deque()
+        self.item2id = dict()
+        self.id2item = dict()
+
+    def append(self, item, name=None):
+        with self.condition:
+            self.queue.append(item)
+            uuid = uuid4().hex
+            self.id2item[uuid] = item
+            self.item2id[item] = uuid
+            self.condition.notify_all()
+            return uuid
+
+    def prioritize(self, item, force=False):
+        with self.condition:
+            if item in self.working:
+                return
+            self.queue.remove(item)
+            self.queue.appendleft(item)
+            self.condition.notify_all()
+
+    def task_done(self, item):
+        with self.condition:
+            self.working.remove(item)
+            self.id2item.pop(self.item2id.pop(item))
+            self.condition.notify_all()
+
+    def _get_next(self, pop=True):
+        sleeping = []
+        while self.queue and self.queue[0] in self.sleeping:
+            sleeping.append(self.queue.popleft())
+        next = self.queue.popleft() if pop else self.queue[0]
+        self.queue.extendleft(sleeping)
+        return next
+
+    def __next__(self):
+        with self.condition:
+            next = self._get_next()
+            self.working.add(next)
+            return next
+
+    def has_id(self, item_id):
+        return item_id in self.id2item
+
+    def wait_for_id(self, item_id):
+        with self.condition:
+            while self.has_id(item_id):
+                self.condition.wait()
+
+
+def timed(function, items):
+    start = time.time()
+    for item in items:
+        function(item)
+    return (time.time() - start) / len(items) * 1000000
+
+
+def run(cls, length):
+    ops = min(OPS, length // 10)
+    pipeline = cls(max_working=length)
+    items = list(range(length))
+    append = timed(pipeline.append, items)
+    prioritize = timed(pipeline.prioritize, random.sample(items, ops))
+
+    # Take the items that were moved to the front, and let some of the
+    # next ones sleep.
+    for n in range(ops):
+        pipeline.task_done(next(pipeline))
+    for n in range(ops // 10):
+        pipeline.sleep(pipeline.try_next())
+    take = timed(lambda n: pipeline.task_done(next(pipeline)), range(ops))
+    return append, prioritize, take
+
+
+def run_waiters(cls, length):
+    pipeline = cls(max_working=length)
+    ids = [pipeline.append(n) for n in range(length)]
+    items = [next(pipeline) for n in range(length)]
+    threads = [threading.Thread(target=pipeline.wait_for_id, args=(i,))
+               for i in ids]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)  # Hack: Wait until all threads are waiting.
+    start = time.time()
+    for item in items:
+        pipeline.task_done(item)
+    for thread in threads:
+        thread.join()
+    return (time.time() - start) / length * 1000000
+
+
+if __name__ == '__main__':
+    for length in (1000, 10000, 100000, 1000000):
+        for cls in (LegacyPipeline, Pipeline):
+            append, prioritize, take = run(cls, length)
+            print('%-14s %7d items: %6.1f us/append, %8.1f us/prioritize,'
+                  ' %8.1f us/next' % (cls.__name__, length, append,
+                                      prioritize, take))
+    for length in (10, 100, 1000):
+        for cls in (LegacyPipeline, Pipeline):
+            print('%-14s %7d waiters: %8.1f us/task_done' %
+                  (cls.__name__, length, run_waiters(cls, length)))